@@ -17,6 +17,7 @@ from app.models.email import Email
 from app.models.spam_log import SpamLog
 from app.models.use_feedback import UserFeedback
 from app.models.api_key import APIKey
+from app.models.user_stats import UserStats
 from app.models.training import TrainingSection, TrainingExample, TrainingQuiz, TrainingTip
 
 
@@ -0,0 +1,46 @@
+"""Add user_stats counter table
+
+Revision ID: 3c9a1f7d2b64
+Revises: ed2f0e5bed7d
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c9a1f7d2b64'
+down_revision = 'ed2f0e5bed7d'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('user_stats',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('total_analyses', sa.Integer(), nullable=False, server_default='0'),
+    sa.Column('spam_detected', sa.Integer(), nullable=False, server_default='0'),
+    sa.Column('feedback_count', sa.Integer(), nullable=False, server_default='0'),
+    sa.Column('feedback_correct', sa.Integer(), nullable=False, server_default='0'),
+    sa.Column('updated_at', sa.DateTime(timezone=True), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id')
+    )
+
+    # Backfill counters from existing logs so dashboards stay correct after upgrade
+    op.execute("""
+        INSERT INTO user_stats (user_id, total_analyses, spam_detected, feedback_count, feedback_correct)
+        SELECT
+            user_id,
+            COUNT(*),
+            SUM(CASE WHEN LOWER(result) = 'spam' THEN 1 ELSE 0 END),
+            SUM(CASE WHEN is_correct IS NOT NULL THEN 1 ELSE 0 END),
+            SUM(CASE WHEN is_correct THEN 1 ELSE 0 END)
+        FROM spam_logs
+        GROUP BY user_id
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('user_stats')
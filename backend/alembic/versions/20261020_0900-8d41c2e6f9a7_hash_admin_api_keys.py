@@ -0,0 +1,40 @@
+"""Store admin-issued API keys as SHA-256 digests
+
+Revision ID: 8d41c2e6f9a7
+Revises: 3c9a1f7d2b64
+Create Date: 2026-10-20 09:00:00.000000
+
+"""
+import hashlib
+import re
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d41c2e6f9a7'
+down_revision = '3c9a1f7d2b64'
+branch_labels = None
+depends_on = None
+
+_DIGEST = re.compile(r"[0-9a-f]{64}")
+
+
+def upgrade() -> None:
+    # Keys generated through the admin panel were stored raw; hash them like /api/keys does
+    api_keys = sa.table('api_keys', sa.column('id', sa.Integer), sa.column('key', sa.String))
+    conn = op.get_bind()
+    rows = conn.execute(sa.select(api_keys.c.id, api_keys.c.key)).fetchall()
+    for key_id, key in rows:
+        if not _DIGEST.fullmatch(key):
+            conn.execute(
+                api_keys.update()
+                .where(api_keys.c.id == key_id)
+                .values(key=hashlib.sha256(key.encode()).hexdigest())
+            )
+
+
+def downgrade() -> None:
+    # Digests can't be reversed; hashed keys keep working after a downgrade
+    pass
@@ -1,6 +1,7 @@
 from pydantic_settings import BaseSettings
 from typing import List
 import os
+import tempfile
 from dotenv import load_dotenv
 import pytz
 
@@ -20,10 +21,105 @@ class Settings(BaseSettings):
     # Database
     DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///./spam_detector.db")
     
+    # Connection pool (server databases such as PostgreSQL)
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "10"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+    DB_POOL_TIMEOUT: int = int(os.getenv("DB_POOL_TIMEOUT", "30"))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "True").lower() == "true"
+    
+    # SQLite pragmas (applied on every new connection)
+    SQLITE_BUSY_TIMEOUT_MS: int = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+    SQLITE_CACHE_SIZE_KB: int = int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536"))
+    SQLITE_MMAP_SIZE: int = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+    
     # JWT Settings
     SECRET_KEY: str = os.getenv("SECRET_KEY", "")
     ALGORITHM: str = os.getenv("ALGORITHM", "HS256")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
+    # Seconds a decoded token / resolved user stays cached in get_current_user (0 disables)
+    AUTH_CACHE_TTL: int = int(os.getenv("AUTH_CACHE_TTL", "60"))
+    
+    # API key authentication (X-API-Key); seconds a verified / rejected key stays cached.
+    # Revocations reach every worker at once, the TTL only bounds missed invalidations
+    API_KEY_CACHE_TTL: int = int(os.getenv("API_KEY_CACHE_TTL", "30"))
+    API_KEY_NEGATIVE_CACHE_TTL: int = int(os.getenv("API_KEY_NEGATIVE_CACHE_TTL", "10"))
+    API_KEY_USAGE_FLUSH_SECONDS: int = int(os.getenv("API_KEY_USAGE_FLUSH_SECONDS", "30"))
+    
+    # Password hashing pool (0 = derive from CPU count)
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", "0"))
+    PASSWORD_HASH_MAX_CONCURRENCY: int = int(os.getenv("PASSWORD_HASH_MAX_CONCURRENCY", "0"))
+    # Logins/registrations allowed to wait for a slot before returning 503 (0 = unbounded)
+    PASSWORD_HASH_MAX_QUEUE: int = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", "256"))
+    # "thread" (default) or "process" (forkserver/spawn pool, see hashing_service)
+    PASSWORD_HASH_EXECUTOR: str = os.getenv("PASSWORD_HASH_EXECUTOR", "thread").lower()
+    
+    # Production server (serve.py / gunicorn_conf.py); 0 workers = one per CPU core
+    WEB_CONCURRENCY: int = int(os.getenv("WEB_CONCURRENCY", "0"))
+    WORKER_MAX_REQUESTS: int = int(os.getenv("WORKER_MAX_REQUESTS", "10000"))
+    WORKER_MAX_REQUESTS_JITTER: int = int(os.getenv("WORKER_MAX_REQUESTS_JITTER", "1000"))
+    WORKER_TIMEOUT: int = int(os.getenv("WORKER_TIMEOUT", "60"))
+    WORKER_GRACEFUL_TIMEOUT: int = int(os.getenv("WORKER_GRACEFUL_TIMEOUT", "30"))
+    MODEL_WARMUP_ROUNDS: int = int(os.getenv("MODEL_WARMUP_ROUNDS", "3"))
+    
+    # POST /api/analyze/stream: emails per model/insert chunk, emails buffered
+    # between the request reader and the model, max bytes per NDJSON line
+    STREAM_BATCH_SIZE: int = int(os.getenv("STREAM_BATCH_SIZE", "256"))
+    STREAM_QUEUE_SIZE: int = int(os.getenv("STREAM_QUEUE_SIZE", "1024"))
+    STREAM_MAX_LINE_BYTES: int = int(os.getenv("STREAM_MAX_LINE_BYTES", str(1024 * 1024)))
+    
+    # Idempotency-Key results for /analyze (seconds kept, in-process entries)
+    IDEMPOTENCY_TTL: int = int(os.getenv("IDEMPOTENCY_TTL", "3600"))
+    IDEMPOTENCY_MAX_ENTRIES: int = int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", "10000"))
+    
+    # Response compression (brotli when installed, else gzip)
+    COMPRESSION_ENABLED: bool = os.getenv("COMPRESSION_ENABLED", "True").lower() == "true"
+    COMPRESSION_MIN_SIZE: int = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+    COMPRESSION_GZIP_LEVEL: int = int(os.getenv("COMPRESSION_GZIP_LEVEL", "6"))
+    COMPRESSION_BROTLI_QUALITY: int = int(os.getenv("COMPRESSION_BROTLI_QUALITY", "4"))
+
+    # Per-stage latency (Server-Timing response header; histograms are always on)
+    SERVER_TIMING_ENABLED: bool = os.getenv("SERVER_TIMING_ENABLED", "False").lower() == "true"
+
+    # Prometheus scrape endpoint (GET /metrics); set METRICS_TOKEN to require
+    # "Authorization: Bearer <token>". Off by default in production, and not
+    # mounted there without a token (see main.py)
+    METRICS_ENABLED: bool = os.getenv(
+        "METRICS_ENABLED", "False" if os.getenv("ENVIRONMENT", "development") == "production" else "True"
+    ).lower() == "true"
+    METRICS_TOKEN: str = os.getenv("METRICS_TOKEN", "")
+
+    # On-demand sampling profiler (admin endpoints under /api/admin/profiler);
+    # PROFILER_DIR must be shared by all workers on the host
+    PROFILER_ENABLED: bool = os.getenv("PROFILER_ENABLED", "True").lower() == "true"
+    PROFILER_DIR: str = os.getenv("PROFILER_DIR", os.path.join(tempfile.gettempdir(), "mailsentra_profiles"))
+    PROFILER_MAX_SECONDS: int = int(os.getenv("PROFILER_MAX_SECONDS", "120"))
+
+    # Online drift monitor (GET /api/admin/health/drift): bucket width and
+    # buckets kept per model version
+    DRIFT_MONITOR_ENABLED: bool = os.getenv("DRIFT_MONITOR_ENABLED", "True").lower() == "true"
+    DRIFT_BUCKET_SECONDS: int = int(os.getenv("DRIFT_BUCKET_SECONDS", "3600"))
+    DRIFT_MAX_BUCKETS: int = int(os.getenv("DRIFT_MAX_BUCKETS", "24"))
+
+    # Request tracing (see app/utils/tracing.py): TRACING_EXPORTER is console,
+    # file (JSON lines at TRACING_FILE) or otlp (OTLP/HTTP JSON collector endpoint)
+    TRACING_ENABLED: bool = os.getenv("TRACING_ENABLED", "False").lower() == "true"
+    TRACING_EXPORTER: str = os.getenv("TRACING_EXPORTER", "console")
+    TRACING_FILE: str = os.getenv("TRACING_FILE", "")
+    TRACING_OTLP_ENDPOINT: str = os.getenv("TRACING_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+    TRACING_SERVICE_NAME: str = os.getenv("TRACING_SERVICE_NAME", "mailsentra-api")
+    TRACING_SAMPLE_RATIO: float = float(os.getenv("TRACING_SAMPLE_RATIO", "1.0"))
+
+    # Cold-start budget checked by tests/test_startup.py and benchmarks/startup.py
+    # (median measured at 2.1s without a trained model; ~5s with one to load and warm up)
+    STARTUP_BUDGET_SECONDS: float = float(os.getenv("STARTUP_BUDGET_SECONDS", "3"))
+
+    # Logging (see app/utils/logger.py): LOG_FORMAT is text or json; LOG_SAMPLE_RATES
+    # keeps that fraction of INFO/DEBUG records per logger prefix ("app.hot" = per-request lines)
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO")
+    LOG_FORMAT: str = os.getenv("LOG_FORMAT", "text")
+    LOG_SAMPLE_RATES: str = os.getenv("LOG_SAMPLE_RATES", "app.hot=0.01")
+    LOG_QUEUE_ENABLED: bool = os.getenv("LOG_QUEUE_ENABLED", "True").lower() == "true"
     
     # CORS - environment-based
     BACKEND_CORS_ORIGINS: List[str] = os.getenv(
@@ -35,8 +131,27 @@ class Settings(BaseSettings):
     ADMIN_EMAIL: str = os.getenv("ADMIN_EMAIL", "")
     ADMIN_PASSWORD: str = os.getenv("ADMIN_PASSWORD", "")
     
-    # Rate Limiting
+    # Rate Limiting (token buckets per API key / user, see app/services/rate_limiter.py)
+    RATE_LIMIT_ENABLED: bool = os.getenv("RATE_LIMIT_ENABLED", "True").lower() == "true"
     RATE_LIMIT_PER_MINUTE: int = int(os.getenv("RATE_LIMIT_PER_MINUTE", "60"))
+    RATE_LIMIT_ANALYZE_PER_MINUTE: int = int(os.getenv("RATE_LIMIT_ANALYZE_PER_MINUTE", os.getenv("RATE_LIMIT_PER_MINUTE", "60")))
+    RATE_LIMIT_ANALYZE_BURST: int = int(os.getenv("RATE_LIMIT_ANALYZE_BURST", "20"))
+    # Batch quotas are charged per email, not per request
+    RATE_LIMIT_BATCH_PER_MINUTE: int = int(os.getenv("RATE_LIMIT_BATCH_PER_MINUTE", "600"))
+    RATE_LIMIT_BATCH_BURST: int = int(os.getenv("RATE_LIMIT_BATCH_BURST", "1000"))
+    RATE_LIMIT_SLOTS: int = int(os.getenv("RATE_LIMIT_SLOTS", "65536"))
+    RATE_LIMIT_REDIS_URL: str = os.getenv("RATE_LIMIT_REDIS_URL", "")
+    # Longest wait for a shared-memory bucket lock before the check fails open
+    RATE_LIMIT_LOCK_TIMEOUT_MS: int = int(os.getenv("RATE_LIMIT_LOCK_TIMEOUT_MS", "50"))
+    
+    # Response cache for admin dashboards (TTL in seconds, 0 disables an endpoint)
+    CACHE_ENABLED: bool = os.getenv("CACHE_ENABLED", "True").lower() == "true"
+    CACHE_REDIS_URL: str = os.getenv("CACHE_REDIS_URL", "")
+    CACHE_TTL_ADMIN_STATS: int = int(os.getenv("CACHE_TTL_ADMIN_STATS", "30"))
+    CACHE_TTL_ADMIN_HEALTH: int = int(os.getenv("CACHE_TTL_ADMIN_HEALTH", "10"))
+    CACHE_TTL_METRICS: int = int(os.getenv("CACHE_TTL_METRICS", "30"))
+    CACHE_TTL_ANALYTICS: int = int(os.getenv("CACHE_TTL_ANALYTICS", "60"))
+    CACHE_TTL_MODEL_VERSIONS: int = int(os.getenv("CACHE_TTL_MODEL_VERSIONS", "300"))
     
     # ML Model
     MODEL_PATH: str = os.getenv("MODEL_PATH", "./ml_models/spam_model.pkl")
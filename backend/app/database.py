@@ -1,21 +1,141 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from app.config import settings
 import os
 
+def _is_sqlite(database_url: str) -> bool:
+    return make_url(database_url).get_backend_name() == "sqlite"
+
+def _is_sqlite_memory(database_url: str) -> bool:
+    database = make_url(database_url).database
+    return not database or database == ":memory:"
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    Tune every new SQLite connection
+
+    WAL lets dashboard readers run while /analyze is writing, and
+    synchronous=NORMAL is durable under WAL except on power loss.
+    busy_timeout makes writers wait for the lock instead of failing
+    immediately with "database is locked".
+    """
+    cursor = dbapi_connection.cursor()
+    try:
+        cursor.execute(f"PRAGMA busy_timeout = {settings.SQLITE_BUSY_TIMEOUT_MS}")
+        cursor.execute("PRAGMA journal_mode = WAL")
+        cursor.execute("PRAGMA synchronous = NORMAL")
+        # Negative cache_size is in KiB rather than pages
+        cursor.execute(f"PRAGMA cache_size = -{settings.SQLITE_CACHE_SIZE_KB}")
+        cursor.execute(f"PRAGMA mmap_size = {settings.SQLITE_MMAP_SIZE}")
+        cursor.execute("PRAGMA temp_store = MEMORY")
+    finally:
+        cursor.close()
+
+def create_db_engine(database_url: str = None, echo: bool = False, tuned: bool = True):
+    """
+    Create a SQLAlchemy engine with the tuning for its backend applied
+
+    Args:
+        database_url: Database URL (defaults to settings.DATABASE_URL)
+        echo: Log every SQL statement
+        tuned: Apply SQLite pragmas / server pool settings (False gives
+            SQLAlchemy defaults, used by the concurrency benchmark)
+
+    Returns:
+        Configured Engine
+    """
+    database_url = database_url or settings.DATABASE_URL
+
+    if _is_sqlite(database_url):
+        engine_kwargs = {"connect_args": {"check_same_thread": False}}
+        if tuned:
+            engine_kwargs["connect_args"]["timeout"] = settings.SQLITE_BUSY_TIMEOUT_MS / 1000
+    else:
+        engine_kwargs = {}
+        if tuned:
+            engine_kwargs.update(
+                pool_size=settings.DB_POOL_SIZE,
+                max_overflow=settings.DB_MAX_OVERFLOW,
+                pool_timeout=settings.DB_POOL_TIMEOUT,
+                pool_recycle=settings.DB_POOL_RECYCLE,
+                pool_pre_ping=settings.DB_POOL_PRE_PING,
+            )
+
+    db_engine = create_engine(database_url, echo=echo, **engine_kwargs)
+
+    # WAL is meaningless for in-memory databases, which only exist per connection
+    if tuned and _is_sqlite(database_url) and not _is_sqlite_memory(database_url):
+        event.listen(db_engine, "connect", _set_sqlite_pragmas)
+
+    return db_engine
+
+def get_async_database_url(database_url: str) -> str:
+    """
+    Map a sync database URL to its async driver
+    sqlite -> sqlite+aiosqlite, postgresql -> postgresql+asyncpg
+    """
+    url = make_url(database_url)
+    backend = url.get_backend_name()
+    if backend == "sqlite":
+        url = url.set(drivername="sqlite+aiosqlite")
+    elif backend == "postgresql":
+        url = url.set(drivername="postgresql+asyncpg")
+    return url.render_as_string(hide_password=False)
+
+def create_async_db_engine(database_url: str = None, echo: bool = False):
+    """
+    Create an AsyncEngine with the same tuning as create_db_engine()
+
+    Args:
+        database_url: Sync-style database URL (defaults to settings.DATABASE_URL)
+        echo: Log every SQL statement
+
+    Returns:
+        Configured AsyncEngine
+    """
+    database_url = database_url or settings.DATABASE_URL
+    async_url = get_async_database_url(database_url)
+
+    if _is_sqlite(database_url):
+        engine_kwargs = {"connect_args": {"timeout": settings.SQLITE_BUSY_TIMEOUT_MS / 1000}}
+    else:
+        engine_kwargs = {
+            "pool_size": settings.DB_POOL_SIZE,
+            "max_overflow": settings.DB_MAX_OVERFLOW,
+            "pool_timeout": settings.DB_POOL_TIMEOUT,
+            "pool_recycle": settings.DB_POOL_RECYCLE,
+            "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        }
+
+    db_engine = create_async_engine(async_url, echo=echo, **engine_kwargs)
+
+    # Pragmas are applied through the sync facade of the async engine
+    if _is_sqlite(database_url) and not _is_sqlite_memory(database_url):
+        event.listen(db_engine.sync_engine, "connect", _set_sqlite_pragmas)
+
+    return db_engine
+
 # Create database engine
 # SQL echo can be enabled via DATABASE_ECHO environment variable (default: False)
 database_echo = os.getenv("DATABASE_ECHO", "False").lower() == "true"
-engine = create_engine(
-    settings.DATABASE_URL,
-    connect_args={"check_same_thread": False} if "sqlite" in settings.DATABASE_URL else {},
-    echo=database_echo
-)
+engine = create_db_engine(settings.DATABASE_URL, echo=database_echo)
 
 # Create session factory
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Async engine and session factory for the hot request path (analyze, logs, feedback, login)
+# expire_on_commit=False keeps ORM objects usable after commit without a lazy reload
+async_engine = create_async_db_engine(settings.DATABASE_URL, echo=database_echo)
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine,
+    class_=AsyncSession,
+    autoflush=False,
+    expire_on_commit=False,
+)
+
 # Base class for models
 Base = declarative_base()
 
@@ -30,6 +150,14 @@ def get_db():
     finally:
         db.close()
 
+async def get_async_db():
+    """
+    Dependency function to get an async database session
+    Usage: db: AsyncSession = Depends(get_async_db)
+    """
+    async with AsyncSessionLocal() as db:
+        yield db
+
 def init_db():
     """Initialize database - create all tables"""
-    Base.metadata.create_all(bind=engine)
\ No newline at end of file
+    Base.metadata.create_all(bind=engine)
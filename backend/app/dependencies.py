@@ -1,16 +1,25 @@
-from fastapi import Depends, HTTPException, status
-from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
-from app.database import get_db
+from fastapi import Depends, HTTPException, Security, status
+from fastapi.security import OAuth2PasswordBearer, APIKeyHeader
+from typing import Optional
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.database import get_async_db
 from app.models.user import User
 from app.utils.security import decode_access_token
+from app.services.auth_service import token_cache, principal_cache, authenticate_api_key
+from app.utils.tracing import traced
 
 # OAuth2 scheme for token authentication
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
-def get_current_user(
+# Optional schemes for routes that also accept machine clients
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login", auto_error=False)
+api_key_header = APIKeyHeader(name="X-API-Key", auto_error=False)
+
+@traced("auth.get_current_user")
+async def get_current_user(
     token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ) -> User:
     """
     Dependency to get the current authenticated user from JWT token
@@ -21,20 +30,27 @@ def get_current_user(
         headers={"WWW-Authenticate": "Bearer"},
     )
     
-    # Decode the token
-    payload = decode_access_token(token)
+    # Decode the token (cached per token until it expires)
+    payload = token_cache.get(token)
     if payload is None:
-        raise credentials_exception
+        payload = decode_access_token(token)
+        if payload is None:
+            raise credentials_exception
+        token_cache.set(token, payload)
     
     # Get user email from token
     email: str = payload.get("sub")
     if email is None:
         raise credentials_exception
     
-    # Get user from database
-    user = db.query(User).filter(User.email == email).first()
+    # Get user from the principal cache, falling back to the database
+    user = principal_cache.get(email)
     if user is None:
-        raise credentials_exception
+        result = await db.execute(select(User).where(User.email == email))
+        user = result.scalars().first()
+        if user is None:
+            raise credentials_exception
+        principal_cache.set(email, user)
     
     if not user.is_active:
         raise HTTPException(
@@ -52,7 +68,27 @@ def get_current_user(
     
     return user
 
-def get_current_active_user(
+@traced("auth.get_current_user_or_api_key")
+async def get_current_user_or_api_key(
+    api_key: Optional[str] = Security(api_key_header),
+    token: Optional[str] = Depends(optional_oauth2_scheme),
+    db: AsyncSession = Depends(get_async_db)
+) -> User:
+    """
+    Dependency for the analyze routes: accepts an X-API-Key header
+    (gateway integrations) or a bearer JWT (web dashboard)
+    """
+    if api_key:
+        return await authenticate_api_key(api_key, db)
+    if token:
+        return await get_current_user(token, db)
+    raise HTTPException(
+        status_code=status.HTTP_401_UNAUTHORIZED,
+        detail="Not authenticated",
+        headers={"WWW-Authenticate": "Bearer"},
+    )
+
+async def get_current_active_user(
     current_user: User = Depends(get_current_user)
 ) -> User:
     """
@@ -65,7 +101,7 @@ def get_current_active_user(
         )
     return current_user
 
-def get_current_admin_user(
+async def get_current_admin_user(
     current_user: User = Depends(get_current_user)
 ) -> User:
     """
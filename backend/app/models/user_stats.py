@@ -0,0 +1,32 @@
+from sqlalchemy import Column, Integer, DateTime, ForeignKey
+from sqlalchemy.orm import relationship
+from app.database import Base
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+NAIROBI_TZ = ZoneInfo("Africa/Nairobi")
+
+def get_nairobi_time():
+    """Get current time in Nairobi timezone"""
+    return datetime.now(NAIROBI_TZ)
+
+class UserStats(Base):
+    """Running per-user counters so dashboard stats don't scan spam_logs"""
+    __tablename__ = "user_stats"
+    
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), primary_key=True)
+    total_analyses = Column(Integer, nullable=False, default=0)
+    spam_detected = Column(Integer, nullable=False, default=0)
+    feedback_count = Column(Integer, nullable=False, default=0)
+    feedback_correct = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), default=get_nairobi_time, onupdate=get_nairobi_time)
+    
+    # Relationships
+    user = relationship("User", back_populates="stats")
+    
+    @property
+    def ham_detected(self) -> int:
+        return self.total_analyses - self.spam_detected
+    
+    def __repr__(self):
+        return f"<UserStats(user_id={self.user_id}, total={self.total_analyses}, spam={self.spam_detected})>"
@@ -1,4 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query 
+from fastapi.responses import FileResponse
 from sqlalchemy.orm import Session
 from sqlalchemy import func, desc, and_
 from datetime import datetime, timedelta
@@ -11,7 +12,21 @@ from app.models.spam_log import SpamLog
 from app.models.use_feedback import UserFeedback
 from app.models.api_key import APIKey
 from app.models.email import Email 
+from app.models.user_stats import UserStats
+from app.services.stats_service import rebuild_user_stats
+from app.services.analytics_queries import (
+    user_activity_counts, model_version_stats, find_inactive_users, deactivate_users
+)
 from app.dependencies import get_current_admin_user  
+from app.config import settings
+from app.utils.cache import cached_endpoint, invalidate_analytics_cache
+from app.services.auth_service import invalidate_user, invalidate_api_key, hash_api_key
+from app.services.hashing_service import password_hasher
+from app.services.profiler import profiler
+from app.services.drift_monitor import drift_monitor
+from app.services.model_service import spam_model
+from app.utils.timing import latency_registry
+from app.utils.startup import startup_profile
 
 router = APIRouter()
 
@@ -120,6 +135,7 @@ def create_user(
         db.add(new_user)
         db.commit()
         db.refresh(new_user)
+        invalidate_analytics_cache()
         
         return {
             "message": "User created successfully",
@@ -236,6 +252,8 @@ def update_user(
         
         db.commit()
         db.refresh(user)
+        invalidate_user(user.id)
+        invalidate_analytics_cache()
         
         return {
             "message": "User updated successfully",
@@ -281,10 +299,13 @@ def delete_user(
         db.query(APIKey).filter(APIKey.user_id == user_id).delete()
         db.query(UserFeedback).filter(UserFeedback.user_id == user_id).delete()
         db.query(SpamLog).filter(SpamLog.user_id == user_id).delete()
+        db.query(UserStats).filter(UserStats.user_id == user_id).delete()
         
         # Now delete the user
         db.delete(user)
         db.commit()
+        invalidate_user(user_id)
+        invalidate_analytics_cache()
         
         return {"message": f"User '{user.username}' deleted successfully"}
     except HTTPException:
@@ -298,6 +319,7 @@ def delete_user(
 
 #  SYSTEM ANALYTICS 
 @router.get("/stats")
+@cached_endpoint("admin:stats", ttl=settings.CACHE_TTL_ADMIN_STATS)
 def get_system_stats(
     current_user: User = Depends(get_current_admin_user),
     db: Session = Depends(get_db)
@@ -577,9 +599,11 @@ def generate_api_key(
         if data.expires_in_days:
             expires_at = datetime.utcnow() + timedelta(days=data.expires_in_days)
 
+        # Only the digest is stored; the raw key is returned once below
+        raw_key = APIKey.generate_key()
         api_key = APIKey(
             user_id=data.user_id,
-            key=APIKey.generate_key(),
+            key=hash_api_key(raw_key),
             name=data.name,
             expires_at=expires_at
         )
@@ -589,10 +613,10 @@ def generate_api_key(
         db.refresh(api_key)
 
         return {
-            "message": "API key generated successfully",
+            "message": "API key generated successfully. Save it securely, it will not be shown again.",
             "api_key": {
                 "id": api_key.id,
-                "key": api_key.key,
+                "key": raw_key,
                 "name": api_key.name,
                 "user_id": api_key.user_id,
                 "username": user.username,
@@ -624,8 +648,10 @@ def revoke_api_key(
                 detail="API key not found"
             )
 
+        stored_key = api_key.key
         db.delete(api_key)
         db.commit()
+        invalidate_api_key(stored_key)
 
         return {"message": "API key revoked successfully"}
     except HTTPException:
@@ -656,6 +682,7 @@ def toggle_api_key_active(
         api_key.is_active = is_active
         db.commit()
         db.refresh(api_key)
+        invalidate_api_key(api_key.key)
 
         return {
             "message": f"API key {'activated' if is_active else 'deactivated'} successfully",
@@ -682,37 +709,14 @@ def get_model_info(
 ):
     """Get ML model information"""
     try:
-        model_versions = db.query(
-            SpamLog.model_version,
-            func.count(SpamLog.id).label('count')
-        ).group_by(SpamLog.model_version).all()
-
         avg_confidence = db.query(func.avg(SpamLog.confidence)).scalar() or 0
 
-        version_stats = []
-        for version, count in model_versions:
-            version_logs = db.query(SpamLog).filter(SpamLog.model_version == version).all()
-            feedbacks = db.query(UserFeedback).join(SpamLog).filter(
-                SpamLog.model_version == version
-            ).all()
-
-            correct = sum(
-                1 for f in feedbacks
-                if f.original_result and f.corrected_result and f.original_result.strip().lower() == f.corrected_result.strip().lower()
-            )
-            accuracy = (correct / len(feedbacks) * 100) if feedbacks else 0
-
-            version_stats.append({
-                "version": version or "Unknown",
-                "total_predictions": count,
-                "total_feedback": len(feedbacks),
-                "accuracy": round(accuracy, 2)
-            })
+        version_stats = model_version_stats(db)
 
         return {
             "average_confidence": round(avg_confidence, 4),
             "model_versions": version_stats,
-            "total_predictions": db.query(SpamLog).count()
+            "total_predictions": sum(v["total_predictions"] for v in version_stats)
         }
     except Exception as e:
         raise HTTPException(
@@ -804,6 +808,7 @@ def get_model_performance(
 
 #  SYSTEM HEALTH 
 @router.get("/health")
+@cached_endpoint("admin:health", ttl=settings.CACHE_TTL_ADMIN_HEALTH)
 def get_system_health(
     current_user: User = Depends(get_current_admin_user),
     db: Session = Depends(get_db)
@@ -849,6 +854,102 @@ def get_system_health(
             "timestamp": datetime.utcnow().isoformat()
         }
 
+@router.get("/health/password-hashing")
+def get_password_hashing_stats(
+    current_user: User = Depends(get_current_admin_user)
+):
+    """Queue depth and latency of the password hashing pool (not cached)"""
+    return password_hasher.stats()
+
+@router.get("/health/latency")
+def get_stage_latency(
+    current_user: User = Depends(get_current_admin_user)
+):
+    """Per-stage inference latency histograms since worker start (not cached)"""
+    return latency_registry.snapshot()
+
+@router.get("/health/startup")
+def get_startup_profile(
+    current_user: User = Depends(get_current_admin_user)
+):
+    """Cold-start phases of this worker (imports, app setup, warm-up) and time to ready"""
+    return {**startup_profile.snapshot(), "model_load_ms": round(spam_model.load_duration_ms, 2)}
+
+@router.get("/health/drift")
+def get_drift(
+    model_version: Optional[str] = Query(None, description="Only this model version"),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """
+    Live score distribution and vocabulary drift per model version (not cached)
+    
+    Each time bucket reports spam_probability quantiles, score_psi against the
+    version's first completed bucket, the share of tokens the vectorizer has
+    never seen and the most frequent of those tokens. Covers this worker only.
+    """
+    return drift_monitor.snapshot(model_version)
+
+#  PROFILING 
+def _profiler_enabled():
+    if not settings.PROFILER_ENABLED:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profiler is disabled")
+
+@router.post("/profiler/start", dependencies=[Depends(_profiler_enabled)])
+def start_profile(
+    duration: float = Query(30, gt=0, description="Seconds to profile (capped at PROFILER_MAX_SECONDS)"),
+    interval_ms: float = Query(5, ge=1, le=1000, description="Milliseconds between stack samples"),
+    route: Optional[str] = Query(None, description="Only sample while requests under this path prefix run, e.g. /api/analyze"),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """Start a sampling profile of the worker that handles this request"""
+    try:
+        meta = profiler.start(duration, interval_ms, route)
+    except RuntimeError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    return meta
+
+@router.post("/profiler/stop", dependencies=[Depends(_profiler_enabled)])
+def stop_profile(
+    current_user: User = Depends(get_current_admin_user)
+):
+    """Finish this worker's running profile early"""
+    if profiler.session is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="No profile running in this worker")
+    profile_id = profiler.session.profile_id
+    profiler.stop()
+    return {"profile_id": profile_id, "status": "stopping"}
+
+@router.get("/profiler", dependencies=[Depends(_profiler_enabled)])
+def list_profiles(
+    current_user: User = Depends(get_current_admin_user)
+):
+    """Profiles from all workers on this host, newest first"""
+    return profiler.list()
+
+@router.get("/profiler/{profile_id}", dependencies=[Depends(_profiler_enabled)])
+def get_profile(
+    profile_id: str,
+    format: str = Query("summary", pattern="^(summary|collapsed)$", description="summary (JSON) or collapsed stacks"),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """
+    Profile results: hottest functions as JSON, or collapsed stacks to feed
+    flamegraph.pl / speedscope
+    """
+    try:
+        meta = profiler.get(profile_id)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    if meta is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Profile not found")
+    if meta["status"] != "finished" or format == "summary":
+        return meta
+    return FileResponse(
+        profiler.collapsed_path(profile_id),
+        media_type="text/plain",
+        filename=f"profile-{profile_id}.collapsed.txt"
+    )
+
 #  BULK OPERATIONS 
 @router.post("/bulk/deactivate-inactive-users")
 def deactivate_inactive_users(
@@ -860,29 +961,12 @@ def deactivate_inactive_users(
     try:
         cutoff_date = datetime.utcnow() - timedelta(days=days_inactive)
 
-        inactive_users = db.query(User).filter(
-            User.is_active == True,
-            User.is_admin == False,
-            User.id != current_user.id
-        ).all()
-
-        deactivated = []
-        for user in inactive_users:
-            last_scan = db.query(SpamLog).filter(
-                SpamLog.user_id == user.id
-            ).order_by(desc(SpamLog.created_at)).first()
-
-            last_activity = last_scan.created_at if last_scan else user.created_at
-
-            if last_activity < cutoff_date:
-                user.is_active = False
-                deactivated.append({
-                    "id": user.id,
-                    "username": user.username,
-                    "last_activity": last_activity
-                })
+        deactivated = find_inactive_users(db, cutoff_date, exclude_user_id=current_user.id)
+        deactivate_users(db, [user["id"] for user in deactivated])
 
         db.commit()
+        invalidate_user(*[user["id"] for user in deactivated])
+        invalidate_analytics_cache()
 
         return {
             "message": f"Deactivated {len(deactivated)} inactive users",
@@ -908,7 +992,9 @@ def delete_old_logs(
             # Delete all logs
             count = db.query(SpamLog).count()
             db.query(SpamLog).delete()
+            rebuild_user_stats(db)
             db.commit()
+            invalidate_analytics_cache()
             return {
                 "message": f"Deleted all {count} spam logs",
                 "days_threshold": 0,
@@ -918,7 +1004,9 @@ def delete_old_logs(
             cutoff_date = datetime.utcnow() - timedelta(days=days_old)
             count = db.query(SpamLog).filter(SpamLog.created_at < cutoff_date).count()
             db.query(SpamLog).filter(SpamLog.created_at < cutoff_date).delete()
+            rebuild_user_stats(db)
             db.commit()
+            invalidate_analytics_cache()
             return {
                 "message": f"Deleted {count} old spam logs",
                 "days_threshold": days_old,
@@ -939,23 +1027,19 @@ def export_users_data(
 ):
     """Export all user data"""
     try:
-        users = db.query(User).all()
-
-        export_data = []
-        for user in users:
-            total_scans = db.query(SpamLog).filter(SpamLog.user_id == user.id).count()
-            total_feedback = db.query(UserFeedback).filter(UserFeedback.user_id == user.id).count()
-
-            export_data.append({
-                "id": user.id,
-                "username": user.username,
-                "email": user.email,
-                "is_active": user.is_active,
-                "is_admin": user.is_admin,
-                "total_scans": total_scans,
-                "total_feedback": total_feedback,
-                "created_at": user.created_at.isoformat() if user.created_at else None
-            })
+        export_data = [
+            {
+                "id": row["user_id"],
+                "username": row["username"],
+                "email": row["email"],
+                "is_active": row["is_active"],
+                "is_admin": row["is_admin"],
+                "total_scans": row["total_scans"],
+                "total_feedback": row["feedback_count"],
+                "created_at": row["created_at"].isoformat() if row["created_at"] else None
+            }
+            for row in user_activity_counts(db)
+        ]
 
         return {
             "total_users": len(export_data),
@@ -1,18 +1,28 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 from typing import Dict, Any, Optional
-from app.database import get_db
+from app.database import get_async_db
 from app.models.spam_log import SpamLog
 from app.services.model_service import spam_model
-from app.dependencies import get_current_user
+from app.services.stats_service import record_analysis
+from app.services.rate_limiter import rate_limit, rate_limit_key
+from app.services.stream_service import classify_ndjson_stream, NDJSONStreamingResponse
+from app.services.idempotency import idempotency_store, request_fingerprint
+from app.dependencies import get_current_user_or_api_key
 from app.models.user import User
 from app.utils.sanitize import sanitize_email_text
+from app.utils.logger import hot_logger
+from app.utils.timing import timed
+from app.utils.content_negotiation import MsgPackRoute, MSGPACK_MEDIA_TYPE, accepts_msgpack, is_msgpack_request
 from datetime import datetime
 import logging
 
-router = APIRouter()
+router = APIRouter(route_class=MsgPackRoute)
 logger = logging.getLogger(__name__)
+# Per-request lines (sampled, see app/utils/logger.py)
+request_logger = hot_logger("analyze")
 
 class AnalyzeRequest(BaseModel):
     email_text: str
@@ -24,30 +34,64 @@ class AnalyzeResponse(BaseModel):
     is_spam: bool
     message: str
     model_version: str
-    processed_text: str
+    processed_text: Optional[str] = None
     original_length: int
     processed_length: int
+    log_id: Optional[int] = None
 
-@router.post("/analyze", response_model=AnalyzeResponse)
-def analyze_email(
+@router.post(
+    "/analyze",
+    response_model=AnalyzeResponse,
+    response_model_exclude_none=True,
+    dependencies=[Depends(rate_limit("analyze"))]
+)
+async def analyze_email(
     request: AnalyzeRequest,
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    response: Response,
+    include_processed_text: bool = Query(True, description="Echo the preprocessed text back (set false to save bandwidth)"),
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
+    current_user: User = Depends(get_current_user_or_api_key),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Analyze email for spam
-    Requires authentication
+    Requires authentication (bearer token or X-API-Key header)
+    
+    With an Idempotency-Key header, retries of the same request return the
+    stored result and log_id instead of classifying and logging again.
     
     Args:
         request: Email text to analyze
+        include_processed_text: Whether to return processed_text
+        idempotency_key: Optional client-generated key for safe retries
         current_user: Authenticated user
         db: Database session
         
     Returns:
         Analysis result with confidence score
     """
+    if idempotency_key is None:
+        return await _run_analysis(request, include_processed_text, current_user, db)
+    
+    result, replayed = await idempotency_store.run(
+        tenant=f"user:{current_user.id}",
+        idempotency_key=idempotency_key,
+        fingerprint=request_fingerprint(request, include_processed_text),
+        compute=lambda: _run_analysis(request, include_processed_text, current_user, db)
+    )
+    if replayed:
+        response.headers["Idempotent-Replayed"] = "true"
+    return result
+
+async def _run_analysis(
+    request: AnalyzeRequest,
+    include_processed_text: bool,
+    current_user: User,
+    db: AsyncSession
+) -> AnalyzeResponse:
+    """Classify, log and count one email"""
     try:
-        logger.info(f"Analyzing email for user {current_user.id}")
+        request_logger.debug("Analyzing email for user %s", current_user.id)
         
         if not request.email_text or len(request.email_text.strip()) == 0:
             raise HTTPException(
@@ -55,8 +99,8 @@ def analyze_email(
                 detail="Email text cannot be empty"
             )
         
-        # Get prediction from model
-        prediction_result = spam_model.predict(request.email_text)
+        # Get prediction from model (CPU-bound, keep it off the event loop)
+        prediction_result = await run_in_threadpool(spam_model.predict, request.email_text)
         
         if "error" in prediction_result:
             raise HTTPException(
@@ -84,10 +128,14 @@ def analyze_email(
         )
         
         db.add(spam_log)
-        db.commit()
-        db.refresh(spam_log)
+        await record_analysis(db, current_user.id, result)
+        with timed("db_commit"):
+            await db.commit()
         
-        logger.info(f"Analysis complete: {result.upper()} (confidence: {confidence*100:.2f}%)")
+        request_logger.info(
+            "Analysis complete: %s (confidence: %.2f%%)", result, confidence * 100,
+            extra={"user_id": current_user.id, "verdict": result, "confidence": confidence}
+        )
         
         return AnalyzeResponse(
             result=result,
@@ -95,9 +143,10 @@ def analyze_email(
             is_spam=is_spam,
             message=f"Email classified as {result.upper()} with {confidence*100:.2f}% confidence",
             model_version=prediction_result.get("model_version", "unknown"),
-            processed_text=prediction_result.get("processed_text", ""),
+            processed_text=prediction_result.get("processed_text", "") if include_processed_text else None,
             original_length=prediction_result.get("original_length", 0),
-            processed_length=prediction_result.get("processed_length", 0)
+            processed_length=prediction_result.get("processed_length", 0),
+            log_id=spam_log.id
         )
         
     except HTTPException:
@@ -109,6 +158,50 @@ def analyze_email(
             detail=f"Analysis failed: {str(e)}"
         )
 
+@router.post("/stream")
+async def analyze_stream(
+    http_request: Request,
+    current_user: User = Depends(get_current_user_or_api_key)
+):
+    """
+    Classify a stream of emails
+    Requires authentication (bearer token or X-API-Key header)
+    
+    Request body is NDJSON, one {"email_text": ..., "email_id": ...} object per
+    line. The response is NDJSON with one verdict (or error) per input line,
+    in input order, followed by a {"summary": ...} line. Verdicts are sent as
+    each chunk is classified and logged, so archives of any size can be piped
+    through a single connection. Throughput is limited by the batch quota.
+    
+    Machine clients may send concatenated msgpack maps instead
+    (Content-Type: application/msgpack) and/or receive them (Accept).
+    
+    Args:
+        http_request: Raw request (body is read incrementally)
+        current_user: Authenticated user
+        
+    Returns:
+        application/x-ndjson streaming response
+    """
+    if not spam_model.is_loaded:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Model not loaded"
+        )
+    
+    request_logger.info("Streaming analysis started for user %s", current_user.id, extra={"user_id": current_user.id})
+    msgpack_out = accepts_msgpack(http_request.headers)
+    return NDJSONStreamingResponse(
+        classify_ndjson_stream(
+            http_request.receive,
+            user_id=current_user.id,
+            tenant_key=rate_limit_key(http_request, current_user),
+            msgpack_in=is_msgpack_request(http_request.headers),
+            msgpack_out=msgpack_out
+        ),
+        media_type=MSGPACK_MEDIA_TYPE if msgpack_out else None
+    )
+
 @router.get("/model/info")
 def get_model_info():
     """
@@ -5,13 +5,13 @@ from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from datetime import datetime, timedelta
 import secrets
-import hashlib
 
 from app.models.api_key import APIKey
 from app.database import get_db
 from app.models.user import User
 from app.models.api_key import APIKey
 from app.dependencies import get_current_user
+from app.services.auth_service import hash_api_key, invalidate_api_key
 
 router = APIRouter()
 
@@ -27,11 +27,6 @@ class GenerateKeyResponse(BaseModel):
     message: str
 
 
-def hash_api_key(key: str) -> str:
-    """Hash API key for storage."""
-    return hashlib.sha256(key.encode()).hexdigest()
-
-
 def generate_api_key() -> str:
     """Generate a secure API key."""
     return secrets.token_urlsafe(32)
@@ -137,8 +132,10 @@ def revoke_api_key(
                 detail="API key not found"
             )
         
+        stored_key = key.key
         db.delete(key)
         db.commit()
+        invalidate_api_key(stored_key)
         
         return {"message": "API key revoked successfully"}
         
@@ -154,6 +151,8 @@ def revoke_api_key(
 def verify_api_key(key: str, db: Session) -> APIKey:
     """
     Verify API key and return key object.
+    Sync, uncached variant that records usage immediately; request paths
+    should use app.dependencies.get_current_user_or_api_key instead.
     """
     key_hash = hash_api_key(key)
     
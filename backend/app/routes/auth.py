@@ -1,11 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy import select
 from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel, EmailStr
 import re
-from app.database import get_db
+from app.database import get_db, get_async_db
 from app.models.user import User
-from app.utils.security import verify_password, get_password_hash, create_access_token, create_refresh_token
+from app.utils.security import create_access_token, create_refresh_token
+from app.services.hashing_service import password_hasher
 from app.dependencies import get_current_user
 
 router = APIRouter()
@@ -33,12 +36,13 @@ class Token(BaseModel):
 
 
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-def register_user(user_data: UserRegister, db: Session = Depends(get_db)):
+async def register_user(user_data: UserRegister, db: AsyncSession = Depends(get_async_db)):
     """
     Register a new user
     """
     # Check if username already exists
-    existing_user = db.query(User).filter(User.username == user_data.username).first()
+    result = await db.execute(select(User.id).where(User.username == user_data.username))
+    existing_user = result.first()
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -46,7 +50,8 @@ def register_user(user_data: UserRegister, db: Session = Depends(get_db)):
         )
 
     # Check if email already exists
-    existing_email = db.query(User).filter(User.email == user_data.email).first()
+    result = await db.execute(select(User.id).where(User.email == user_data.email))
+    existing_email = result.first()
     if existing_email:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -67,8 +72,8 @@ def register_user(user_data: UserRegister, db: Session = Depends(get_db)):
             detail="Username must be 3-50 characters, alphanumeric with underscores only"
         )
 
-    # Create new user
-    hashed_password = get_password_hash(user_data.password)
+    # Create new user (hashing runs in the bounded hashing pool)
+    hashed_password = await password_hasher.hash(user_data.password)
     new_user = User(
         username=user_data.username,
         email=user_data.email,
@@ -78,22 +83,23 @@ def register_user(user_data: UserRegister, db: Session = Depends(get_db)):
     )
 
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
 
     return new_user
 
 @router.post("/login", response_model=Token)
-def login(
+async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Login user and return JWT token
     OAuth2 compatible...uses 'username' field for email
     """
     # Find user by email (OAuth2 uses 'username' field)
-    user = db.query(User).filter(User.email == form_data.username).first()
+    result = await db.execute(select(User).where(User.email == form_data.username))
+    user = result.scalars().first()
 
     if not user:
         raise HTTPException(
@@ -102,8 +108,8 @@ def login(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-    # Verify password
-    if not verify_password(form_data.password, user.hashed_password):
+    # Verify password (deliberately slow hash, runs in the bounded hashing pool)
+    if not await password_hasher.verify(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
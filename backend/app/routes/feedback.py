@@ -1,12 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from pydantic import BaseModel
 from typing import Optional
-from app.database import get_db
+from app.database import get_async_db
 from app.models.use_feedback import UserFeedback
 from app.models.spam_log import SpamLog
 from app.dependencies import get_current_user
 from app.models.user import User
+from app.services.stats_service import record_feedback, set_feedback_verdict
 
 router = APIRouter()
 
@@ -26,10 +29,10 @@ class FeedbackResponse(BaseModel):
         from_attributes = True
 
 @router.post("/feedback", response_model=FeedbackResponse, status_code=status.HTTP_201_CREATED)
-def submit_feedback(
+async def submit_feedback(
     feedback_data: FeedbackCreate,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Submit feedback to correct a spam classification
@@ -45,10 +48,11 @@ def submit_feedback(
     """
     try:
         # Verify the spam log exists and belongs to the user
-        spam_log = db.query(SpamLog).filter(
+        result = await db.execute(select(SpamLog).where(
             SpamLog.id == feedback_data.spam_log_id,
             SpamLog.user_id == current_user.id
-        ).first()
+        ))
+        spam_log = result.scalars().first()
         
         if not spam_log:
             raise HTTPException(
@@ -68,21 +72,25 @@ def submit_feedback(
         # Normalize to lowercase
         feedback_data.corrected_result = corrected
         
+        # Update spam log is_correct field; the transition it made decides the counters
+        # and whether this is the log's first feedback (see set_feedback_verdict)
+        is_correct = spam_log.result.lower() == feedback_data.corrected_result.lower()
+        previous_is_correct = await set_feedback_verdict(db, spam_log.id, is_correct)
+        await record_feedback(db, current_user.id, previous_is_correct, is_correct)
+        
         # Check if feedback already exists for this log
-        existing_feedback = db.query(UserFeedback).filter(
-            UserFeedback.spam_log_id == feedback_data.spam_log_id
-        ).first()
+        existing_feedback = None
+        if previous_is_correct is not None:
+            result = await db.execute(select(UserFeedback).where(
+                UserFeedback.spam_log_id == feedback_data.spam_log_id
+            ))
+            existing_feedback = result.scalars().first()
         
         if existing_feedback:
             # Update existing feedback
             existing_feedback.corrected_result = feedback_data.corrected_result
             existing_feedback.comment = feedback_data.comment
-            db.commit()
-            db.refresh(existing_feedback)
-            
-            # Update spam log is_correct field
-            spam_log.is_correct = (spam_log.result.lower() == feedback_data.corrected_result.lower())
-            db.commit()
+            await db.commit()
             
             return existing_feedback
         
@@ -96,37 +104,33 @@ def submit_feedback(
         )
         
         db.add(new_feedback)
-        
-        # Update spam log is_correct field
-        spam_log.is_correct = (spam_log.result.lower() == feedback_data.corrected_result.lower())
-        
-        db.commit()
-        db.refresh(new_feedback)
+        await db.commit()
         
         return new_feedback
         
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to submit feedback: {str(e)}"
         )
 
 @router.get("/feedback/count")
-def get_feedback_count(
+async def get_feedback_count(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Get count of feedback submissions by current user
     Requires authentication
     """
     try:
-        count = db.query(UserFeedback).filter(
-            UserFeedback.user_id == current_user.id
-        ).count()
+        result = await db.execute(
+            select(func.count(UserFeedback.id)).where(UserFeedback.user_id == current_user.id)
+        )
+        count = result.scalar_one()
         
         return {
             "total_feedback": count
@@ -139,14 +143,15 @@ def get_feedback_count(
         )
 
 @router.delete("/feedback/{feedback_id}", status_code=status.HTTP_200_OK)
-def delete_feedback(
+async def delete_feedback(
     feedback_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Delete a feedback entry (admin only or owner)"""
     try:
-        feedback = db.query(UserFeedback).filter(UserFeedback.id == feedback_id).first()
+        result = await db.execute(select(UserFeedback).where(UserFeedback.id == feedback_id))
+        feedback = result.scalars().first()
         
         if not feedback:
             raise HTTPException(
@@ -161,15 +166,15 @@ def delete_feedback(
                 detail="Not authorized to delete this feedback"
             )
         
-        db.delete(feedback)
-        db.commit()
+        await db.delete(feedback)
+        await db.commit()
         
         return {"message": "Feedback deleted successfully"}
         
     except HTTPException:
         raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to delete feedback: {str(e)}"
@@ -177,14 +182,20 @@ def delete_feedback(
 
 
 @router.get("/feedback/{feedback_id}/details")
-def get_feedback_details(
+async def get_feedback_details(
     feedback_id: int,
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get detailed feedback with original email text"""
     try:
-        feedback = db.query(UserFeedback).filter(UserFeedback.id == feedback_id).first()
+        # Relationships cannot lazy-load on an AsyncSession, so load the user up front
+        result = await db.execute(
+            select(UserFeedback)
+            .options(selectinload(UserFeedback.user))
+            .where(UserFeedback.id == feedback_id)
+        )
+        feedback = result.scalars().first()
         
         if not feedback:
             raise HTTPException(
@@ -193,7 +204,8 @@ def get_feedback_details(
             )
         
         # Get the related spam log
-        spam_log = db.query(SpamLog).filter(SpamLog.id == feedback.spam_log_id).first()
+        result = await db.execute(select(SpamLog).where(SpamLog.id == feedback.spam_log_id))
+        spam_log = result.scalars().first()
         
         return {
             "id": feedback.id,
@@ -1,14 +1,17 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from pydantic import BaseModel
 from datetime import datetime
-from app.database import get_db
+from app.database import get_async_db
 from app.models.spam_log import SpamLog
 from app.dependencies import get_current_user
 from app.models.user import User
+from app.services.stats_service import get_user_stats
+from app.utils.content_negotiation import MsgPackRoute
 
-router = APIRouter()
+router = APIRouter(route_class=MsgPackRoute)
 
 class SpamLogResponse(BaseModel):
     id: int
@@ -23,12 +26,12 @@ class SpamLogResponse(BaseModel):
         from_attributes = True
 
 @router.get("/logs", response_model=List[SpamLogResponse])
-def get_user_logs(
+async def get_user_logs(
     limit: int = Query(10, ge=1, le=100),
     offset: int = Query(0, ge=0),
     result_filter: Optional[str] = Query(None, description="Filter by result: spam, ham"),
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Get user's spam analysis logs
@@ -46,19 +49,18 @@ def get_user_logs(
     """
     try:
         # Base query for user's logs
-        query = db.query(SpamLog).filter(SpamLog.user_id == current_user.id)
+        query = select(SpamLog).where(SpamLog.user_id == current_user.id)
         
         # Apply filter if provided
         if result_filter:
-            query = query.filter(SpamLog.result.ilike(f"%{result_filter}%"))
+            query = query.where(SpamLog.result.ilike(f"%{result_filter}%"))
         
         # Order by created_at descending (newest first)
         query = query.order_by(SpamLog.created_at.desc())
         
         # Apply pagination
-        logs = query.offset(offset).limit(limit).all()
-        
-        total_count = query.count()
+        result = await db.execute(query.offset(offset).limit(limit))
+        logs = result.scalars().all()
         
         return logs
         
@@ -69,9 +71,9 @@ def get_user_logs(
         )
 
 @router.get("/logs/stats")
-def get_logs_stats(
+async def get_logs_stats(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Get statistics for user's logs
@@ -81,17 +83,17 @@ def get_logs_stats(
         Statistics: total, spam count, ham count, accuracy rate
     """
     try:
-        # Get all logs for user
-        all_logs = db.query(SpamLog).filter(SpamLog.user_id == current_user.id).all()
+        # Running counters maintained on every analyze/feedback write
+        stats = await get_user_stats(db, current_user.id)
         
-        total = len(all_logs)
-        spam_count = sum(1 for log in all_logs if log.result.lower() == "spam")
-        ham_count = total - spam_count
+        total = stats["total_analyses"]
+        spam_count = stats["spam_detected"]
+        ham_count = stats["ham_detected"]
         
         # Get accuracy (logs with feedback)
-        feedback_logs = [log for log in all_logs if log.is_correct is not None]
-        accurate = sum(1 for log in feedback_logs if log.is_correct)
-        feedback_accuracy = (accurate / len(feedback_logs)) * 100 if feedback_logs else None
+        feedback_count = stats["feedback_count"]
+        accurate = stats["feedback_correct"]
+        feedback_accuracy = (accurate / feedback_count) * 100 if feedback_count else None
         
         # Get model accuracy from model service (always show this as primary)
         from app.services.model_service import spam_model
@@ -107,7 +109,7 @@ def get_logs_stats(
             "total_analyses": total,
             "spam_detected": spam_count,
             "ham_detected": ham_count,
-            "feedback_count": len(feedback_logs),
+            "feedback_count": feedback_count,
             "accuracy_rate": round(final_accuracy, 2),
             "spam_percentage": round((spam_count / total * 100), 2) if total > 0 else 0
         }
@@ -119,20 +121,20 @@ def get_logs_stats(
         )
 
 @router.get("/dashboard/stats")
-def get_dashboard_stats(
+async def get_dashboard_stats(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Get dashboard statistics (alias for /logs/stats)
     This endpoint exists to support frontend polling
     """
-    return get_logs_stats(current_user, db)
+    return await get_logs_stats(current_user, db)
 
 @router.get("/alerts")
-def get_alerts(
+async def get_alerts(
     current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """
     Get system alerts and notifications
@@ -10,6 +10,9 @@ from app.models.spam_log import SpamLog
 from app.models.user import User
 from app.models.use_feedback import UserFeedback
 from app.dependencies import get_current_admin_user
+from app.config import settings
+from app.utils.cache import cached_endpoint
+from app.services.analytics_queries import user_activity_counts
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -31,6 +34,7 @@ class AnalyticsResponse(BaseModel):
     user_activity: List[Dict[str, Any]]
 
 @router.get("/metrics", response_model=MetricsResponse)
+@cached_endpoint("metrics:metrics", ttl=settings.CACHE_TTL_METRICS)
 def get_system_metrics(
     current_user: User = Depends(get_current_admin_user),
     db: Session = Depends(get_db)
@@ -85,6 +89,7 @@ def get_system_metrics(
         )
 
 @router.get("/analytics", response_model=AnalyticsResponse)
+@cached_endpoint("metrics:analytics", ttl=settings.CACHE_TTL_ANALYTICS, vary_on=("days",))
 def get_analytics(
     days: int = 30,
     current_user: User = Depends(get_current_admin_user),
@@ -130,19 +135,16 @@ def get_analytics(
                 'rate': round(spam_rate, 2)
             })
 
-        users = db.query(User).all()
-        user_activity = []
-        for user in users:
-            user_logs_count = db.query(SpamLog).filter(SpamLog.user_id == user.id).count()
-            user_feedback_count = db.query(UserFeedback).filter(UserFeedback.user_id == user.id).count()
-
-            user_activity.append({
-                'user_id': user.id,
-                'username': user.username,
-                'total_scans': user_logs_count,
-                'feedback_count': user_feedback_count,
-                'registration_date': user.created_at.isoformat() if user.created_at else None
-            })
+        user_activity = [
+            {
+                'user_id': row['user_id'],
+                'username': row['username'],
+                'total_scans': row['total_scans'],
+                'feedback_count': row['feedback_count'],
+                'registration_date': row['created_at'].isoformat() if row['created_at'] else None
+            }
+            for row in user_activity_counts(db)
+        ]
 
         return AnalyticsResponse(
             daily_stats=daily_stats_list,
@@ -8,12 +8,15 @@ from sqlalchemy.orm import Session
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
 from pathlib import Path
-import pickle
 import logging
 
 from app.database import get_db
 from app.dependencies import get_current_admin_user
 from app.models.user import User
+from app.config import settings
+from app.services.model_service import spam_model
+from app.utils.cache import cached_endpoint, invalidate_model_cache
+from app.utils.model_cost import load_artifact, cost_report
 
 router = APIRouter()
 logger = logging.getLogger(__name__)
@@ -28,6 +31,9 @@ class ModelVersionInfo(BaseModel):
     features_count: int
     metrics: Optional[Dict[str, Any]] = None
     vectorizer_type: Optional[str] = None
+    footprint: Optional[Dict[str, Any]] = None
+    inference_benchmark: Optional[Dict[str, Any]] = None
+    load_time_ms: Optional[float] = None
 
 class StorageInfo(BaseModel):
     total_models: int
@@ -48,6 +54,7 @@ class CleanupResponse(BaseModel):
     deleted_files: Optional[List[str]] = None
 
 @router.get("/versions", response_model=Dict[str, Any])
+@cached_endpoint("model:versions", ttl=settings.CACHE_TTL_MODEL_VERSIONS)
 def get_all_model_versions(
     current_user: User = Depends(get_current_admin_user)
 ):
@@ -81,8 +88,7 @@ def get_all_model_versions(
         
         for model_file in model_files:
             try:
-                with open(model_file, 'rb') as f:
-                    metadata = pickle.load(f)
+                metadata, load_time_ms = load_artifact(model_file)
                 
                 models_info.append({
                     'version': metadata.get('version', 'unknown'),
@@ -93,7 +99,8 @@ def get_all_model_versions(
                     'algorithm': metadata.get('algorithm', 'unknown'),
                     'file_size_kb': round(model_file.stat().st_size / 1024, 2),
                     'features_count': metadata.get('features_count', 0),
-                    'vectorizer_type': metadata.get('vectorizer_type', 'unknown')
+                    'vectorizer_type': metadata.get('vectorizer_type', 'unknown'),
+                    **cost_report(metadata, load_time_ms)
                 })
             except Exception as e:
                 logger.warning(f"Could not read {model_file.name}: {e}")
@@ -147,8 +154,7 @@ def get_current_model_info(
                 detail="No active model found"
             )
         
-        with open(model_path, 'rb') as f:
-            metadata = pickle.load(f)
+        metadata, load_time_ms = load_artifact(model_path)
         
         return {
             'version': metadata.get('version', 'unknown'),
@@ -159,7 +165,10 @@ def get_current_model_info(
             'algorithm': metadata.get('algorithm', 'unknown'),
             'features_count': metadata.get('features_count', 0),
             'vectorizer_type': metadata.get('vectorizer_type', 'unknown'),
-            'file_size_kb': round(model_path.stat().st_size / 1024, 2)
+            'file_size_kb': round(model_path.stat().st_size / 1024, 2),
+            **cost_report(metadata, load_time_ms),
+            # Measured when the serving model was last (re)loaded in this worker
+            'serving_load_time_ms': round(spam_model.load_duration_ms, 2) if spam_model.is_loaded else None
         }
         
     except HTTPException:
@@ -199,6 +208,7 @@ def cleanup_old_models_endpoint(
         
         from app.utils.model_cleanup import cleanup_old_models
         result = cleanup_old_models(keep_latest=keep_latest)
+        invalidate_model_cache()
         
         if not result['success']:
             raise HTTPException(
@@ -240,6 +250,7 @@ def delete_model_version(
     try:
         from app.utils.model_cleanup import delete_specific_model
         result = delete_specific_model(version)
+        invalidate_model_cache()
         
         if not result['success']:
             raise HTTPException(
@@ -306,10 +317,12 @@ def compare_models(
         
         for model_file in model_files:
             try:
-                with open(model_file, 'rb') as f:
-                    metadata = pickle.load(f)
+                metadata, load_time_ms = load_artifact(model_file)
                 
                 metrics = metadata.get('metrics', {})
+                cost = cost_report(metadata, load_time_ms)
+                footprint = cost['footprint'] or {}
+                benchmark = cost['inference_benchmark'] or {}
                 
                 comparison.append({
                     'version': metadata.get('version', 'unknown'),
@@ -320,7 +333,14 @@ def compare_models(
                     'roc_auc': float(metrics.get('roc_auc', 0)),
                     'trained_at': metadata.get('trained_at', 'unknown'),
                     'retrained': metadata.get('retrained', False),
-                    'features_count': metadata.get('features_count', 0)
+                    'features_count': metadata.get('features_count', 0),
+                    'max_features': footprint.get('max_features'),
+                    'ngram_range': footprint.get('ngram_range'),
+                    'memory_mb': footprint.get('total_mb'),
+                    'file_size_kb': round(model_file.stat().st_size / 1024, 2),
+                    'load_time_ms': load_time_ms,
+                    'predictions_per_sec': benchmark.get('predictions_per_sec'),
+                    'batch_predictions_per_sec': benchmark.get('batch_predictions_per_sec')
                 })
             except Exception as e:
                 logger.warning(f"Could not read {model_file.name}: {e}")
@@ -7,12 +7,13 @@ import logging
 import sys
 import os
 from pathlib import Path
-import pandas as pd
 
 from app.database import get_db
 from app.models.spam_log import SpamLog
 from app.models.use_feedback import UserFeedback
 from app.dependencies import get_current_admin_user
+from app.services.analytics_queries import misclassification_feedback
+from app.utils.cache import invalidate_model_cache
 from app.models.user import User
 
 router = APIRouter()
@@ -62,7 +63,7 @@ def get_retrain_status(
             detail=str(e)
         )
 
-def validate_dataset_quality(df: pd.DataFrame) -> Dict[str, Any]:
+def validate_dataset_quality(df: "pd.DataFrame") -> Dict[str, Any]:
     """Comprehensive dataset validation"""
     issues = []
     warnings = []
@@ -122,6 +123,9 @@ def upload_dataset(
     current_user: User = Depends(get_current_admin_user)
 ):
     """Upload a CSV dataset file for training"""
+    # Admin-only and rarely used: keep pandas out of the worker's startup imports
+    import pandas as pd
+
     try:
         logger.info(f"Dataset upload request from admin {current_user.username}")
 
@@ -267,6 +271,7 @@ def train_initial_model(
 
         from app.services.model_service import spam_model
         spam_model.load_model()
+        invalidate_model_cache()
 
         logger.info("Model trained successfully")
 
@@ -311,9 +316,7 @@ def retrain_model(
 
         min_feedback_count = 10
 
-        feedbacks = db.query(UserFeedback).filter(
-            UserFeedback.original_result != UserFeedback.corrected_result
-        ).all()
+        feedbacks = misclassification_feedback(db)
 
         if len(feedbacks) < min_feedback_count:
             raise HTTPException(
@@ -328,9 +331,7 @@ def retrain_model(
         empty_texts = 0
 
         for feedback in feedbacks:
-            spam_log = db.query(SpamLog).filter(
-                SpamLog.id == feedback.spam_log_id
-            ).first()
+            spam_log = feedback.spam_log
 
             if not spam_log:
                 missing_logs += 1
@@ -371,6 +372,7 @@ def retrain_model(
 
         from app.services.model_service import spam_model
         spam_model.load_model()
+        invalidate_model_cache()
 
         logger.info(f"Model v{version} retrained successfully. New accuracy: {accuracy * 100:.2f}%")
 
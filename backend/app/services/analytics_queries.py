@@ -0,0 +1,157 @@
+"""
+Shared analytics queries
+Set-based (GROUP BY / join / NOT EXISTS) versions of the admin analytics
+lookups, so each endpoint issues a fixed number of SQL statements no
+matter how many users, logs or feedback rows exist
+"""
+
+from datetime import datetime
+from typing import List, Dict, Any
+from sqlalchemy import func, select, update, case
+from sqlalchemy.orm import Session, joinedload
+
+from app.models.user import User
+from app.models.spam_log import SpamLog
+from app.models.use_feedback import UserFeedback
+
+def user_activity_counts(db: Session) -> List[Dict[str, Any]]:
+    """
+    Scan and feedback totals for every user in one statement
+
+    Returns:
+        List of dicts with user_id, username, email, is_active, is_admin,
+        created_at, total_scans and feedback_count
+    """
+    scans = (
+        select(SpamLog.user_id, func.count(SpamLog.id).label("total_scans"))
+        .group_by(SpamLog.user_id)
+        .subquery()
+    )
+    feedbacks = (
+        select(UserFeedback.user_id, func.count(UserFeedback.id).label("feedback_count"))
+        .group_by(UserFeedback.user_id)
+        .subquery()
+    )
+
+    rows = db.execute(
+        select(
+            User.id,
+            User.username,
+            User.email,
+            User.is_active,
+            User.is_admin,
+            User.created_at,
+            func.coalesce(scans.c.total_scans, 0),
+            func.coalesce(feedbacks.c.feedback_count, 0),
+        )
+        .outerjoin(scans, scans.c.user_id == User.id)
+        .outerjoin(feedbacks, feedbacks.c.user_id == User.id)
+        .order_by(User.id)
+    ).all()
+
+    return [
+        {
+            "user_id": user_id,
+            "username": username,
+            "email": email,
+            "is_active": is_active,
+            "is_admin": is_admin,
+            "created_at": created_at,
+            "total_scans": total_scans,
+            "feedback_count": feedback_count,
+        }
+        for user_id, username, email, is_active, is_admin, created_at, total_scans, feedback_count in rows
+    ]
+
+def model_version_stats(db: Session) -> List[Dict[str, Any]]:
+    """
+    Prediction count, feedback count and feedback accuracy per model version
+    Two grouped statements regardless of how many versions exist
+    """
+    prediction_counts = db.execute(
+        select(SpamLog.model_version, func.count(SpamLog.id))
+        .group_by(SpamLog.model_version)
+    ).all()
+
+    # A prediction was correct when the user "corrected" it to the same label
+    is_correct = case(
+        (func.lower(func.trim(UserFeedback.original_result)) == func.lower(func.trim(UserFeedback.corrected_result)), 1),
+        else_=0
+    )
+    feedback_rows = db.execute(
+        select(
+            SpamLog.model_version,
+            func.count(UserFeedback.id),
+            func.coalesce(func.sum(is_correct), 0),
+        )
+        .join(SpamLog, SpamLog.id == UserFeedback.spam_log_id)
+        .group_by(SpamLog.model_version)
+    ).all()
+    feedback_by_version = {version: (total, correct) for version, total, correct in feedback_rows}
+
+    version_stats = []
+    for version, count in prediction_counts:
+        total_feedback, correct = feedback_by_version.get(version, (0, 0))
+        accuracy = (correct / total_feedback * 100) if total_feedback else 0
+        version_stats.append({
+            "version": version or "Unknown",
+            "total_predictions": count,
+            "total_feedback": total_feedback,
+            "accuracy": round(accuracy, 2)
+        })
+    return version_stats
+
+def find_inactive_users(db: Session, cutoff_date: datetime, exclude_user_id: int) -> List[Dict[str, Any]]:
+    """
+    Active non-admin users with no scan since cutoff_date
+
+    Their last activity is the latest scan, or the registration date if
+    they never scanned; users whose last activity is before the cutoff
+    are inactive.
+    """
+    last_scan = (
+        select(func.max(SpamLog.created_at))
+        .where(SpamLog.user_id == User.id)
+        .correlate(User)
+        .scalar_subquery()
+    )
+    last_activity = func.coalesce(last_scan, User.created_at)
+
+    rows = db.execute(
+        select(User.id, User.username, last_activity)
+        .where(
+            User.is_active == True,
+            User.is_admin == False,
+            User.id != exclude_user_id,
+            last_activity < cutoff_date,
+        )
+    ).all()
+
+    return [
+        {"id": user_id, "username": username, "last_activity": last_activity}
+        for user_id, username, last_activity in rows
+    ]
+
+def deactivate_users(db: Session, user_ids: List[int]) -> None:
+    """Deactivate users in one UPDATE (does not commit)"""
+    if not user_ids:
+        return
+    db.execute(
+        update(User)
+        .where(User.id.in_(user_ids))
+        .values(is_active=False)
+        .execution_options(synchronize_session=False)
+    )
+
+def misclassification_feedback(db: Session) -> List[UserFeedback]:
+    """
+    Feedback where the user changed the label, with its SpamLog preloaded
+    joinedload fetches the related logs in the same statement (LEFT OUTER
+    JOIN, so feedback whose log was deleted still comes back with None)
+    """
+    return (
+        db.query(UserFeedback)
+        .options(joinedload(UserFeedback.spam_log))
+        .filter(UserFeedback.original_result != UserFeedback.corrected_result)
+        .all()
+    )
@@ -0,0 +1,412 @@
+"""
+Authentication caches
+Lets get_current_user and X-API-Key clients authenticate without decoding
+the JWT, querying the database or writing usage rows on every request
+
+- token_cache: raw token -> decoded payload (bounded by token expiry)
+- principal_cache: token subject (email) -> snapshot of the user's columns
+- api_key_cache / api_key_usage: X-API-Key verification and batched usage counters
+
+Admin changes to a user (update, delete, deactivation) must call
+invalidate_user() so the next request sees the new state immediately.
+The caches are per process, so invalidate_user() also changes a shared
+generation marker (auth_generation); every worker checks it on each cache
+hit and drops its entries when it moved. The marker lives in an anonymous
+shared mmap inherited by workers forked from a preloading master (serve.py,
+gunicorn_conf.py), or in Redis when CACHE_REDIS_URL is set.
+"""
+
+import asyncio
+import hashlib
+import logging
+import mmap
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import select, update, bindparam, func
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.config import settings
+from app.database import async_engine
+from app.models.api_key import APIKey
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+# Columns copied into the cached snapshot (everything routes read from current_user)
+PRINCIPAL_FIELDS = ("id", "email", "username", "is_active", "is_admin", "created_at")
+
+class SharedGeneration:
+    """
+    Cross-worker invalidation marker in an anonymous shared mmap
+
+    bump() writes a fresh random value rather than incrementing, so two
+    workers invalidating at once can never leave the marker where a third
+    worker last saw it.
+    """
+
+    def __init__(self):
+        self._buf = mmap.mmap(-1, 8)
+
+    def current(self) -> bytes:
+        return self._buf[:8]
+
+    def bump(self) -> None:
+        self._buf[:8] = os.urandom(8)
+
+class RedisGeneration:
+    """Invalidation marker shared through Redis, for workers on several hosts"""
+
+    def __init__(self, url: str, key: str = "mailsentra:auth:generation"):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.key = key
+
+    def current(self) -> bytes:
+        try:
+            return self.client.get(self.key) or b""
+        except Exception as e:
+            # Unknown state: report a new marker so callers drop their entries
+            logger.warning(f"Auth cache generation unavailable: {e}")
+            return os.urandom(8)
+
+    def bump(self) -> None:
+        try:
+            self.client.set(self.key, os.urandom(8))
+        except Exception as e:
+            logger.error(f"Auth cache invalidation could not reach Redis: {e}")
+
+def _create_generation():
+    if settings.CACHE_REDIS_URL:
+        try:
+            generation = RedisGeneration(settings.CACHE_REDIS_URL)
+            generation.client.ping()
+            return generation
+        except Exception as e:
+            logger.warning(f"Redis auth cache generation unavailable ({e}), using shared memory")
+    return SharedGeneration()
+
+# Created at import so preloaded workers share it
+auth_generation = _create_generation()
+
+class _TTLDict:
+    """
+    Small thread-safe LRU dict with per-entry expiry
+
+    With a generation, every entry is dropped as soon as the shared marker
+    moves (an invalidation happened in some worker).
+    """
+
+    def __init__(self, max_entries: int, generation=None):
+        self.max_entries = max_entries
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = generation
+        self._seen = generation.current() if generation is not None else None
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        current = self._generation.current() if self._generation is not None else None
+        with self._lock:
+            if current != self._seen:
+                self._data.clear()
+                self._seen = current
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            expires_at, value = entry
+            if expires_at < time.time():
+                del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: Any, expires_at: float) -> None:
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def pop(self, key: str) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+class TokenCache:
+    """Decoded JWT payloads keyed by the raw token"""
+
+    def __init__(self, ttl: int, max_entries: int = 10000):
+        self.ttl = ttl
+        self._entries = _TTLDict(max_entries)
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        return self._entries.get(token)
+
+    def set(self, token: str, payload: Dict[str, Any]) -> None:
+        # Never keep a payload past the token's own expiry
+        expires_at = time.time() + self.ttl
+        exp = payload.get("exp")
+        if isinstance(exp, (int, float)):
+            expires_at = min(expires_at, exp)
+        self._entries.set(token, payload, expires_at)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+class PrincipalCache:
+    """User snapshots keyed by token subject, invalidated by user id"""
+
+    def __init__(self, ttl: int, max_entries: int = 10000, generation=None):
+        self.ttl = ttl
+        self._entries = _TTLDict(max_entries, generation)
+        self._subject_by_id: Dict[int, str] = {}
+        self._lock = threading.Lock()
+
+    def get(self, subject: str) -> Optional[User]:
+        """Return a fresh detached User built from the cached snapshot"""
+        snapshot = self._entries.get(subject)
+        if snapshot is None:
+            return None
+        return User(**snapshot)
+
+    def set(self, subject: str, user: User) -> None:
+        snapshot = {field: getattr(user, field) for field in PRINCIPAL_FIELDS}
+        self._entries.set(subject, snapshot, time.time() + self.ttl)
+        with self._lock:
+            self._subject_by_id[user.id] = subject
+
+    def invalidate_user(self, user_id: int) -> None:
+        with self._lock:
+            subject = self._subject_by_id.pop(user_id, None)
+        if subject is not None:
+            self._entries.pop(subject)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        with self._lock:
+            self._subject_by_id.clear()
+
+# Global cache instances
+token_cache = TokenCache(ttl=settings.AUTH_CACHE_TTL)
+principal_cache = PrincipalCache(ttl=settings.AUTH_CACHE_TTL, generation=auth_generation)
+
+def invalidate_user(*user_ids: int) -> None:
+    """Forget cached principals for these users in every worker (call after commit)"""
+    for user_id in user_ids:
+        principal_cache.invalidate_user(user_id)
+        api_key_cache.invalidate_user(user_id)
+    auth_generation.bump()
+
+# -------------------------------------------------------------------------
+# API key authentication for machine clients
+# -------------------------------------------------------------------------
+class ApiKeyCache:
+    """
+    Verified API keys keyed by the SHA-256 of the presented key
+
+    Valid keys map to (key_id, expires_at, user snapshot); unknown or
+    revoked keys are negatively cached so a misbehaving client can't turn
+    every request into a database lookup.
+    """
+
+    def __init__(self, ttl: int, negative_ttl: int, max_entries: int = 10000, generation=None):
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._valid = _TTLDict(max_entries, generation)
+        self._invalid = _TTLDict(max_entries, generation)
+        self._hashes_by_user: Dict[int, set] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key_hash: str) -> Optional[Dict[str, Any]]:
+        return self._valid.get(key_hash)
+
+    def is_known_invalid(self, key_hash: str) -> bool:
+        return self._invalid.get(key_hash) is not None
+
+    def set_valid(self, key_hash: str, key_id: int, expires_at, user: User) -> None:
+        entry = {
+            "key_id": key_id,
+            "expires_at": expires_at,
+            "user": {field: getattr(user, field) for field in PRINCIPAL_FIELDS},
+        }
+        self._valid.set(key_hash, entry, time.time() + self.ttl)
+        with self._lock:
+            self._hashes_by_user.setdefault(user.id, set()).add(key_hash)
+
+    def set_invalid(self, key_hash: str) -> None:
+        self._invalid.set(key_hash, True, time.time() + self.negative_ttl)
+
+    def invalidate_key(self, key_hash: str) -> None:
+        self._valid.pop(key_hash)
+        self._invalid.pop(key_hash)
+
+    def invalidate_user(self, user_id: int) -> None:
+        with self._lock:
+            hashes = self._hashes_by_user.pop(user_id, set())
+        for key_hash in hashes:
+            self._valid.pop(key_hash)
+
+    def clear(self) -> None:
+        self._valid.clear()
+        self._invalid.clear()
+        with self._lock:
+            self._hashes_by_user.clear()
+
+class ApiKeyUsageAggregator:
+    """
+    In-memory usage counters, flushed to api_keys in one bulk UPDATE
+    Replaces the per-request last_used_at / usage_count commit
+    """
+
+    def __init__(self):
+        self._pending: Dict[int, list] = {}
+        self._lock = threading.Lock()
+
+    def record(self, key_id: int) -> None:
+        now = datetime.now(timezone.utc)
+        with self._lock:
+            entry = self._pending.get(key_id)
+            if entry is None:
+                self._pending[key_id] = [1, now]
+            else:
+                entry[0] += 1
+                entry[1] = now
+
+    def drain(self) -> Dict[int, list]:
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        return pending
+
+    async def flush(self) -> int:
+        """
+        Write pending counters with a single executemany UPDATE
+
+        Returns:
+            Number of keys updated
+        """
+        pending = self.drain()
+        if not pending:
+            return 0
+
+        table = APIKey.__table__
+        stmt = (
+            update(table)
+            .where(table.c.id == bindparam("b_id"))
+            .values(
+                usage_count=func.coalesce(table.c.usage_count, 0) + bindparam("b_count"),
+                last_used_at=bindparam("b_last_used"),
+            )
+        )
+        params = [
+            {"b_id": key_id, "b_count": count, "b_last_used": last_used}
+            for key_id, (count, last_used) in pending.items()
+        ]
+        try:
+            async with async_engine.begin() as conn:
+                await conn.execute(stmt, params)
+        except Exception as e:
+            # Put the counts back so they go out with the next flush
+            logger.error(f"API key usage flush failed: {e}")
+            with self._lock:
+                for key_id, (count, last_used) in pending.items():
+                    entry = self._pending.setdefault(key_id, [0, last_used])
+                    entry[0] += count
+            return 0
+        return len(params)
+
+    async def run_periodic_flush(self, interval: float) -> None:
+        """Background loop started from the app lifespan"""
+        while True:
+            await asyncio.sleep(interval)
+            await self.flush()
+
+def hash_api_key(key: str) -> str:
+    """SHA-256 digest stored in api_keys.key for every issued key"""
+    return hashlib.sha256(key.encode()).hexdigest()
+
+def _is_expired(expires_at) -> bool:
+    if expires_at is None:
+        return False
+    if expires_at.tzinfo is None:
+        return expires_at < datetime.utcnow()
+    return expires_at < datetime.now(timezone.utc)
+
+async def authenticate_api_key(key: str, db: AsyncSession) -> User:
+    """
+    Resolve an X-API-Key to its owner
+
+    Served from memory after the first successful lookup; usage is counted
+    in memory and flushed periodically by api_key_usage.
+
+    Raises:
+        HTTPException 401 for unknown, revoked or expired keys, 403 for inactive owners
+    """
+    key_hash = hash_api_key(key)
+
+    if api_key_cache.is_known_invalid(key_hash):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid API key")
+
+    entry = api_key_cache.get(key_hash)
+    if entry is None:
+        # Only digests are stored, so the stored value itself never matches as a key
+        result = await db.execute(
+            select(APIKey, User)
+            .join(User, User.id == APIKey.user_id)
+            .where(APIKey.key == key_hash, APIKey.is_active == True)
+        )
+        row = result.first()
+        if row is None:
+            api_key_cache.set_invalid(key_hash)
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid API key")
+
+        db_key, owner = row
+        api_key_cache.set_valid(key_hash, db_key.id, db_key.expires_at, owner)
+        entry = api_key_cache.get(key_hash)
+
+    if _is_expired(entry["expires_at"]):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="API key has expired")
+
+    user = User(**entry["user"])
+    if not user.is_active:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Inactive user")
+
+    api_key_usage.record(entry["key_id"])
+    return user
+
+api_key_cache = ApiKeyCache(
+    ttl=settings.API_KEY_CACHE_TTL,
+    negative_ttl=settings.API_KEY_NEGATIVE_CACHE_TTL,
+    generation=auth_generation,
+)
+api_key_usage = ApiKeyUsageAggregator()
+
+def invalidate_api_key(stored_key: str) -> None:
+    """
+    Forget a key in every worker after it is revoked, toggled or deleted
+    (stored_key is api_keys.key, the digest)
+    """
+    api_key_cache.invalidate_key(stored_key)
+    auth_generation.bump()
+
+def cache_counters() -> Dict[str, Tuple[int, int]]:
+    """(hits, misses) of each auth cache, for /metrics"""
+    caches = {
+        "token": token_cache._entries,
+        "principal": principal_cache._entries,
+        "api_key": api_key_cache._valid,
+        "api_key_negative": api_key_cache._invalid,
+    }
+    return {name: (cache.hits, cache.misses) for name, cache in caches.items()}
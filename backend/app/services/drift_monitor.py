@@ -0,0 +1,265 @@
+"""
+Online drift monitor
+Summarises live predictions per model version and time bucket in fixed-size
+sketches, so score shift and vocabulary drift show up while they happen
+instead of in offline queries over spam_logs
+
+Per bucket (DRIFT_BUCKET_SECONDS wide, DRIFT_MAX_BUCKETS kept per version):
+- ScoreHistogram: spam_probability in fixed-width bins (quantiles, mean)
+- tokens-per-message histogram and the share of tokens the vectorizer has
+  never seen
+- CountMinSketch + TopK: the most frequent unseen tokens
+
+The first completed bucket of a version is kept as its reference; every
+bucket reports its population stability index (PSI) against it. Memory is
+constant per version whatever the traffic. Sketches are per worker.
+"""
+
+import math
+import threading
+import time
+from array import array
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config import settings
+
+# Upper bounds of the tokens-per-message buckets (the last bucket is +Inf)
+TOKEN_COUNT_BUCKETS = (0, 5, 10, 20, 50, 100, 200, 500, 1000)
+# Distinct unseen tokens sketched per message (keeps the per-call cost bounded)
+MAX_UNSEEN_PER_MESSAGE = 64
+# Model versions tracked at once (older ones are dropped first)
+MAX_VERSIONS = 4
+
+class ScoreHistogram:
+    """Fixed-width histogram over [0, 1]"""
+
+    def __init__(self, bins: int = 50):
+        self.counts = [0] * bins
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        bins = len(self.counts)
+        index = min(max(int(value * bins), 0), bins - 1)
+        self.counts[index] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Approximate quantile (linear within the bin)"""
+        if not self.count:
+            return None
+        bins = len(self.counts)
+        target = q * self.count
+        seen = 0
+        for index, bin_count in enumerate(self.counts):
+            if bin_count and seen + bin_count >= target:
+                return round((index + (target - seen) / bin_count) / bins, 4)
+            seen += bin_count
+        return 1.0
+
+    def psi(self, reference: "ScoreHistogram", groups: int = 10) -> Optional[float]:
+        """
+        Population stability index against a reference distribution
+
+        Bins are merged into `groups` equal-width groups first so sparse bins
+        don't dominate. Rule of thumb: < 0.1 stable, 0.1-0.25 moderate shift,
+        > 0.25 significant shift.
+        """
+        if not self.count or not reference.count:
+            return None
+        width = max(1, len(self.counts) // groups)
+        total = 0.0
+        for start in range(0, len(self.counts), width):
+            actual = max(sum(self.counts[start:start + width]) / self.count, 1e-4)
+            expected = max(sum(reference.counts[start:start + width]) / reference.count, 1e-4)
+            total += (actual - expected) * math.log(actual / expected)
+        return round(total, 4)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "count": self.count,
+            "mean": round(self.sum / self.count, 4) if self.count else None,
+            "p50": self.quantile(0.5),
+            "p90": self.quantile(0.9),
+            "p99": self.quantile(0.99),
+            "bins": self.counts,
+        }
+
+class CountMinSketch:
+    """Approximate counts (never under-estimated) in depth x width counters"""
+
+    def __init__(self, width: int = 1024, depth: int = 4):
+        self.width = width
+        self.depth = depth
+        self.table = array("I", [0]) * (width * depth)
+
+    def _indexes(self, key: str) -> List[int]:
+        # Double hashing: depth indexes from one hash
+        h = hash(key)
+        step = (h >> 16) | 1
+        width = self.width
+        return [row * width + (h + row * step) % width for row in range(self.depth)]
+
+    def add(self, key: str, count: int = 1) -> int:
+        """Count occurrences of key; returns the new estimate"""
+        table = self.table
+        indexes = self._indexes(key)
+        for index in indexes:
+            table[index] += count
+        return min(table[index] for index in indexes)
+
+    def estimate(self, key: str) -> int:
+        return min(self.table[index] for index in self._indexes(key))
+
+class TopK:
+    """Heavy hitters tracked alongside a CountMinSketch (at most k entries)"""
+
+    def __init__(self, k: int = 20):
+        self.k = k
+        self.items: Dict[str, int] = {}
+        # Smallest tracked estimate once full (estimates only grow)
+        self._floor = 0
+
+    def offer(self, key: str, estimate: int) -> None:
+        items = self.items
+        if key in items or len(items) < self.k:
+            items[key] = estimate
+            return
+        if estimate <= self._floor:
+            return
+        smallest = min(items, key=items.get)
+        self._floor = items[smallest]
+        if estimate > self._floor:
+            del items[smallest]
+            items[key] = estimate
+            self._floor = min(items.values())
+
+    def top(self) -> List[Tuple[str, int]]:
+        return sorted(self.items.items(), key=lambda item: item[1], reverse=True)
+
+class DriftBucket:
+    """Sketches for one model version and time bucket"""
+
+    def __init__(self, start: float):
+        self.start = start
+        self.scores = ScoreHistogram()
+        self.token_counts = [0] * (len(TOKEN_COUNT_BUCKETS) + 1)
+        self.tokens = 0
+        self.unseen_tokens = 0
+        self.unseen_sketch = CountMinSketch()
+        self.unseen_top = TopK()
+
+    def observe(self, spam_probability: float, tokens: List[str], vocabulary: Optional[dict]) -> None:
+        self.scores.observe(spam_probability)
+        index = 0
+        while index < len(TOKEN_COUNT_BUCKETS) and len(tokens) > TOKEN_COUNT_BUCKETS[index]:
+            index += 1
+        self.token_counts[index] += 1
+        if vocabulary is None:
+            return
+        unseen: Dict[str, int] = {}
+        for token in tokens:
+            # The vectorizer's default token pattern ignores 1-character tokens
+            if len(token) < 2:
+                continue
+            self.tokens += 1
+            if token not in vocabulary:
+                self.unseen_tokens += 1
+                unseen[token] = unseen.get(token, 0) + 1
+        for token, count in list(unseen.items())[:MAX_UNSEEN_PER_MESSAGE]:
+            self.unseen_top.offer(token, self.unseen_sketch.add(token, count))
+
+    def snapshot(self, reference: Optional["DriftBucket"], bucket_seconds: int) -> Dict[str, Any]:
+        return {
+            "start": self.start,
+            "end": self.start + bucket_seconds,
+            "scores": self.scores.snapshot(),
+            "score_psi": self.scores.psi(reference.scores) if reference is not None else None,
+            "tokens_per_message": dict(zip([f"le_{b}" for b in TOKEN_COUNT_BUCKETS] + ["inf"], self.token_counts)),
+            "unseen_token_ratio": round(self.unseen_tokens / self.tokens, 4) if self.tokens else None,
+            "top_unseen_tokens": self.unseen_top.top(),
+        }
+
+class DriftMonitor:
+    """Per-version ring of DriftBuckets plus a frozen reference bucket"""
+
+    def __init__(self, bucket_seconds: int = 3600, max_buckets: int = 24, enabled: bool = True):
+        self.bucket_seconds = max(1, bucket_seconds)
+        self.max_buckets = max(1, max_buckets)
+        self.enabled = enabled
+        self._buckets: Dict[str, deque] = {}
+        self._references: Dict[str, DriftBucket] = {}
+        self._lock = threading.Lock()
+
+    def _current(self, version: str, now: float) -> DriftBucket:
+        start = now - now % self.bucket_seconds
+        buckets = self._buckets.get(version)
+        if buckets is None:
+            if len(self._buckets) >= MAX_VERSIONS:
+                oldest = next(iter(self._buckets))
+                del self._buckets[oldest]
+                self._references.pop(oldest, None)
+            buckets = self._buckets[version] = deque(maxlen=self.max_buckets)
+        if not buckets or buckets[-1].start != start:
+            if buckets and version not in self._references:
+                # First completed bucket becomes the reference
+                self._references[version] = buckets[-1]
+            buckets.append(DriftBucket(start))
+        return buckets[-1]
+
+    def observe(self, version: str, spam_probability: float, tokens: List[str],
+                vocabulary: Optional[dict] = None, now: Optional[float] = None) -> None:
+        """
+        Record one scored message
+
+        Args:
+            version: Model version that scored it
+            spam_probability: Model output
+            tokens: Preprocessed tokens
+            vocabulary: Fitted vectorizer vocabulary_ (for unseen-token stats)
+            now: Timestamp (defaults to time.time())
+        """
+        if not self.enabled:
+            return
+        now = time.time() if now is None else now
+        with self._lock:
+            self._current(version, now).observe(spam_probability, tokens, vocabulary)
+
+    def snapshot(self, version: Optional[str] = None) -> Dict[str, Any]:
+        """Reference and recent buckets (newest first) per model version"""
+        with self._lock:
+            versions = {}
+            for name, buckets in self._buckets.items():
+                if version is not None and name != version:
+                    continue
+                reference = self._references.get(name)
+                versions[name] = {
+                    "reference": reference.snapshot(None, self.bucket_seconds) if reference is not None else None,
+                    "buckets": [bucket.snapshot(reference, self.bucket_seconds) for bucket in reversed(buckets)],
+                }
+        return {"enabled": self.enabled, "bucket_seconds": self.bucket_seconds, "versions": versions}
+
+    def current_stats(self) -> Dict[str, Dict[str, Optional[float]]]:
+        """score_psi and unseen_token_ratio of each version's newest bucket (for /metrics)"""
+        with self._lock:
+            stats = {}
+            for name, buckets in self._buckets.items():
+                if not buckets:
+                    continue
+                bucket = buckets[-1]
+                reference = self._references.get(name)
+                stats[name] = {
+                    "score_psi": bucket.scores.psi(reference.scores) if reference is not None else None,
+                    "unseen_token_ratio": bucket.unseen_tokens / bucket.tokens if bucket.tokens else None,
+                }
+            return stats
+
+    def clear(self) -> None:
+        with self._lock:
+            self._buckets.clear()
+            self._references.clear()
+
+# Global monitor fed by spam_model predictions
+drift_monitor = DriftMonitor(settings.DRIFT_BUCKET_SECONDS, settings.DRIFT_MAX_BUCKETS, settings.DRIFT_MONITOR_ENABLED)
@@ -0,0 +1,148 @@
+"""
+Password hashing executor
+Runs pbkdf2/bcrypt hashing in a dedicated, bounded thread pool so a burst
+of logins can't occupy the request threadpool and stall /analyze. Both
+hashes run in C with the GIL released, so threads scale with cores and
+benchmarks/login_throughput.py shows no gain from processes.
+
+PASSWORD_HASH_EXECUTOR=process hashes in a process pool instead. Its
+workers come from a forkserver (spawn where that is unavailable), never
+from forking a worker that already runs logging, tracing and flush threads.
+"""
+
+import asyncio
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from fastapi import HTTPException, status
+
+from app.config import settings
+from app.utils.security import verify_password, get_password_hash
+from app.utils.tracing import current_span, traced
+
+logger = logging.getLogger(__name__)
+
+class PasswordHasher:
+    """
+    Bounded async front-end for password hashing
+
+    - workers: threads (or processes) doing the hashing
+    - executor: "thread" or "process"
+    - max_concurrency: hashes in flight at once (the rest wait in a queue)
+    - max_queue: waiting requests beyond which new ones get 503 (0 = unbounded)
+    """
+
+    EXECUTORS = ("process", "thread")
+
+    def __init__(self, workers: int, max_concurrency: int, max_queue: int, executor: str = "thread"):
+        if executor not in self.EXECUTORS:
+            raise ValueError(f"Unknown password hash executor {executor!r} (expected one of {self.EXECUTORS})")
+        self.workers = workers
+        self.executor = executor
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self._executor: Optional[Executor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+        # Queueing metrics
+        self.queued = 0
+        self.in_flight = 0
+        self.completed = 0
+        self.rejected = 0
+        self.max_queued = 0
+        self.total_wait_ms = 0.0
+        self.total_hash_ms = 0.0
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.executor == "thread":
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix="password-hash"
+                )
+            else:
+                start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context(start_method)
+                )
+            logger.info(f"Password hashing pool started with {self.workers} {self.executor} workers")
+        return self._executor
+
+    def _get_semaphore(self) -> asyncio.Semaphore:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphore
+
+    @traced("password_hash")
+    async def _run(self, func: Callable, *args) -> Any:
+        if self.max_queue and self.queued >= self.max_queue:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Authentication service busy, please retry",
+                headers={"Retry-After": "1"},
+            )
+
+        semaphore = self._get_semaphore()
+        enqueued_at = time.perf_counter()
+        self.queued += 1
+        self.max_queued = max(self.max_queued, self.queued)
+        try:
+            await semaphore.acquire()
+        finally:
+            # Leaves the queue whether it got a slot or was cancelled while waiting
+            self.queued -= 1
+
+        started_at = time.perf_counter()
+        self.total_wait_ms += (started_at - enqueued_at) * 1000
+        span = current_span.get()
+        if span is not None:
+            span.set_attribute("queue_wait_ms", round((started_at - enqueued_at) * 1000, 3))
+        self.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._get_executor(), func, *args)
+        finally:
+            semaphore.release()
+            self.in_flight -= 1
+            self.completed += 1
+            self.total_hash_ms += (time.perf_counter() - started_at) * 1000
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        """Verify a password off the event loop and off the request threadpool"""
+        return await self._run(verify_password, plain_password, hashed_password)
+
+    async def hash(self, password: str) -> str:
+        """Hash a password off the event loop and off the request threadpool"""
+        return await self._run(get_password_hash, password)
+
+    def stats(self) -> Dict[str, Any]:
+        """Queueing metrics for monitoring"""
+        return {
+            "workers": self.workers,
+            "executor": self.executor,
+            "max_concurrency": self.max_concurrency,
+            "queued": self.queued,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "max_queued": self.max_queued,
+            "avg_wait_ms": round(self.total_wait_ms / self.completed, 2) if self.completed else 0.0,
+            "avg_hash_ms": round(self.total_hash_ms / self.completed, 2) if self.completed else 0.0,
+        }
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+# Global hasher instance
+password_hasher = PasswordHasher(
+    workers=settings.PASSWORD_HASH_WORKERS or max(1, (os.cpu_count() or 2) // 2),
+    max_concurrency=settings.PASSWORD_HASH_MAX_CONCURRENCY or max(1, (os.cpu_count() or 2) // 2) * 2,
+    max_queue=settings.PASSWORD_HASH_MAX_QUEUE,
+    executor=settings.PASSWORD_HASH_EXECUTOR,
+)
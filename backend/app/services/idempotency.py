@@ -0,0 +1,145 @@
+"""
+Idempotency-Key support
+A retried request with the same key gets the stored result instead of
+re-running the model and writing another SpamLog row
+
+- In-flight: identical concurrent requests (same key) await one computation;
+  if the request computing it is cancelled (client disconnect), one of the
+  waiting requests takes over instead of failing
+- Completed: results are kept for IDEMPOTENCY_TTL seconds, in-process or in
+  Redis (CACHE_REDIS_URL) so retries landing on another worker are served too
+- Reusing a key with a different payload is rejected with 422
+
+Only single-result endpoints use it: /api/analyze/stream ignores the header,
+since its output is unbounded and already written out as it is produced.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from fastapi import HTTPException, status
+from fastapi.encoders import jsonable_encoder
+
+from app.config import settings
+from app.utils.cache import MemoryBackend, RedisBackend
+
+logger = logging.getLogger(__name__)
+
+MAX_KEY_LENGTH = 255
+
+def request_fingerprint(*parts: Any) -> str:
+    """Stable hash of everything that affects the response"""
+    payload = json.dumps(jsonable_encoder(parts), sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+class IdempotencyStore:
+    """Single-flight execution plus a TTL result store keyed by (tenant, Idempotency-Key)"""
+
+    def __init__(self, backend, ttl: float):
+        self.backend = backend
+        self.ttl = ttl
+        self._in_flight: Dict[str, Tuple[str, asyncio.Future]] = {}
+        self.replays = 0
+        self.coalesced = 0
+
+    def _conflict(self) -> HTTPException:
+        return HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Idempotency-Key was already used with a different request body"
+        )
+
+    def _get(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            return self.backend.get(key)
+        except Exception as e:
+            logger.warning(f"Idempotency store get failed for {key}: {e}")
+            return None
+
+    async def run(
+        self,
+        tenant: str,
+        idempotency_key: str,
+        fingerprint: str,
+        compute: Callable[[], Awaitable[Any]]
+    ) -> Tuple[Any, bool]:
+        """
+        Return the result for this key, computing it at most once
+
+        Args:
+            tenant: Caller scope (keys are only unique per user)
+            idempotency_key: Client-supplied Idempotency-Key header
+            fingerprint: request_fingerprint() of the request payload
+            compute: Coroutine function producing the response
+
+        Returns:
+            (JSON-compatible response, True if it was replayed)
+        """
+        if not idempotency_key or len(idempotency_key) > MAX_KEY_LENGTH:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Idempotency-Key must be 1-{MAX_KEY_LENGTH} characters"
+            )
+        key = f"idem:{tenant}:{idempotency_key}"
+
+        while True:
+            stored = self._get(key)
+            if stored is not None:
+                if stored["fingerprint"] != fingerprint:
+                    raise self._conflict()
+                self.replays += 1
+                return stored["response"], True
+
+            in_flight = self._in_flight.get(key)
+            if in_flight is None:
+                break
+            in_flight_fingerprint, future = in_flight
+            if in_flight_fingerprint != fingerprint:
+                raise self._conflict()
+            try:
+                response = await asyncio.shield(future)
+            except asyncio.CancelledError:
+                if future.cancelled() and not asyncio.current_task().cancelling():
+                    # The leading request was cancelled, not this one: look again
+                    # and compute it here if nobody else has taken over yet
+                    continue
+                raise
+            self.coalesced += 1
+            return response, True
+
+        future = asyncio.get_running_loop().create_future()
+        self._in_flight[key] = (fingerprint, future)
+        try:
+            response = jsonable_encoder(await compute())
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            # Failures are not stored; waiters get the same error, the next retry recomputes
+            future.set_exception(e)
+            future.exception()  # mark retrieved when nobody was waiting
+            raise
+        else:
+            try:
+                self.backend.set(key, {"fingerprint": fingerprint, "response": response}, self.ttl)
+            except Exception as e:
+                logger.warning(f"Idempotency store set failed for {key}: {e}")
+            future.set_result(response)
+            return response, False
+        finally:
+            self._in_flight.pop(key, None)
+
+def _create_backend():
+    if settings.CACHE_REDIS_URL:
+        try:
+            backend = RedisBackend(settings.CACHE_REDIS_URL, namespace="mailsentra:idempotency:")
+            backend.client.ping()
+            return backend
+        except Exception as e:
+            logger.warning(f"Redis idempotency store unavailable ({e}), using in-process store")
+    return MemoryBackend(max_entries=settings.IDEMPOTENCY_MAX_ENTRIES)
+
+# Global store shared by the analyze routes
+idempotency_store = IdempotencyStore(_create_backend(), ttl=settings.IDEMPOTENCY_TTL)
@@ -0,0 +1,115 @@
+"""
+Prometheus scrape output for GET /metrics
+Reads in-process counters only (no database queries), so scraping stays
+cheap however large the SpamLog table gets
+"""
+
+import logging
+
+import anyio.to_thread
+
+from app.database import engine, async_engine
+from app.services import auth_service
+from app.services.drift_monitor import drift_monitor
+from app.services.hashing_service import password_hasher
+from app.services.idempotency import idempotency_store
+from app.services.model_service import spam_model
+from app.services.rate_limiter import rate_limiter
+from app.utils.cache import response_cache
+from app.utils.logger import dropped_records
+from app.utils.startup import startup_profile
+from app.utils.prometheus import MetricsWriter, inference_counter, request_latency
+from app.utils.timing import latency_registry
+
+logger = logging.getLogger(__name__)
+
+def _write_requests(writer: MetricsWriter) -> None:
+    writer.histograms(
+        "http_request_duration", "HTTP request duration by route template",
+        ((dict(zip(request_latency.labelnames, labels)), histogram) for labels, histogram in request_latency.items())
+    )
+    writer.histograms(
+        "stage_duration", "Inference pipeline stage duration (preprocessing, model, db_commit, model_load)",
+        (({"stage": stage}, histogram) for stage, histogram in latency_registry.items())
+    )
+
+def _write_model(writer: MetricsWriter) -> None:
+    writer.counter_vec("inferences", "Predictions by verdict and model version", inference_counter)
+    writer.gauge("model_loaded", "1 if the spam model is loaded", spam_model.is_loaded)
+    writer.gauge("model_warm", "1 once the model has been warmed up", spam_model.is_warm)
+    writer.gauge("model_info", "Loaded model version", 1, version=spam_model.metadata.get("version", "unknown"))
+    writer.gauge("model_last_load_seconds", "Duration of the last successful model (re)load",
+                 spam_model.load_duration_ms / 1000)
+    if startup_profile.ready_ms is not None:
+        writer.gauge("startup_seconds", "Worker cold start, main.py import (or fork from a preloading master) to lifespan ready", startup_profile.ready_ms / 1000)
+
+    drift = drift_monitor.current_stats()
+    for key, help_text in (
+        ("score_psi", "PSI of the current score distribution against the version's reference bucket"),
+        ("unseen_token_ratio", "Share of tokens in the current bucket missing from the vectorizer vocabulary"),
+    ):
+        name = writer.family(f"drift_{key}", "gauge", help_text)
+        for version, stats in drift.items():
+            if stats[key] is not None:
+                writer.sample(name, stats[key], model_version=version)
+
+def _write_caches(writer: MetricsWriter) -> None:
+    counters = {"response": (response_cache.hits, response_cache.misses), **auth_service.cache_counters()}
+    hits = writer.family("cache_hits_total", "counter", "Cache lookups served from the cache")
+    for name, (hit_count, _) in counters.items():
+        writer.sample(hits, hit_count, cache=name)
+    misses = writer.family("cache_misses_total", "counter", "Cache lookups that missed")
+    for name, (_, miss_count) in counters.items():
+        writer.sample(misses, miss_count, cache=name)
+    writer.counter("idempotent_replays", "Analyze requests answered from the Idempotency-Key store",
+                   idempotency_store.replays)
+    writer.counter("idempotent_coalesced", "Analyze requests that awaited an identical in-flight request",
+                   idempotency_store.coalesced)
+
+def _write_queues(writer: MetricsWriter) -> None:
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    statistics = limiter.statistics()
+    writer.gauge("threadpool_size", "Request threadpool capacity", limiter.total_tokens)
+    writer.gauge("threadpool_in_use", "Request threadpool threads busy", statistics.borrowed_tokens)
+    writer.gauge("threadpool_waiting", "Sync handlers waiting for a threadpool thread", statistics.tasks_waiting)
+
+    hashing = password_hasher.stats()
+    writer.gauge("password_hash_queued", "Password hashes waiting for a worker", hashing["queued"])
+    writer.gauge("password_hash_in_flight", "Password hashes running", hashing["in_flight"])
+    writer.counter("password_hash_completed", "Password hashes completed", hashing["completed"])
+    writer.counter("password_hash_rejected", "Password hashes rejected with 503 (queue full)", hashing["rejected"])
+
+    writer.counter("rate_limit_checks", "Rate limit bucket checks", rate_limiter.checks)
+    writer.counter("rate_limit_rejected", "Requests rejected with 429", rate_limiter.rejected)
+
+    writer.counter("log_records_sampled_out", "INFO/DEBUG log records dropped by LOG_SAMPLE_RATES", dropped_records())
+
+def _write_db_pools(writer: MetricsWriter) -> None:
+    pools = {"sync": engine.pool, "async": async_engine.sync_engine.pool}
+    families = (
+        ("db_pool_size", "Connections the pool keeps open", "size"),
+        ("db_pool_checked_out", "Connections currently in use", "checkedout"),
+        ("db_pool_overflow", "Connections open beyond pool_size", "overflow"),
+    )
+    for name, help_text, method in families:
+        family = None
+        for pool_name, pool in pools.items():
+            # SQLite in-memory/NullPool variants don't have every counter
+            if not hasattr(pool, method):
+                continue
+            family = family or writer.family(name, "gauge", help_text)
+            writer.sample(family, getattr(pool, method)(), pool=pool_name)
+
+def render_metrics() -> str:
+    """
+    Current process metrics in the Prometheus text format
+
+    Must be called from the event loop (reads the anyio threadpool limiter)
+    """
+    writer = MetricsWriter()
+    for section in (_write_requests, _write_model, _write_caches, _write_queues, _write_db_pools):
+        try:
+            section(writer)
+        except Exception as e:
+            logger.warning(f"Metrics section {section.__name__} failed: {e}")
+    return writer.render()
@@ -5,13 +5,18 @@ Loads and uses the trained model for predictions
 
 import pickle
 import logging
-from typing import Dict, Any
+import time
+from typing import Dict, Any, List, Tuple
 from pathlib import Path
 from .preprocessing import email_preprocessor
+from .drift_monitor import drift_monitor
+from app.utils.logger import hot_logger
+from app.utils.prometheus import inference_counter
+from app.utils.timing import record_stage, timed
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
+# Per-prediction lines (sampled, see app/utils/logger.py)
+request_logger = hot_logger("predict")
 
 class SpamDetectionModel:
     """
@@ -37,6 +42,8 @@ class SpamDetectionModel:
         self.vectorizer: Any = None
         self.metadata: Dict[str, Any] = {}
         self.is_loaded = False
+        self.is_warm = False
+        self.load_duration_ms = 0.0
         
         # Try to load model on initialization
         self.load_model()
@@ -48,6 +55,7 @@ class SpamDetectionModel:
         Returns:
             True if model loaded successfully, False otherwise
         """
+        started = time.perf_counter()
         try:
             model_file = Path(self.model_path)
             
@@ -78,6 +86,8 @@ class SpamDetectionModel:
             logger.info(f"   - Algorithm: {self.metadata.get('algorithm', 'unknown')}")
             logger.info(f"   - Trained at: {self.metadata.get('trained_at', 'unknown')}")
             
+            self.load_duration_ms = (time.perf_counter() - started) * 1000
+            record_stage("model_load", self.load_duration_ms)
             self.is_loaded = True
             return True
             
@@ -86,12 +96,14 @@ class SpamDetectionModel:
             self.is_loaded = False
             return False
     
-    def predict(self, email_text: str) -> Dict[str, Any]:
+    def predict(self, email_text: str, record: bool = True) -> Dict[str, Any]:
         """
         Predict if email is spam or not
         
         Args:
             email_text: Raw email text to classify
+            record: Count the prediction in the inference and drift metrics
+                (False for warm-up samples, which aren't traffic)
             
         Returns:
             Dictionary with prediction results
@@ -111,6 +123,8 @@ class SpamDetectionModel:
             
             if not processed_text or processed_text.strip() == "":
                 logger.warning("Empty text after preprocessing")
+                if record:
+                    inference_counter.inc("ham", self.metadata.get('version', 'unknown'))
                 return {
                     "result": "ham",
                     "confidence": 0.5,
@@ -120,31 +134,22 @@ class SpamDetectionModel:
                 }
             
             # Vectorize
-            text_vectorized = self.vectorizer.transform([processed_text])
+            with timed("vectorize"):
+                text_vectorized = self.vectorizer.transform([processed_text])
             
             # Get probability/confidence
-            probabilities = self.model.predict_proba(text_vectorized)[0]
+            with timed("predict_proba"):
+                probabilities = self.model.predict_proba(text_vectorized)[0]
+            spam_prob = float(probabilities[self._spam_index()])
+            result, confidence = self._classify(spam_prob)
             
-            try:
-                spam_idx = list(self.model.classes_).index("spam")
-            except ValueError:
-                spam_idx = 1
-                
-            spam_prob = float(probabilities[spam_idx])
-            
-            # Determine result with confidence states
-            # Threshold tuning: 0.65 = spam, 0.45-0.65 = uncertain, <0.45 = ham
-            if spam_prob >= 0.65:
-                result = "spam"
-                confidence = spam_prob
-            elif spam_prob >= 0.45:
-                result = "uncertain"
-                confidence = spam_prob
-            else:
-                result = "ham"
-                confidence = 1.0 - spam_prob
-            
-            logger.info(f"Prediction: {result.upper()} (spam probability: {spam_prob * 100:.2f}%)")
+            request_logger.info("Prediction: %s (spam probability: %.2f%%)", result, spam_prob * 100)
+            if record:
+                inference_counter.inc(result, self.metadata.get('version', 'unknown'))
+                drift_monitor.observe(
+                    self.metadata.get('version', 'unknown'), spam_prob, preprocessed['tokens'],
+                    getattr(self.vectorizer, 'vocabulary_', None)
+                )
             
             return {
                 "result": result,
@@ -165,6 +170,130 @@ class SpamDetectionModel:
                 "confidence": 0.0
             }
     
+    def predict_batch(self, email_texts: List[str]) -> List[Dict[str, Any]]:
+        """
+        Predict a chunk of emails with one vectorizer and one predict_proba call
+        
+        Args:
+            email_texts: Raw email texts to classify
+            
+        Returns:
+            One result dictionary per input, in order (same keys as predict,
+            without processed_text)
+        """
+        if not self.is_loaded:
+            logger.error("Model not loaded. Cannot make predictions.")
+            return [{"error": "Model not loaded", "result": "unknown", "confidence": 0.0} for _ in email_texts]
+        
+        try:
+            preprocessed = [email_preprocessor.preprocess_email(text, return_steps=False) for text in email_texts]
+            processed = [item['final_processed_text'] for item in preprocessed]
+            model_version = self.metadata.get('version', 'unknown')
+            results: List[Dict[str, Any]] = [None] * len(email_texts)
+            
+            # Empty texts get the same fallback as predict(); the rest go through the model together
+            to_score = []
+            for i, (text, processed_text) in enumerate(zip(email_texts, processed)):
+                if not processed_text or processed_text.strip() == "":
+                    results[i] = {
+                        "result": "ham",
+                        "confidence": 0.5,
+                        "message": "Unable to process empty text",
+                        "original_length": len(text),
+                        "processed_length": 0,
+                        "model_version": model_version
+                    }
+                else:
+                    to_score.append(i)
+            if len(to_score) < len(email_texts):
+                inference_counter.inc("ham", model_version, amount=len(email_texts) - len(to_score))
+            
+            if to_score:
+                with timed("vectorize"):
+                    vectors = self.vectorizer.transform([processed[i] for i in to_score])
+                with timed("predict_proba"):
+                    probabilities = self.model.predict_proba(vectors)
+                spam_idx = self._spam_index()
+                vocabulary = getattr(self.vectorizer, 'vocabulary_', None)
+                verdicts: Dict[str, int] = {}
+                for row, i in enumerate(to_score):
+                    spam_prob = float(probabilities[row][spam_idx])
+                    result, confidence = self._classify(spam_prob)
+                    results[i] = {
+                        "result": result,
+                        "confidence": confidence,
+                        "spam_probability": spam_prob,
+                        "is_spam": result == "spam",
+                        "original_length": len(email_texts[i]),
+                        "processed_length": len(processed[i]),
+                        "model_version": model_version
+                    }
+                    verdicts[result] = verdicts.get(result, 0) + 1
+                    drift_monitor.observe(model_version, spam_prob, preprocessed[i]['tokens'], vocabulary)
+                for result, count in verdicts.items():
+                    inference_counter.inc(result, model_version, amount=count)
+            
+            return results
+            
+        except Exception as e:
+            logger.error(f" Batch prediction error: {e}")
+            return [{"error": str(e), "result": "unknown", "confidence": 0.0} for _ in email_texts]
+    
+    def _spam_index(self) -> int:
+        """Column of the spam class in predict_proba output"""
+        try:
+            return list(self.model.classes_).index("spam")
+        except ValueError:
+            return 1
+    
+    @staticmethod
+    def _classify(spam_prob: float) -> Tuple[str, float]:
+        """
+        Determine result with confidence states
+        Threshold tuning: 0.65 = spam, 0.45-0.65 = uncertain, <0.45 = ham
+        """
+        if spam_prob >= 0.65:
+            return "spam", spam_prob
+        if spam_prob >= 0.45:
+            return "uncertain", spam_prob
+        return "ham", 1.0 - spam_prob
+    
+    def warm_up(self, rounds: int = 3) -> bool:
+        """
+        Run a few throwaway predictions so lazily loaded pieces (NLTK corpora,
+        BeautifulSoup parser, sklearn code paths) are initialised before the
+        first real request. Called in the parent process before workers fork
+        so the warmed pages are shared copy-on-write.
+        
+        Args:
+            rounds: Number of passes over the warm-up samples
+            
+        Returns:
+            True if the model is loaded and every warm-up prediction succeeded
+        """
+        if not self.is_loaded:
+            return False
+        
+        samples = [
+            "Congratulations! You have WON a free prize. Click http://example.com to claim now!!!",
+            "<p>Hi team, the meeting is moved to 3pm tomorrow. See agenda attached.</p>",
+            "Reply to billing@example.com before Friday to keep your account active",
+        ]
+        for _ in range(max(1, rounds)):
+            for sample in samples:
+                if "error" in self.predict(sample, record=False):
+                    logger.error("Model warm-up prediction failed")
+                    return False
+        
+        self.is_warm = True
+        logger.info(f"Model warmed up with {max(1, rounds) * len(samples)} predictions")
+        return True
+    
+    @property
+    def is_ready(self) -> bool:
+        """Loaded and warmed up - safe to route /analyze traffic here"""
+        return self.is_loaded and self.is_warm
+    
     def get_model_info(self) -> Dict[str, Any]:
         """
         Get information about the loaded model
@@ -1,13 +1,37 @@
 import re
-import nltk
-from bs4 import BeautifulSoup
+import threading
 from typing import List, Dict, Any
 import logging
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+from app.utils.logger import hot_logger
+from app.utils.timing import timed
+
 logger = logging.getLogger(__name__)
 
+def _ensure_nltk_resource(path: str, package: str) -> bool:
+    """
+    True if an NLTK data resource is installed, downloading it only when missing
+
+    nltk.download() contacts the package index on every call, so calling it
+    unconditionally put a network round trip (or a DNS timeout when offline)
+    on every cold start.
+    """
+    import nltk
+
+    try:
+        nltk.data.find(path)
+        return True
+    except LookupError:
+        pass
+    try:
+        return bool(nltk.download(package, quiet=True))
+    except Exception as e:
+        logger.warning(f"NLTK download of {package} failed: {e}")
+        return False
+
+# Per-call lines (DEBUG and sampled, see app/utils/logger.py)
+request_logger = hot_logger("preprocessing")
+
 class EmailPreprocessor:
     """
     Email preprocessing pipeline for spam detection
@@ -15,23 +39,53 @@ class EmailPreprocessor:
     """
 
     def __init__(self):
-        """Initialize the preprocessor with required NLTK resources"""
-        try:
-            # Download required NLTK data silently
-            nltk.download('punkt', quiet=True)
-            nltk.download('punkt_tab', quiet=True)  # For Python 3.14+
-            nltk.download('stopwords', quiet=True)
-            nltk.download('wordnet', quiet=True)
+        """Create the preprocessor; NLTK resources are loaded on first use"""
+        self.word_tokenize = None
+        self._stopwords = None
+        self._nltk_lock = threading.Lock()
+
+    @property
+    def stopwords(self) -> set:
+        if self._stopwords is None:
+            self._load_nltk()
+        return self._stopwords
+
+    def _load_nltk(self) -> None:
+        """
+        Resolve the NLTK tokenizer and stopwords once
 
+        Importing nltk pulls in scipy, pandas and parts of sklearn, so it is
+        deferred until the first email is preprocessed (the model warm-up at
+        startup does that before any traffic arrives).
+        """
+        with self._nltk_lock:
+            if self._stopwords is not None:
+                return
+            import nltk
+
+            # Resolved once: without the punkt models every word_tokenize call
+            # would search the data paths and raise before falling back
+            if _ensure_nltk_resource('tokenizers/punkt_tab', 'punkt_tab'):
+                self.word_tokenize = nltk.word_tokenize
+            else:
+                logger.info("NLTK punkt tokenizer unavailable, tokenizing on whitespace")
+            self._stopwords = self._load_stopwords()
+
+    def _load_stopwords(self) -> set:
+        """NLTK English stopwords, or a built-in list when the corpus is unavailable"""
+        try:
             # Load stopwords from NLTK
+            if not _ensure_nltk_resource('corpora/stopwords', 'stopwords'):
+                raise LookupError("NLTK stopwords corpus not available")
             from nltk.corpus import stopwords
-            self.stopwords = set(stopwords.words('english'))
-            logger.info(f"EmailPreprocessor initialized with {len(self.stopwords)} stopwords")
+            words = set(stopwords.words('english'))
+            logger.info(f"EmailPreprocessor initialized with {len(words)} stopwords")
+            return words
 
         except Exception as e:
             logger.warning(f"NLTK initialization failed: {e}. Using fallback stopwords.")
             # Comprehensive fallback stopwords list
-            self.stopwords = {
+            words = {
                 'i', 'me', 'my', 'myself', 'we', 'our', 'ours', 'ourselves', 'you', 'your', 'yours',
                 'yourself', 'yourselves', 'he', 'him', 'his', 'himself', 'she', 'her', 'hers',
                 'herself', 'it', 'its', 'itself', 'they', 'them', 'their', 'theirs', 'themselves',
@@ -45,7 +99,8 @@ class EmailPreprocessor:
                 'not', 'only', 'own', 'same', 'so', 'than', 'too', 'very', 's', 't', 'can', 'will',
                 'just', 'don', 'should', 'now', 'also', 'would', 'could', 'may', 'might', 'must'
             }
-            logger.info(f"Using fallback stopwords: {len(self.stopwords)} words")
+            logger.info(f"Using fallback stopwords: {len(words)} words")
+            return words
 
     def remove_html(self, text: str) -> str:
         """
@@ -61,6 +116,8 @@ class EmailPreprocessor:
             return ""
 
         try:
+            from bs4 import BeautifulSoup
+
             # Parse HTML and extract text
             soup = BeautifulSoup(text, 'html.parser')
 
@@ -211,10 +268,14 @@ class EmailPreprocessor:
         """
         if not text:
             return []
+        if self._stopwords is None:
+            self._load_nltk()
+        if self.word_tokenize is None:
+            return text.split()
 
         try:
             # Try NLTK tokenization first
-            tokens = nltk.word_tokenize(text)
+            tokens = self.word_tokenize(text)
             logger.debug(f"Tokenized: {len(tokens)} tokens")
             return tokens
 
@@ -251,28 +312,35 @@ class EmailPreprocessor:
                 "processed_length": 0
             }
 
-        logger.info(f"Starting preprocessing pipeline ({len(email_content)} chars)")
+        request_logger.debug("Starting preprocessing pipeline (%d chars)", len(email_content))
 
         # Step 1: Remove HTML tags and entities
-        step1 = self.remove_html(email_content)
+        with timed("remove_html"):
+            step1 = self.remove_html(email_content)
 
         # Step 2: Remove URLs
-        step2 = self.remove_urls(step1)
+        with timed("remove_urls"):
+            step2 = self.remove_urls(step1)
 
         # Step 3: Remove email addresses
-        step3 = self.remove_emails(step2)
+        with timed("remove_emails"):
+            step3 = self.remove_emails(step2)
 
         # Step 4: Convert to lowercase
-        step4 = self.to_lowercase(step3)
+        with timed("lowercase"):
+            step4 = self.to_lowercase(step3)
 
         # Step 5: Remove symbols and special characters
-        step5 = self.remove_symbols(step4)
+        with timed("remove_symbols"):
+            step5 = self.remove_symbols(step4)
 
         # Step 6: Remove stopwords
-        step6 = self.remove_stopwords(step5)
+        with timed("stopwords"):
+            step6 = self.remove_stopwords(step5)
 
         # Step 7: Tokenize
-        tokens = self.tokenize(step6)
+        with timed("tokenize"):
+            tokens = self.tokenize(step6)
 
         # Prepare result
         result = {
@@ -295,7 +363,7 @@ class EmailPreprocessor:
                 "step6_stopwords_removed": step6,
             })
 
-        logger.info(f"Preprocessing complete: {len(tokens)} tokens generated ({result['reduction_percentage']}% reduction)")
+        request_logger.debug("Preprocessing complete: %d tokens generated (%s%% reduction)", len(tokens), result['reduction_percentage'])
 
         return result
 
@@ -0,0 +1,208 @@
+"""
+On-demand sampling profiler
+Admin-triggered, time-boxed CPU profile of the worker that receives the
+request, without restarting or redeploying
+
+- A background thread snapshots every thread's Python stack
+  (sys._current_frames) every interval_ms; nothing is traced between samples,
+  so the cost stays bounded while a profile runs and is zero otherwise
+- route mode only keeps samples taken while a request whose path starts
+  with the given prefix is in flight (see ProfilingMiddleware)
+- Results go to PROFILER_DIR so any worker can serve the download:
+  collapsed stacks (flamegraph.pl / speedscope input) and a JSON summary of
+  the hottest functions
+"""
+
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+_PROFILE_ID_CHARS = set("0123456789abcdef")
+
+# Leaf frames of threads that are blocked rather than using CPU
+_IDLE_FRAMES = (
+    "wait (threading.py", "_wait_for_tstate_lock (threading.py", "_worker (thread.py",
+    "select (selectors.py", "_write_to_self (selector_events.py",
+)
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+class ProfileSession:
+    """One profile run: the sampling loop and its aggregated stacks"""
+
+    def __init__(self, profile_id: str, duration: float, interval_ms: float, route: Optional[str]):
+        self.profile_id = profile_id
+        self.duration = duration
+        self.interval = interval_ms / 1000
+        self.route = route
+        self.started_at = time.time()
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.active_requests = 0
+        self._stop = threading.Event()
+
+    def _sample(self, own_thread_id: int) -> None:
+        for thread_id, frame in sys._current_frames().items():
+            if thread_id == own_thread_id:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            # Idle threads (pool workers waiting on a queue) would swamp the profile
+            if stack and stack[0].startswith(_IDLE_FRAMES):
+                continue
+            self.stacks[";".join(reversed(stack))] += 1
+        self.samples += 1
+
+    def run(self) -> None:
+        """Sample until the duration is up or stop is requested (blocks)"""
+        own_thread_id = threading.get_ident()
+        deadline = time.monotonic() + self.duration
+        while not self._stop.is_set() and time.monotonic() < deadline:
+            if self.route is None or self.active_requests > 0:
+                self._sample(own_thread_id)
+            self._stop.wait(self.interval)
+
+class SamplingProfiler:
+    """At most one profile per worker; finished profiles are written to `directory`"""
+
+    def __init__(self, directory: str, max_seconds: float):
+        self.directory = Path(directory)
+        self.max_seconds = max_seconds
+        self.session: Optional[ProfileSession] = None
+        self._lock = threading.Lock()
+
+    def _path(self, profile_id: str, suffix: str) -> Path:
+        if not profile_id or set(profile_id) - _PROFILE_ID_CHARS:
+            raise ValueError("Invalid profile id")
+        return self.directory / f"{profile_id}.{suffix}"
+
+    def _write_meta(self, session: ProfileSession, status: str, **extra: Any) -> Dict[str, Any]:
+        meta = {
+            "profile_id": session.profile_id,
+            "status": status,
+            "pid": os.getpid(),
+            "route": session.route,
+            "duration_seconds": session.duration,
+            "interval_ms": session.interval * 1000,
+            "started_at": session.started_at,
+            **extra,
+        }
+        self._path(session.profile_id, "json").write_text(json.dumps(meta))
+        return meta
+
+    def start(self, duration: float, interval_ms: float = 5.0, route: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Start profiling this worker
+
+        Args:
+            duration: Seconds to run (capped at max_seconds)
+            interval_ms: Time between stack samples
+            route: Only sample while requests under this path prefix are in flight
+
+        Returns:
+            Profile metadata (profile_id, pid, ...)
+
+        Raises:
+            RuntimeError: A profile is already running in this worker
+        """
+        with self._lock:
+            if self.session is not None:
+                raise RuntimeError(f"Profile {self.session.profile_id} is already running in this worker")
+            self.directory.mkdir(parents=True, exist_ok=True)
+            session = ProfileSession(
+                uuid.uuid4().hex,
+                min(max(duration, 0.1), self.max_seconds),
+                max(interval_ms, 1.0),
+                route,
+            )
+            self.session = session
+        meta = self._write_meta(session, "running")
+        threading.Thread(target=self._run, args=(session,), name=f"profiler-{session.profile_id}", daemon=True).start()
+        logger.info(f"Profile {session.profile_id} started for {session.duration}s (route={route})")
+        return meta
+
+    def stop(self) -> None:
+        """End the running profile early (results are still written)"""
+        session = self.session
+        if session is not None:
+            session._stop.set()
+
+    def _run(self, session: ProfileSession) -> None:
+        session.run()
+        try:
+            lines = [f"{stack} {count}" for stack, count in session.stacks.most_common()]
+            self._path(session.profile_id, "collapsed").write_text("\n".join(lines) + "\n")
+            self._write_meta(session, "finished", samples=session.samples, finished_at=time.time(),
+                             summary=self._summarise(session.stacks))
+            logger.info(f"Profile {session.profile_id} finished with {session.samples} samples")
+        except Exception as e:
+            logger.error(f"Writing profile {session.profile_id} failed: {e}")
+        finally:
+            with self._lock:
+                self.session = None
+
+    @staticmethod
+    def _summarise(stacks: Counter, top: int = 30) -> Dict[str, List[Tuple[str, int]]]:
+        """Hottest functions by own samples (leaf) and by total samples (anywhere on the stack)"""
+        own: Counter = Counter()
+        total: Counter = Counter()
+        for stack, count in stacks.items():
+            frames = stack.split(";")
+            own[frames[-1]] += count
+            for frame in set(frames):
+                total[frame] += count
+        return {"self": own.most_common(top), "total": total.most_common(top)}
+
+    def request_started(self, path: str) -> bool:
+        """Called by ProfilingMiddleware; True if this request counts for the running profile"""
+        session = self.session
+        if session is None or session.route is None or not path.startswith(session.route):
+            return False
+        session.active_requests += 1
+        return True
+
+    def request_finished(self) -> None:
+        session = self.session
+        if session is not None and session.active_requests > 0:
+            session.active_requests -= 1
+
+    def get(self, profile_id: str) -> Optional[Dict[str, Any]]:
+        """Metadata for a profile from any worker, or None"""
+        path = self._path(profile_id, "json")
+        if not path.exists():
+            return None
+        return json.loads(path.read_text())
+
+    def collapsed_path(self, profile_id: str) -> Path:
+        return self._path(profile_id, "collapsed")
+
+    def list(self) -> List[Dict[str, Any]]:
+        if not self.directory.exists():
+            return []
+        profiles = []
+        for path in self.directory.glob("*.json"):
+            try:
+                meta = json.loads(path.read_text())
+            except (OSError, ValueError):
+                continue
+            meta.pop("summary", None)
+            profiles.append(meta)
+        return sorted(profiles, key=lambda meta: meta["started_at"], reverse=True)
+
+# Global profiler for this worker
+profiler = SamplingProfiler(settings.PROFILER_DIR, settings.PROFILER_MAX_SECONDS)
@@ -0,0 +1,318 @@
+"""
+Per-tenant token-bucket rate limiting
+Buckets are keyed by API key (X-API-Key clients) or user id (JWT clients)
+so one noisy tenant can't starve everyone else's /analyze traffic
+
+Backends:
+- SharedMemoryBackend (default): fixed-size bucket table in an anonymous
+  shared mmap created at import. Workers forked from a preloading master
+  (serve.py) inherit the same mapping and locks, so limits hold across
+  workers. Without preloading each process gets its own table. The locks
+  are fcntl byte-range locks, which the kernel drops when their process
+  dies, and are waited on for at most RATE_LIMIT_LOCK_TIMEOUT_MS before the
+  check fails open
+- RedisBackend: atomic Lua token bucket, for limits across hosts
+  (RATE_LIMIT_REDIS_URL)
+"""
+
+import errno
+import hashlib
+import logging
+import math
+import mmap
+import struct
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Dict, Iterator, Tuple
+
+try:
+    import fcntl
+except ImportError:  # Windows: no forked workers to share buckets with
+    fcntl = None
+
+from fastapi import Depends, HTTPException, Request, Response, status
+
+from app.config import settings
+from app.dependencies import get_current_user_or_api_key
+from app.models.user import User
+
+logger = logging.getLogger(__name__)
+
+@dataclass(frozen=True)
+class Quota:
+    """Refill rate and bucket size for one endpoint class"""
+    name: str
+    per_minute: int
+    burst: int
+
+    @property
+    def rate(self) -> float:
+        return self.per_minute / 60.0
+
+QUOTAS: Dict[str, Quota] = {
+    "analyze": Quota("analyze", settings.RATE_LIMIT_ANALYZE_PER_MINUTE, settings.RATE_LIMIT_ANALYZE_BURST),
+    "batch": Quota("batch", settings.RATE_LIMIT_BATCH_PER_MINUTE, settings.RATE_LIMIT_BATCH_BURST),
+}
+
+def _key_hash(key: str) -> int:
+    """Stable 63-bit hash (the builtin hash() differs between processes); never 0"""
+    digest = hashlib.blake2b(key.encode(), digest_size=8).digest()
+    return (int.from_bytes(digest, "little") >> 1) or 1
+
+class StripedLocks:
+    """
+    Cross-process locks, one per stripe, that can't be orphaned
+
+    Each stripe is a one-byte fcntl lock on an unlinked temporary file whose
+    descriptor forked workers inherit. fcntl locks belong to the process and
+    are released by the kernel when it exits, so a worker killed mid-update
+    can't wedge the others (a multiprocessing.Lock would stay held forever).
+    They don't exclude threads of the same process, hence the thread lock.
+    """
+
+    def __init__(self, stripes: int, timeout: float):
+        self.stripes = stripes
+        self.timeout = timeout
+        self._threads = [threading.Lock() for _ in range(stripes)]
+        self._file = tempfile.TemporaryFile() if fcntl is not None else None
+
+    @contextmanager
+    def hold(self, stripe: int) -> Iterator[None]:
+        """
+        Raises:
+            TimeoutError: The stripe stayed locked for longer than the timeout
+        """
+        deadline = time.monotonic() + self.timeout
+        if not self._threads[stripe].acquire(timeout=self.timeout):
+            raise TimeoutError(f"Rate limit lock {stripe} busy for {self.timeout * 1000:.0f} ms")
+        try:
+            if self._file is None:
+                yield
+                return
+            delay = 0.0001
+            while True:
+                try:
+                    fcntl.lockf(self._file, fcntl.LOCK_EX | fcntl.LOCK_NB, 1, stripe)
+                    break
+                except OSError as e:
+                    if e.errno not in (errno.EACCES, errno.EAGAIN):
+                        raise
+                    if time.monotonic() >= deadline:
+                        raise TimeoutError(f"Rate limit lock {stripe} busy for {self.timeout * 1000:.0f} ms")
+                    # Held for microseconds by another worker; spin briefly
+                    time.sleep(delay)
+                    delay = min(delay * 2, 0.005)
+            try:
+                yield
+            finally:
+                fcntl.lockf(self._file, fcntl.LOCK_UN, 1, stripe)
+        finally:
+            self._threads[stripe].release()
+
+class SharedMemoryBackend:
+    """
+    Open-addressed bucket table in shared memory
+
+    Each slot is (key hash, tokens, last refill). A key probes the
+    `group_size` slots of its group; stale slots (full bucket) are reused
+    and, if the group is full, the least recently refilled slot is evicted.
+    Groups are guarded by striped cross-process locks (StripedLocks).
+    """
+
+    SLOT = struct.Struct("<qdd")
+
+    def __init__(self, slots: int = 65536, group_size: int = 8, lock_stripes: int = 64,
+                 lock_timeout: float = 0.05):
+        self.group_size = group_size
+        self.groups = max(1, slots // group_size)
+        self._buf = mmap.mmap(-1, self.groups * group_size * self.SLOT.size)
+        self._locks = StripedLocks(lock_stripes, lock_timeout)
+
+    def take(self, key: str, quota: Quota, cost: float = 1.0) -> Tuple[bool, float, float]:
+        """
+        Try to remove `cost` tokens from the key's bucket
+
+        Returns:
+            (allowed, tokens remaining, seconds until `cost` tokens are available)
+
+        Raises:
+            TimeoutError: The group's lock wasn't acquired in time
+        """
+        key_hash = _key_hash(f"{quota.name}:{key}")
+        group = key_hash % self.groups
+        base = group * self.group_size
+        size = self.SLOT.size
+        now = time.monotonic()
+        full_after = quota.burst / quota.rate if quota.rate > 0 else math.inf
+
+        with self._locks.hold(group % self._locks.stripes):
+            slot = free = None
+            oldest, oldest_time = base, math.inf
+            for i in range(base, base + self.group_size):
+                stored_hash, tokens, last = self.SLOT.unpack_from(self._buf, i * size)
+                if stored_hash == key_hash:
+                    slot = i
+                    break
+                if free is None and (stored_hash == 0 or now - last >= full_after):
+                    # Empty, or idle long enough to be full again - free to reuse
+                    free = i
+                elif last < oldest_time:
+                    oldest, oldest_time = i, last
+
+            if slot is None:
+                slot = free if free is not None else oldest
+                tokens, last = float(quota.burst), now
+
+            tokens = min(float(quota.burst), tokens + (now - last) * quota.rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self.SLOT.pack_into(self._buf, slot * size, key_hash, tokens, now)
+
+        retry_after = 0.0 if allowed else (cost - tokens) / quota.rate if quota.rate > 0 else math.inf
+        return allowed, tokens, retry_after
+
+    def reset(self) -> None:
+        self._buf[:] = bytes(len(self._buf))
+
+class RedisBackend:
+    """Token bucket evaluated atomically inside Redis"""
+
+    SCRIPT = """
+    local tokens = tonumber(redis.call('HGET', KEYS[1], 't'))
+    local last = tonumber(redis.call('HGET', KEYS[1], 'l'))
+    local rate = tonumber(ARGV[1])
+    local burst = tonumber(ARGV[2])
+    local cost = tonumber(ARGV[3])
+    local now = redis.call('TIME')
+    now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+    if tokens == nil then
+        tokens = burst
+        last = now
+    end
+    tokens = math.min(burst, tokens + (now - last) * rate)
+    local allowed = 0
+    if tokens >= cost then
+        tokens = tokens - cost
+        allowed = 1
+    end
+    redis.call('HSET', KEYS[1], 't', tokens, 'l', now)
+    redis.call('PEXPIRE', KEYS[1], math.ceil(burst / rate * 1000) + 1000)
+    return {allowed, tostring(tokens)}
+    """
+
+    def __init__(self, url: str, namespace: str = "mailsentra:ratelimit:"):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.namespace = namespace
+        self._script = self.client.register_script(self.SCRIPT)
+
+    def take(self, key: str, quota: Quota, cost: float = 1.0) -> Tuple[bool, float, float]:
+        allowed, tokens = self._script(
+            keys=[f"{self.namespace}{quota.name}:{key}"],
+            args=[quota.rate, quota.burst, cost],
+        )
+        tokens = float(tokens)
+        retry_after = 0.0 if allowed else (cost - tokens) / quota.rate
+        return bool(allowed), tokens, retry_after
+
+    def reset(self) -> None:
+        keys = list(self.client.scan_iter(match=f"{self.namespace}*"))
+        if keys:
+            self.client.delete(*keys)
+
+class RateLimiter:
+    """Facade used by the route dependencies"""
+
+    def __init__(self, backend=None, enabled: bool = True):
+        self.backend = backend or _shared_memory_backend()
+        self.enabled = enabled
+        self.checks = 0
+        self.rejected = 0
+
+    def check(self, key: str, quota: Quota, cost: float = 1.0) -> Tuple[bool, float, float]:
+        """
+        Returns:
+            (allowed, tokens remaining, retry after seconds); fails open on backend errors
+        """
+        if not self.enabled or quota.per_minute <= 0:
+            return True, float(quota.burst), 0.0
+        # A request larger than the bucket could never pass; charge a full bucket instead
+        cost = min(cost, float(quota.burst))
+        self.checks += 1
+        try:
+            allowed, tokens, retry_after = self.backend.take(key, quota, cost)
+        except Exception as e:
+            logger.warning(f"Rate limit backend error, allowing request: {e}")
+            return True, float(quota.burst), 0.0
+        if not allowed:
+            self.rejected += 1
+        return allowed, tokens, retry_after
+
+def _shared_memory_backend() -> SharedMemoryBackend:
+    return SharedMemoryBackend(settings.RATE_LIMIT_SLOTS, lock_timeout=settings.RATE_LIMIT_LOCK_TIMEOUT_MS / 1000)
+
+def _create_backend():
+    if settings.RATE_LIMIT_REDIS_URL:
+        try:
+            backend = RedisBackend(settings.RATE_LIMIT_REDIS_URL)
+            backend.client.ping()
+            logger.info("Rate limiter using Redis backend")
+            return backend
+        except Exception as e:
+            logger.warning(f"Redis rate limiter unavailable ({e}), using shared memory")
+    return _shared_memory_backend()
+
+# Created at import so preloaded workers share the table
+rate_limiter = RateLimiter(_create_backend(), enabled=settings.RATE_LIMIT_ENABLED)
+
+def rate_limit_key(request: Request, user: User) -> str:
+    """Tenant key: the API key when one was presented, otherwise the user"""
+    api_key = request.headers.get("x-api-key")
+    if api_key:
+        return "key:" + hashlib.sha256(api_key.encode()).hexdigest()[:32]
+    return f"user:{user.id}"
+
+def enforce_rate_limit(request: Request, response: Response, user: User, quota_name: str, cost: float = 1.0) -> None:
+    """
+    Charge `cost` tokens from the caller's bucket for this quota
+
+    Raises:
+        HTTPException 429 with Retry-After when the bucket is empty
+    """
+    quota = QUOTAS[quota_name]
+    allowed, tokens, retry_after = rate_limiter.check(rate_limit_key(request, user), quota, cost)
+    headers = {
+        "X-RateLimit-Limit": str(quota.per_minute),
+        "X-RateLimit-Remaining": str(max(0, int(tokens))),
+    }
+    if not allowed:
+        headers["Retry-After"] = str(max(1, math.ceil(retry_after)))
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Rate limit exceeded. Please try again later.",
+            headers=headers,
+        )
+    response.headers.update(headers)
+
+def rate_limit(quota_name: str):
+    """
+    Route dependency charging one token per request
+
+    A plain def, so FastAPI runs it in the threadpool: the bucket lock may be
+    waited on for up to RATE_LIMIT_LOCK_TIMEOUT_MS and must not stall the
+    event loop meanwhile.
+
+    Usage:
+        @router.post("/analyze", dependencies=[Depends(rate_limit("analyze"))])
+    """
+    def dependency(
+        request: Request,
+        response: Response,
+        current_user: User = Depends(get_current_user_or_api_key),
+    ) -> None:
+        enforce_rate_limit(request, response, current_user, quota_name)
+    return dependency
@@ -0,0 +1,185 @@
+"""
+Per-user statistics service
+Keeps the user_stats counters in step with spam_logs so dashboard
+endpoints can be served from a single row instead of scanning every log
+"""
+
+import logging
+from typing import Dict, Any, Iterable, Optional
+from sqlalchemy import select, delete, insert, update, func, case
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.models.spam_log import SpamLog
+from app.models.user_stats import UserStats, get_nairobi_time
+
+logger = logging.getLogger(__name__)
+
+COUNTER_COLUMNS = ("total_analyses", "spam_detected", "feedback_count", "feedback_correct")
+
+def _upsert_counters(dialect_name: str, user_id: int, **deltas):
+    """
+    Build an INSERT ... ON CONFLICT DO UPDATE that adds deltas to the counters
+    The increment happens inside the database, so concurrent writers never lose updates
+    """
+    insert_fn = pg_insert if dialect_name == "postgresql" else sqlite_insert
+
+    values = {column: max(deltas.get(column, 0), 0) for column in COUNTER_COLUMNS}
+    stmt = insert_fn(UserStats).values(user_id=user_id, updated_at=get_nairobi_time(), **values)
+
+    set_ = {
+        column: getattr(UserStats, column) + deltas[column]
+        for column in COUNTER_COLUMNS
+        if deltas.get(column)
+    }
+    set_["updated_at"] = stmt.excluded.updated_at
+    return stmt.on_conflict_do_update(index_elements=[UserStats.user_id], set_=set_)
+
+def _aggregate_query(user_ids: Optional[Iterable[int]] = None):
+    """GROUP BY query that recomputes the counters from spam_logs"""
+    query = select(
+        SpamLog.user_id,
+        func.count(SpamLog.id),
+        func.coalesce(func.sum(case((func.lower(SpamLog.result) == "spam", 1), else_=0)), 0),
+        func.coalesce(func.sum(case((SpamLog.is_correct.isnot(None), 1), else_=0)), 0),
+        func.coalesce(func.sum(case((SpamLog.is_correct == True, 1), else_=0)), 0),
+    ).group_by(SpamLog.user_id)
+    if user_ids is not None:
+        query = query.where(SpamLog.user_id.in_(list(user_ids)))
+    return query
+
+async def record_analysis(db: AsyncSession, user_id: int, result: str) -> None:
+    """
+    Count one analysis for the user
+    Call before committing the SpamLog so both land in the same transaction
+    """
+    is_spam = 1 if result.lower() == "spam" else 0
+    await db.execute(_upsert_counters(
+        db.bind.dialect.name, user_id,
+        total_analyses=1, spam_detected=is_spam
+    ))
+
+async def record_analyses(db: AsyncSession, user_id: int, total: int, spam: int) -> None:
+    """
+    Count a chunk of analyses for the user in one statement (bulk/streaming routes)
+    Call before committing the SpamLog rows so both land in the same transaction
+    """
+    if not total:
+        return
+    await db.execute(_upsert_counters(
+        db.bind.dialect.name, user_id,
+        total_analyses=total, spam_detected=spam
+    ))
+
+async def set_feedback_verdict(db: AsyncSession, spam_log_id: int, is_correct: bool) -> Optional[bool]:
+    """
+    Set SpamLog.is_correct and return the value it replaced
+
+    The previous value comes from the rowcount of conditional UPDATEs rather
+    than from a read before the write, so two concurrent first feedbacks on
+    one log can't both see None: the second UPDATE waits for the first
+    writer's row lock and then no longer matches.
+
+    Returns:
+        None if this was the log's first feedback, otherwise the previous is_correct
+    """
+    for previous in (None, not is_correct):
+        condition = SpamLog.is_correct.is_(None) if previous is None else SpamLog.is_correct == previous
+        result = await db.execute(
+            update(SpamLog)
+            .where(SpamLog.id == spam_log_id, condition)
+            .values(is_correct=is_correct)
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount:
+            return previous
+    # Already set to this verdict
+    return is_correct
+
+async def record_feedback(
+    db: AsyncSession,
+    user_id: int,
+    previous_is_correct: Optional[bool],
+    is_correct: bool
+) -> None:
+    """
+    Apply a feedback change to the user's counters
+
+    Args:
+        db: Async database session
+        user_id: Owner of the spam log
+        previous_is_correct: SpamLog.is_correct before this feedback (None if first
+            feedback), as returned by set_feedback_verdict()
+        is_correct: SpamLog.is_correct after this feedback
+    """
+    feedback_delta = 1 if previous_is_correct is None else 0
+    correct_delta = int(bool(is_correct)) - int(bool(previous_is_correct))
+    if not feedback_delta and not correct_delta:
+        return
+    await db.execute(_upsert_counters(
+        db.bind.dialect.name, user_id,
+        feedback_count=feedback_delta, feedback_correct=correct_delta
+    ))
+
+async def get_user_stats(db: AsyncSession, user_id: int) -> Dict[str, Any]:
+    """
+    Get the user's counters with a primary key lookup
+    Users without a counter row (e.g. created before the table existed) are
+    backfilled from spam_logs once
+    """
+    result = await db.execute(select(UserStats).where(UserStats.user_id == user_id))
+    stats = result.scalars().first()
+
+    if stats is None:
+        row = (await db.execute(_aggregate_query([user_id]))).first()
+        _, total, spam, feedback, correct = row if row else (user_id, 0, 0, 0, 0)
+        insert_fn = pg_insert if db.bind.dialect.name == "postgresql" else sqlite_insert
+        await db.execute(insert_fn(UserStats).values(
+            user_id=user_id,
+            total_analyses=total,
+            spam_detected=spam,
+            feedback_count=feedback,
+            feedback_correct=correct,
+            updated_at=get_nairobi_time()
+        ).on_conflict_do_nothing(index_elements=[UserStats.user_id]))
+        await db.commit()
+        logger.info(f"Backfilled user_stats for user {user_id}")
+        return {
+            "total_analyses": total,
+            "spam_detected": spam,
+            "ham_detected": total - spam,
+            "feedback_count": feedback,
+            "feedback_correct": correct
+        }
+
+    return {
+        "total_analyses": stats.total_analyses,
+        "spam_detected": stats.spam_detected,
+        "ham_detected": stats.ham_detected,
+        "feedback_count": stats.feedback_count,
+        "feedback_correct": stats.feedback_correct
+    }
+
+def rebuild_user_stats(db: Session, user_ids: Optional[Iterable[int]] = None) -> None:
+    """
+    Recompute counters from spam_logs after bulk deletes
+    Does not commit; call inside the same transaction as the delete
+
+    Args:
+        db: Sync database session
+        user_ids: Users to rebuild (None rebuilds every user)
+    """
+    if user_ids is not None:
+        user_ids = list(user_ids)
+        db.execute(delete(UserStats).where(UserStats.user_id.in_(user_ids)))
+    else:
+        db.execute(delete(UserStats))
+
+    db.execute(
+        insert(UserStats).from_select(
+            ["user_id", *COUNTER_COLUMNS],
+            _aggregate_query(user_ids)
+        )
+    )
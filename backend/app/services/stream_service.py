@@ -0,0 +1,357 @@
+"""
+Streaming bulk classification
+Backs POST /api/analyze/stream: NDJSON emails in, NDJSON verdicts out
+
+    request body --> reader --[bounded queue]--> classifier --[bounded queue]--> response
+
+- reader: splits the body into lines and parses them; stops reading the
+  socket when the queue is full, so memory stays bounded however large
+  the upload is
+- classifier: takes up to STREAM_BATCH_SIZE parsed emails at a time, runs
+  one predict_batch() call, bulk-inserts the SpamLog rows and updates
+  user_stats in one transaction, then emits the verdicts in input order
+- the batch rate-limit quota is charged per email; when a tenant runs out
+  the stream is throttled rather than aborted
+- the body is read straight from ASGI receive(), which keeps being watched
+  after the upload ends: when the client disconnects, reading and
+  classification stop instead of running to the end of the queue
+
+msgpack clients can send a stream of msgpack maps instead of NDJSON
+(Content-Type: application/msgpack) and/or receive one (Accept)
+"""
+
+import asyncio
+import logging
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+import msgpack
+import orjson
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from sqlalchemy import insert
+from starlette.types import Receive, Scope, Send
+
+from app.config import settings
+from app.database import AsyncSessionLocal
+from app.models.spam_log import SpamLog
+from app.services.model_service import spam_model
+from app.services.rate_limiter import QUOTAS, rate_limiter
+from app.services.stats_service import record_analyses
+from app.utils.sanitize import sanitize_email_text
+from app.utils.timing import timed
+
+logger = logging.getLogger(__name__)
+
+_END = None
+
+def _encode_ndjson(record: Dict[str, Any]) -> bytes:
+    return orjson.dumps(record) + b"\n"
+
+def _encode_msgpack(record: Dict[str, Any]) -> bytes:
+    return msgpack.packb(record, use_bin_type=True)
+
+def _parse_line(line_no: int, line: bytes) -> Optional[Dict[str, Any]]:
+    """Parse one NDJSON line into an email item or an error item (None for blank lines)"""
+    line = line.strip()
+    if not line:
+        return None
+    try:
+        data = orjson.loads(line)
+    except orjson.JSONDecodeError:
+        return {"line": line_no, "error": "Invalid JSON"}
+    return _validate_item(line_no, data)
+
+def _validate_item(line_no: int, data: Any) -> Dict[str, Any]:
+    """Turn one decoded record into an email item or an error item"""
+    if not isinstance(data, dict):
+        return {"line": line_no, "error": "Each line must be a JSON object"}
+
+    email_text = data.get("email_text")
+    if not isinstance(email_text, str) or not email_text.strip():
+        return {"line": line_no, "error": "Email text cannot be empty"}
+    email_id = data.get("email_id")
+    if email_id is not None and not isinstance(email_id, int):
+        return {"line": line_no, "error": "email_id must be an integer"}
+
+    return {"line": line_no, "email_text": email_text, "email_id": email_id}
+
+async def _request_body(receive: Receive, body_done: asyncio.Event,
+                        disconnected: asyncio.Event) -> AsyncIterator[bytes]:
+    """Request body chunks from ASGI receive(); sets body_done when the body ends"""
+    try:
+        while True:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                disconnected.set()
+                return
+            if message.get("body"):
+                yield message["body"]
+            if not message.get("more_body", False):
+                return
+    finally:
+        body_done.set()
+
+async def _watch_disconnect(receive: Receive, body_done: asyncio.Event, disconnected: asyncio.Event) -> None:
+    """Once the body is read, receive() only returns when the client goes away"""
+    await body_done.wait()
+    while not disconnected.is_set():
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            disconnected.set()
+
+async def _read_lines(body: AsyncIterator[bytes], queue: asyncio.Queue, max_line_bytes: int) -> None:
+    """Split the request body into parsed items; ends with the _END sentinel unless cancelled"""
+    buffer = bytearray()
+    line_no = 0
+    discarding = False
+    try:
+        async for chunk in body:
+            buffer += chunk
+            while True:
+                newline = buffer.find(b"\n")
+                if newline < 0:
+                    break
+                if discarding:
+                    # Tail of an oversized line
+                    del buffer[:newline + 1]
+                    discarding = False
+                    continue
+                line_no += 1
+                if newline > max_line_bytes:
+                    # Oversized line that arrived whole
+                    del buffer[:newline + 1]
+                    await queue.put({"line": line_no, "error": f"Line exceeds {max_line_bytes} bytes"})
+                    continue
+                line = bytes(buffer[:newline])
+                del buffer[:newline + 1]
+                item = _parse_line(line_no, line)
+                if item is not None:
+                    await queue.put(item)
+
+            if len(buffer) > max_line_bytes and not discarding:
+                line_no += 1
+                await queue.put({"line": line_no, "error": f"Line exceeds {max_line_bytes} bytes"})
+                discarding = True
+            if discarding:
+                buffer.clear()
+
+        if buffer and not discarding:
+            item = _parse_line(line_no + 1, bytes(buffer))
+            if item is not None:
+                await queue.put(item)
+    except Exception as e:
+        logger.error(f"Stream read error: {e}")
+        await queue.put({"line": line_no + 1, "error": f"Request body read failed: {str(e)}"})
+    # Not in a finally: a cancelled reader must not block on a full queue
+    await queue.put(_END)
+
+async def _read_msgpack(body: AsyncIterator[bytes], queue: asyncio.Queue, max_item_bytes: int) -> None:
+    """Same as _read_lines for a body of concatenated msgpack maps"""
+    unpacker = msgpack.Unpacker(raw=False, max_buffer_size=max_item_bytes)
+    item_no = 0
+    fed = 0
+    try:
+        async for chunk in body:
+            view = memoryview(chunk)
+            # Feed no more than the buffer has room for: a chunk holding many small
+            # items may be larger than max_item_bytes, only a single item may not
+            while view:
+                room = max_item_bytes - (fed - unpacker.tell())
+                if room <= 0:
+                    raise msgpack.BufferFull
+                unpacker.feed(view[:room])
+                fed += min(room, len(view))
+                view = view[room:]
+                for data in unpacker:
+                    item_no += 1
+                    await queue.put(_validate_item(item_no, data))
+    except msgpack.BufferFull:
+        await queue.put({"line": item_no + 1, "error": f"Item exceeds {max_item_bytes} bytes"})
+    except Exception as e:
+        logger.error(f"Stream read error: {e}")
+        await queue.put({"line": item_no + 1, "error": f"Request body read failed: {str(e)}"})
+    await queue.put(_END)
+
+async def _throttle(tenant_key: str, cost: int) -> None:
+    """Wait until the tenant's batch bucket can pay for this chunk"""
+    quota = QUOTAS["batch"]
+    while True:
+        # The bucket lock can block for up to RATE_LIMIT_LOCK_TIMEOUT_MS; keep it off the loop
+        allowed, _, retry_after = await run_in_threadpool(rate_limiter.check, tenant_key, quota, cost)
+        if allowed:
+            return
+        await asyncio.sleep(min(max(retry_after, 0.05), 5.0))
+
+async def _classify_chunk(chunk: List[Dict[str, Any]], user_id: int, tenant_key: str,
+                          encode: Callable[[Dict[str, Any]], bytes]) -> bytes:
+    """Predict, persist and serialise one chunk; returns its encoded records"""
+    items = [item for item in chunk if "error" not in item]
+    if items:
+        await _throttle(tenant_key, len(items))
+        predictions = await run_in_threadpool(spam_model.predict_batch, [item["email_text"] for item in items])
+
+        rows, logged = [], []
+        for item, prediction in zip(items, predictions):
+            if "error" in prediction:
+                item["error"] = f"Model prediction failed: {prediction['error']}"
+                continue
+            item["prediction"] = prediction
+            sanitized_text = sanitize_email_text(item["email_text"])
+            rows.append({
+                "user_id": user_id,
+                "email_id": item["email_id"],
+                "email_text": sanitized_text[:500],
+                "result": prediction["result"].capitalize(),
+                "confidence": prediction["confidence"],
+                "model_version": prediction["model_version"],
+                "is_correct": None,
+            })
+            logged.append(item)
+
+        if rows:
+            async with AsyncSessionLocal() as db:
+                log_ids = (await db.scalars(
+                    insert(SpamLog).returning(SpamLog.id, sort_by_parameter_order=True),
+                    rows
+                )).all()
+                spam = sum(1 for item in logged if item["prediction"]["result"] == "spam")
+                await record_analyses(db, user_id, len(rows), spam)
+                with timed("db_commit"):
+                    await db.commit()
+            for item, log_id in zip(logged, log_ids):
+                item["log_id"] = log_id
+
+    out = bytearray()
+    for item in chunk:
+        if "error" in item:
+            record = {"line": item["line"], "email_id": item.get("email_id"), "error": item["error"]}
+        else:
+            prediction = item["prediction"]
+            record = {
+                "line": item["line"],
+                "email_id": item["email_id"],
+                "log_id": item["log_id"],
+                "result": prediction["result"],
+                "confidence": prediction["confidence"],
+                "is_spam": prediction["result"] == "spam",
+                "model_version": prediction["model_version"],
+            }
+        out += encode(record)
+    return bytes(out)
+
+async def _classify(in_queue: asyncio.Queue, out_queue: asyncio.Queue, user_id: int,
+                    tenant_key: str, batch_size: int, encode: Callable[[Dict[str, Any]], bytes]) -> None:
+    """Drain parsed items in chunks; ends with a summary line and the _END sentinel unless cancelled"""
+    processed = errors = 0
+    try:
+        done = False
+        while not done:
+            item = await in_queue.get()
+            chunk = []
+            if item is _END:
+                done = True
+            else:
+                chunk.append(item)
+            # Take whatever else is already parsed, without waiting for a full chunk
+            while not done and len(chunk) < batch_size:
+                try:
+                    item = in_queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    break
+                if item is _END:
+                    done = True
+                else:
+                    chunk.append(item)
+
+            if chunk:
+                await out_queue.put(await _classify_chunk(chunk, user_id, tenant_key, encode))
+                failed = sum(1 for item in chunk if "error" in item)
+                errors += failed
+                processed += len(chunk) - failed
+
+        await out_queue.put(encode({"summary": {"processed": processed, "errors": errors}}))
+    except Exception as e:
+        logger.error(f"Stream classification error: {e}")
+        await out_queue.put(encode({
+            "error": f"Stream aborted: {str(e)}",
+            "summary": {"processed": processed, "errors": errors}
+        }))
+    await out_queue.put(_END)
+
+class NDJSONStreamingResponse(StreamingResponse):
+    """
+    StreamingResponse for endpoints that keep reading the request body while
+    responding. Starlette's version listens for http.disconnect on receive()
+    in parallel, which would swallow body chunks; here only the stream service
+    calls receive(), and stops the body iterator itself on disconnect.
+    """
+
+    media_type = "application/x-ndjson"
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({
+            "type": "http.response.start",
+            "status": self.status_code,
+            "headers": self.raw_headers,
+        })
+        async for chunk in self.body_iterator:
+            await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": b"", "more_body": False})
+        if self.background is not None:
+            await self.background()
+
+async def classify_ndjson_stream(
+    receive: Receive,
+    user_id: int,
+    tenant_key: str,
+    msgpack_in: bool = False,
+    msgpack_out: bool = False
+) -> AsyncIterator[bytes]:
+    """
+    Classify an NDJSON request body, yielding NDJSON verdicts as chunks complete
+
+    Args:
+        receive: ASGI receive callable of the request (request.receive); the
+            body must not have been read yet
+        user_id: Owner of the SpamLog rows
+        tenant_key: Rate-limit key for the batch quota
+        msgpack_in: Body is concatenated msgpack maps instead of NDJSON
+        msgpack_out: Yield msgpack maps instead of JSON lines
+
+    Yields:
+        Encoded records: one per input line, then a summary
+    """
+    batch_size = max(1, settings.STREAM_BATCH_SIZE)
+    in_queue: asyncio.Queue = asyncio.Queue(maxsize=max(batch_size, settings.STREAM_QUEUE_SIZE))
+    # A couple of serialised chunks in flight; a slow reader pauses the model
+    out_queue: asyncio.Queue = asyncio.Queue(maxsize=2)
+
+    read = _read_msgpack if msgpack_in else _read_lines
+    encode = _encode_msgpack if msgpack_out else _encode_ndjson
+
+    body_done = asyncio.Event()
+    disconnected = asyncio.Event()
+    body = _request_body(receive, body_done, disconnected)
+
+    reader = asyncio.create_task(read(body, in_queue, settings.STREAM_MAX_LINE_BYTES))
+    classifier = asyncio.create_task(_classify(in_queue, out_queue, user_id, tenant_key, batch_size, encode))
+    watcher = asyncio.create_task(_watch_disconnect(receive, body_done, disconnected))
+    gone = asyncio.create_task(disconnected.wait())
+    try:
+        while True:
+            next_chunk = asyncio.create_task(out_queue.get())
+            await asyncio.wait((next_chunk, gone), return_when=asyncio.FIRST_COMPLETED)
+            if gone.done():
+                next_chunk.cancel()
+                logger.info("Stream client disconnected; stopping classification")
+                break
+            data = next_chunk.result()
+            if data is _END:
+                break
+            yield data
+    finally:
+        # Client went away (or we finished): stop reading and classifying
+        tasks = (reader, classifier, watcher, gone)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,202 @@
+"""
+TTL response cache for expensive admin endpoints
+In-process by default, optionally backed by Redis so several workers share entries
+
+Features:
+- Per-entry TTL (each endpoint picks its own)
+- Single-flight: concurrent misses for the same key run the computation once
+- Prefix invalidation, called after retrains, user changes and bulk deletes
+"""
+
+import functools
+import json
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Optional, Sequence, Tuple
+
+from fastapi.encoders import jsonable_encoder
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+class MemoryBackend:
+    """Process-local dict of key -> (expires_at, value)"""
+
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._data: Dict[str, Tuple[float, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            with self._lock:
+                self._data.pop(key, None)
+            return None
+        return value
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        with self._lock:
+            if len(self._data) >= self.max_entries:
+                self._evict()
+            self._data[key] = (time.monotonic() + ttl, value)
+
+    def delete_prefix(self, prefix: str) -> int:
+        with self._lock:
+            keys = [k for k in self._data if k.startswith(prefix)]
+            for k in keys:
+                del self._data[k]
+        return len(keys)
+
+    def _evict(self) -> None:
+        """Drop expired entries, then the soonest-to-expire if still full"""
+        now = time.monotonic()
+        for k in [k for k, (exp, _) in self._data.items() if exp < now]:
+            del self._data[k]
+        if len(self._data) >= self.max_entries:
+            oldest = min(self._data, key=lambda k: self._data[k][0])
+            del self._data[oldest]
+
+class RedisBackend:
+    """Redis-backed store, values kept as JSON"""
+
+    def __init__(self, url: str, namespace: str = "mailsentra:cache:"):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.namespace = namespace
+
+    def get(self, key: str) -> Optional[Any]:
+        raw = self.client.get(self.namespace + key)
+        return json.loads(raw) if raw is not None else None
+
+    def set(self, key: str, value: Any, ttl: float) -> None:
+        self.client.set(self.namespace + key, json.dumps(value), px=int(ttl * 1000))
+
+    def delete_prefix(self, prefix: str) -> int:
+        keys = list(self.client.scan_iter(match=f"{self.namespace}{prefix}*"))
+        if keys:
+            self.client.delete(*keys)
+        return len(keys)
+
+class ResponseCache:
+    """
+    Cache facade used by routes
+    Values are stored JSON-encoded so both backends behave the same
+    """
+
+    def __init__(self, backend=None, enabled: bool = True):
+        self.backend = backend or MemoryBackend()
+        self.enabled = enabled
+        self.hits = 0
+        self.misses = 0
+        self._key_locks: Dict[str, threading.Lock] = {}
+        self._locks_guard = threading.Lock()
+
+    def _lock_for(self, key: str) -> threading.Lock:
+        with self._locks_guard:
+            lock = self._key_locks.get(key)
+            if lock is None:
+                lock = self._key_locks[key] = threading.Lock()
+            return lock
+
+    def get_or_compute(self, key: str, ttl: float, compute: Callable[[], Any]) -> Any:
+        """
+        Return the cached value for key, computing it at most once per TTL
+
+        Args:
+            key: Cache key
+            ttl: Seconds the computed value stays fresh
+            compute: Zero-argument callable producing the value
+
+        Returns:
+            JSON-compatible value
+        """
+        if not self.enabled or ttl <= 0:
+            return jsonable_encoder(compute())
+
+        value = self._safe_get(key)
+        if value is not None:
+            self.hits += 1
+            return value
+
+        # Single-flight: the first caller computes, the rest wait and reuse it
+        with self._lock_for(key):
+            value = self._safe_get(key)
+            if value is not None:
+                self.hits += 1
+                return value
+
+            self.misses += 1
+            value = jsonable_encoder(compute())
+            try:
+                self.backend.set(key, value, ttl)
+            except Exception as e:
+                logger.warning(f"Cache set failed for {key}: {e}")
+            return value
+
+    def invalidate(self, *prefixes: str) -> None:
+        """Drop every entry whose key starts with one of the prefixes"""
+        for prefix in prefixes:
+            try:
+                removed = self.backend.delete_prefix(prefix)
+                logger.debug(f"Cache invalidated {removed} entries for '{prefix}'")
+            except Exception as e:
+                logger.warning(f"Cache invalidation failed for {prefix}: {e}")
+
+    def _safe_get(self, key: str) -> Optional[Any]:
+        try:
+            return self.backend.get(key)
+        except Exception as e:
+            logger.warning(f"Cache get failed for {key}: {e}")
+            return None
+
+def _create_backend():
+    if settings.CACHE_REDIS_URL:
+        try:
+            backend = RedisBackend(settings.CACHE_REDIS_URL)
+            backend.client.ping()
+            logger.info("Response cache using Redis backend")
+            return backend
+        except Exception as e:
+            logger.warning(f"Redis cache unavailable ({e}), falling back to in-process cache")
+    return MemoryBackend()
+
+# Global cache instance shared by all routes
+response_cache = ResponseCache(_create_backend(), enabled=settings.CACHE_ENABLED)
+
+def cached_endpoint(namespace: str, ttl: float, vary_on: Sequence[str] = ()):
+    """
+    Cache a sync route's return value
+
+    Args:
+        namespace: Key prefix, also used for invalidation (e.g. "admin:stats")
+        ttl: Seconds to keep the response
+        vary_on: Route parameters that change the response (e.g. ("days",))
+
+    Usage:
+        @router.get("/stats")
+        @cached_endpoint("admin:stats", ttl=settings.CACHE_TTL_ADMIN_STATS)
+        def get_system_stats(...):
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            key = namespace
+            if vary_on:
+                key += ":" + ":".join(f"{name}={kwargs.get(name)}" for name in vary_on)
+            return response_cache.get_or_compute(key, ttl, lambda: func(*args, **kwargs))
+        return wrapper
+    return decorator
+
+def invalidate_analytics_cache() -> None:
+    """Drop cached aggregates after writes that change them (user changes, bulk deletes)"""
+    response_cache.invalidate("admin:", "metrics:")
+
+def invalidate_model_cache() -> None:
+    """Drop cached model information after a (re)train or version cleanup"""
+    response_cache.invalidate("model:", "admin:", "metrics:")
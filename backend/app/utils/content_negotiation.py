@@ -0,0 +1,91 @@
+"""
+msgpack content negotiation
+Lets machine clients send and receive msgpack instead of JSON on the
+analyze and logs routes, with the same pydantic schemas
+
+- Request: Content-Type: application/msgpack (or application/x-msgpack)
+- Response: Accept: application/msgpack; JSON stays the default
+
+Usage:
+    router = APIRouter(route_class=MsgPackRoute)
+"""
+
+from typing import Any, Callable, Mapping
+
+import msgpack
+from fastapi import HTTPException, Request, Response, status
+from fastapi.routing import APIRoute
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+MSGPACK_MEDIA_TYPES = ("application/msgpack", "application/x-msgpack", "application/vnd.msgpack")
+
+def _has_msgpack(value: str) -> bool:
+    value = value.lower()
+    return any(media_type in value for media_type in MSGPACK_MEDIA_TYPES)
+
+def is_msgpack_request(headers: Mapping[str, str]) -> bool:
+    """Body is msgpack (Content-Type)"""
+    return _has_msgpack(headers.get("content-type", ""))
+
+def accepts_msgpack(headers: Mapping[str, str]) -> bool:
+    """Client asked for a msgpack response (Accept)"""
+    return _has_msgpack(headers.get("accept", ""))
+
+class MsgPackResponse(Response):
+    media_type = MSGPACK_MEDIA_TYPE
+
+    def render(self, content: Any) -> bytes:
+        return msgpack.packb(content, use_bin_type=True)
+
+class MsgPackRequest(Request):
+    """Request whose json() decodes a msgpack body"""
+
+    async def json(self) -> Any:
+        if not hasattr(self, "_json"):
+            try:
+                self._json = msgpack.unpackb(await self.body(), raw=False)
+            except (ValueError, msgpack.ExtraData, msgpack.FormatError, msgpack.StackError):
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail="Invalid msgpack body"
+                )
+        return self._json
+
+class MsgPackRoute(APIRoute):
+    """
+    APIRoute that negotiates msgpack per request
+
+    Two handlers are built up front (JSON and msgpack response classes), so
+    a msgpack response is serialised straight from the validated data
+    rather than re-encoded from JSON.
+    """
+
+    def get_route_handler(self) -> Callable:
+        json_handler = super().get_route_handler()
+        default_response_class = self.response_class
+        self.response_class = MsgPackResponse
+        try:
+            msgpack_handler = super().get_route_handler()
+        finally:
+            self.response_class = default_response_class
+
+        has_body = self.body_field is not None
+
+        async def handler(request: Request) -> Response:
+            if has_body and is_msgpack_request(request.headers):
+                # FastAPI only calls request.json() for JSON content types
+                scope = dict(request.scope)
+                scope["headers"] = [
+                    (name, b"application/json" if name == b"content-type" else value)
+                    for name, value in request.scope["headers"]
+                ]
+                request = MsgPackRequest(scope, request.receive)
+
+            if accepts_msgpack(request.headers):
+                response = await msgpack_handler(request)
+            else:
+                response = await json_handler(request)
+            response.headers.append("Vary", "Accept")
+            return response
+
+        return handler
@@ -0,0 +1,216 @@
+"""
+Central logging configuration
+Replaces per-module logging.basicConfig calls; setup_logging() runs once per
+process (main.py, train_model.py) and again in forked gunicorn workers
+
+- Records go through a QueueHandler to a QueueListener thread, so request
+  threads never block on (or pay for) stream writes and formatting
+- Per-logger sampling: INFO/DEBUG records of a logger (and its children) are
+  kept with the configured probability; warnings and errors always pass.
+  Per-request lines log through hot_logger("<area>") ("app.hot.<area>"),
+  which LOG_SAMPLE_RATES samples by default
+- LOG_FORMAT=json writes one JSON object per line with the request id, the
+  trace id (when traced) and any `extra=` fields; text keeps the classic format
+"""
+
+import atexit
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+from typing import Dict, Optional
+
+import orjson
+
+from app.utils.middleware import request_id_var
+from app.utils.tracing import current_span
+
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+
+# Attributes every LogRecord has; anything else came in through extra=
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {"message", "asctime"}
+_SAFE_ARG_TYPES = (str, int, float, bool, type(None))
+
+_listener: Optional[logging.handlers.QueueListener] = None
+
+def hot_logger(area: str) -> logging.Logger:
+    """Logger for per-request lines (sampled through LOG_SAMPLE_RATES under "app.hot")"""
+    return logging.getLogger(f"app.hot.{area}")
+
+def parse_sample_rates(spec: str) -> Dict[str, float]:
+    """
+    Parse "logger=rate,logger=rate" (e.g. "app.hot=0.01,app.hot.analyze=1")
+
+    Raises:
+        ValueError: Malformed entry or rate outside 0..1
+    """
+    rates = {}
+    for entry in spec.split(","):
+        entry = entry.strip()
+        if not entry:
+            continue
+        name, sep, rate = entry.partition("=")
+        if not sep or not name.strip():
+            raise ValueError(f"Invalid log sample rate: {entry!r}")
+        value = float(rate)
+        if not 0.0 <= value <= 1.0:
+            raise ValueError(f"Log sample rate must be between 0 and 1: {entry!r}")
+        rates[name.strip()] = value
+    return rates
+
+class SamplingFilter(logging.Filter):
+    """Keep INFO/DEBUG records with the rate of the longest matching logger prefix"""
+
+    def __init__(self, rates: Dict[str, float]):
+        super().__init__()
+        self.rates = dict(rates)
+        self.dropped = 0
+        # Resolved rate per logger name (None = not sampled)
+        self._resolved: Dict[str, Optional[float]] = {}
+
+    def _rate(self, name: str) -> Optional[float]:
+        try:
+            return self._resolved[name]
+        except KeyError:
+            pass
+        rate = None
+        candidate = name
+        while candidate:
+            if candidate in self.rates:
+                rate = self.rates[candidate]
+                break
+            candidate = candidate.rpartition(".")[0]
+        self._resolved[name] = rate
+        return rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self._rate(record.name)
+        if rate is None or rate >= 1.0:
+            return True
+        if rate > 0.0 and random.random() < rate:
+            record.sample_rate = rate
+            return True
+        self.dropped += 1
+        return False
+
+class RequestContextFilter(logging.Filter):
+    """Stamp the current request id and trace id (runs in the caller, where the context is set)"""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        span = current_span.get()
+        record.trace_id = span.trace_id if span is not None else None
+        return True
+
+class LazyQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler that leaves message formatting to the listener thread
+
+    The stock prepare() formats every record in the calling thread. Here args
+    are only merged early when they aren't immutable scalars (so later
+    mutation can't change the message), and tracebacks are rendered to text
+    because frames must not outlive the call.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        args = record.args
+        if args and not (isinstance(args, tuple) and all(isinstance(arg, _SAFE_ARG_TYPES) for arg in args)):
+            record.msg = record.getMessage()
+            record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, message, request_id and extra= fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS and value is not None:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exception"] = record.exc_text
+        return orjson.dumps(entry, default=str).decode()
+
+def configure_logging(
+    level: str = "INFO",
+    fmt: str = "text",
+    sample_rates: Optional[Dict[str, float]] = None,
+    use_queue: bool = True,
+) -> None:
+    """
+    (Re)configure the root logger
+
+    Safe to call again (e.g. in a forked worker): the previous handlers and
+    listener thread are replaced.
+
+    Args:
+        level: Root level name (DEBUG, INFO, ...)
+        fmt: "text" or "json"
+        sample_rates: Logger name prefix -> fraction of INFO/DEBUG records kept
+        use_queue: Write through a background listener thread
+    """
+    global _listener
+    shutdown_logging()
+
+    stream = logging.StreamHandler(sys.stderr)
+    stream.setFormatter(JsonFormatter() if fmt == "json" else logging.Formatter(TEXT_FORMAT))
+
+    if use_queue:
+        handler: logging.Handler = LazyQueueHandler(queue.SimpleQueue())
+        _listener = logging.handlers.QueueListener(handler.queue, stream, respect_handler_level=True)
+        _listener.start()
+    else:
+        handler = stream
+    # Filters run in the logging thread: drop before anything is queued
+    if sample_rates:
+        handler.addFilter(SamplingFilter(sample_rates))
+    handler.addFilter(RequestContextFilter())
+
+    root = logging.getLogger()
+    for existing in root.handlers[:]:
+        root.removeHandler(existing)
+        existing.close()
+    root.addHandler(handler)
+    root.setLevel(level.upper())
+
+def setup_logging() -> None:
+    """configure_logging() from the LOG_* settings"""
+    from app.config import settings
+
+    configure_logging(
+        settings.LOG_LEVEL,
+        settings.LOG_FORMAT,
+        parse_sample_rates(settings.LOG_SAMPLE_RATES),
+        settings.LOG_QUEUE_ENABLED,
+    )
+
+def shutdown_logging() -> None:
+    """Flush queued records and stop the listener thread"""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+def dropped_records() -> int:
+    """INFO/DEBUG records dropped by sampling in this process"""
+    return sum(
+        log_filter.dropped
+        for handler in logging.getLogger().handlers
+        for log_filter in handler.filters
+        if isinstance(log_filter, SamplingFilter)
+    )
+
+atexit.register(shutdown_logging)
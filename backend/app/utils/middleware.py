@@ -0,0 +1,337 @@
+"""
+Pure ASGI middleware
+- SecurityHeadersMiddleware: security headers, request ids and timing in one
+  layer, without the extra task and memory stream BaseHTTPMiddleware adds
+- CompressionMiddleware: brotli/gzip for responses above a size threshold
+- ProfilingMiddleware: tells the sampling profiler which requests are in flight
+- TracingMiddleware: root span per request (see app/utils/tracing.py)
+"""
+
+import re
+import time
+import uuid
+import zlib
+from contextvars import ContextVar
+from typing import Optional
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.utils.prometheus import request_latency
+from app.utils.timing import request_timings, format_server_timing
+from app.utils.tracing import current_span
+
+try:
+    import brotli
+except ImportError:  # optional, gzip only without it
+    brotli = None
+
+# Request id of the request being handled (for log records)
+request_id_var: ContextVar[Optional[str]] = ContextVar("request_id", default=None)
+
+SECURITY_HEADERS = [
+    (b"x-content-type-options", b"nosniff"),
+    (b"x-frame-options", b"DENY"),
+    (b"x-xss-protection", b"1; mode=block"),
+    (b"strict-transport-security", b"max-age=31536000; includeSubDomains"),
+    (b"content-security-policy", b"default-src 'self'"),
+    (b"referrer-policy", b"strict-origin-when-cross-origin"),
+]
+_SECURITY_HEADER_NAMES = {name for name, _ in SECURITY_HEADERS}
+
+REQUEST_ID_HEADER = b"x-request-id"
+PROCESS_TIME_HEADER = b"x-process-time"
+SERVER_TIMING_HEADER = b"server-timing"
+
+# Accept client-supplied ids only if they are short and printable
+_VALID_REQUEST_ID = re.compile(rb"^[A-Za-z0-9._\-]{1,128}$")
+
+class SecurityHeadersMiddleware:
+    """
+    Adds security headers, X-Request-ID and X-Process-Time (ms until the
+    response starts) by rewriting the http.response.start message
+
+    The request id is taken from an incoming X-Request-ID header when valid,
+    otherwise generated, and exposed as request.state.request_id and
+    request_id_var.
+
+    With server_timing=True, stage timings recorded through
+    app.utils.timing during the request are sent as a Server-Timing header.
+    The full request duration is recorded in the request_latency histograms
+    by method, route template and status. Unhandled exceptions are answered
+    with a plain 500 here, so error responses carry the headers too.
+    """
+
+    def __init__(self, app: ASGIApp, server_timing: bool = False):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        started = time.perf_counter()
+        request_id = None
+        for name, value in scope.get("headers", ()):
+            if name == REQUEST_ID_HEADER:
+                if _VALID_REQUEST_ID.match(value):
+                    request_id = value.decode("latin-1")
+                break
+        if request_id is None:
+            request_id = uuid.uuid4().hex
+
+        scope.setdefault("state", {})["request_id"] = request_id
+        token = request_id_var.set(request_id)
+        timings = {} if self.server_timing else None
+        timings_token = request_timings.set(timings)
+        status_code = 500
+        response_started = False
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code, response_started
+            if message["type"] == "http.response.start":
+                response_started = True
+                status_code = message["status"]
+                elapsed_ms = (time.perf_counter() - started) * 1000
+                headers = [
+                    (name, value) for name, value in message.get("headers", ())
+                    if name.lower() not in _SECURITY_HEADER_NAMES
+                    and name.lower() != REQUEST_ID_HEADER
+                ]
+                headers.extend(SECURITY_HEADERS)
+                headers.append((REQUEST_ID_HEADER, request_id.encode("latin-1")))
+                headers.append((PROCESS_TIME_HEADER, f"{elapsed_ms:.2f}".encode("latin-1")))
+                if timings is not None:
+                    timings["total"] = elapsed_ms
+                    headers.append((SERVER_TIMING_HEADER, format_server_timing(timings).encode("latin-1")))
+                message["headers"] = headers
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            # ServerErrorMiddleware sits outside this layer, so its 500 would
+            # go out bare; answer here and let it log the exception
+            if not response_started:
+                await send_wrapper({
+                    "type": "http.response.start",
+                    "status": 500,
+                    "headers": [(b"content-type", b"text/plain; charset=utf-8"), (b"content-length", b"21")],
+                })
+                await send_wrapper({"type": "http.response.body", "body": b"Internal Server Error"})
+            raise
+        finally:
+            request_id_var.reset(token)
+            request_timings.reset(timings_token)
+            # Template, not the raw path, so ids don't explode the label set
+            route = scope.get("route")
+            request_latency.observe(
+                (scope["method"], getattr(route, "path_format", "unmatched"), str(status_code)),
+                (time.perf_counter() - started) * 1000
+            )
+
+class ProfilingMiddleware:
+    """
+    Marks requests matching a route-scoped profile as in flight, so the
+    sampler only records while they run. One attribute check per request
+    when no profile is running.
+    """
+
+    def __init__(self, app: ASGIApp, profiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or self.profiler.session is None:
+            await self.app(scope, receive, send)
+            return
+
+        tracked = self.profiler.request_started(scope["path"])
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            if tracked:
+                self.profiler.request_finished()
+
+class TracingMiddleware:
+    """
+    Opens the root span of each request, continuing an incoming W3C
+    traceparent header. Spans opened further down (auth, pipeline stages,
+    database statements) become its children through current_span.
+    """
+
+    def __init__(self, app: ASGIApp, tracer):
+        self.app = app
+        self.tracer = tracer
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        traceparent = None
+        for name, value in scope.get("headers", ()):
+            if name == b"traceparent":
+                traceparent = value.decode("latin-1")
+                break
+        span = self.tracer.start_root_span(
+            f"{scope['method']} {scope['path']}",
+            traceparent,
+            {"http.method": scope["method"], "http.target": scope["path"], "request_id": request_id_var.get()},
+        )
+        if span is None:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                span.set_attribute("http.status_code", message["status"])
+            await send(message)
+
+        token = current_span.set(span)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except BaseException as e:
+            span.record_error(e)
+            raise
+        finally:
+            current_span.reset(token)
+            route = scope.get("route")
+            if route is not None:
+                span.name = f"{scope['method']} {route.path_format}"
+                span.set_attribute("http.route", route.path_format)
+            self.tracer.end_span(span)
+
+# Media types worth compressing; anything else (images, archives, msgpack,
+# octet-stream, NDJSON streams flushed chunk by chunk) is sent as is
+COMPRESSIBLE_TYPES = {
+    b"application/json",
+    b"application/javascript",
+    b"application/xml",
+    b"image/svg+xml",
+}
+
+def _is_compressible(content_type: Optional[bytes]) -> bool:
+    if not content_type:
+        return False
+    media_type = content_type.split(b";")[0].strip().lower()
+    return (
+        media_type.startswith(b"text/")
+        or media_type in COMPRESSIBLE_TYPES
+        or media_type.endswith((b"+json", b"+xml"))
+    )
+
+class CompressionMiddleware:
+    """
+    Brotli or gzip compression negotiated from Accept-Encoding
+
+    Brotli is preferred when the optional brotli package is installed.
+    Only text-like media types (COMPRESSIBLE_TYPES) are compressed.
+    Single-message responses below minimum_size, and responses that
+    already carry a Content-Encoding, pass through untouched. Streaming
+    responses of a compressible type are compressed incrementally and
+    flushed chunk by chunk.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def _choose_encoding(self, scope: Scope) -> Optional[str]:
+        for name, value in scope.get("headers", ()):
+            if name == b"accept-encoding":
+                accepted = {part.split(b";")[0].strip() for part in value.lower().split(b",")}
+                if b"br" in accepted and brotli is not None:
+                    return "br"
+                if b"gzip" in accepted:
+                    return "gzip"
+                return None
+        return None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        encoding = self._choose_encoding(scope)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message: Optional[Message] = None
+        compressor = None
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal start_message, compressor
+
+            if message["type"] == "http.response.start":
+                # Hold the headers until the first body chunk shows the size
+                start_message = message
+                return
+
+            if message["type"] != "http.response.body" or start_message is None:
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if compressor is None:
+                headers = start_message.get("headers", [])
+                already_encoded = any(name.lower() == b"content-encoding" for name, _ in headers)
+                content_type = next((value for name, value in headers if name.lower() == b"content-type"), None)
+                if (
+                    already_encoded
+                    or not _is_compressible(content_type)
+                    or (not more_body and len(body) < self.minimum_size)
+                ):
+                    await send(start_message)
+                    await send(message)
+                    start_message = None
+                    return
+
+                compressor = _Compressor(encoding, self.gzip_level, self.brotli_quality)
+                headers = [
+                    (name, value) for name, value in headers
+                    if name.lower() != b"content-length"
+                ]
+                headers.append((b"content-encoding", encoding.encode("latin-1")))
+                headers.append((b"vary", b"Accept-Encoding"))
+                if not more_body:
+                    body = compressor.finish(body)
+                    headers.append((b"content-length", str(len(body)).encode("latin-1")))
+                    start_message["headers"] = headers
+                    await send(start_message)
+                    await send({"type": "http.response.body", "body": body, "more_body": False})
+                    start_message = None
+                    return
+                start_message["headers"] = headers
+                await send(start_message)
+
+            body = compressor.finish(body) if not more_body else compressor.flush(body)
+            await send({"type": "http.response.body", "body": body, "more_body": more_body})
+
+        await self.app(scope, receive, send_wrapper)
+
+class _Compressor:
+    """Common interface over zlib (gzip framing) and brotli"""
+
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        self.encoding = encoding
+        if encoding == "br":
+            self._obj = brotli.Compressor(quality=brotli_quality)
+        else:
+            self._obj = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+
+    def flush(self, data: bytes) -> bytes:
+        """Compress a chunk and flush it so streaming clients see it now"""
+        if self.encoding == "br":
+            return self._obj.process(data) + self._obj.flush()
+        return self._obj.compress(data) + self._obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._obj.process(data) + self._obj.finish()
+        return self._obj.compress(data) + self._obj.flush()
@@ -0,0 +1,173 @@
+"""
+Model memory footprint and inference cost
+Measures what a model artifact costs to keep loaded and to run, so versions
+can be compared on more than accuracy (e.g. the price of a larger
+max_features or a wider n-gram range)
+
+- measure_footprint: in-memory size of the vocabulary, idf and coefficient
+  arrays, the vectorizer's pruned-terms set and the stopword list
+- benchmark_inference: predictions/sec on a fixed set of emails, single-email
+  (as /analyze does) and batched (as the stream endpoint does); recorded by
+  save_model at training time
+- load_artifact: unpickle a model file and time it
+"""
+
+import logging
+import pickle
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Fixed inputs so numbers from different versions are comparable
+BENCHMARK_EMAILS = (
+    "Congratulations! You have WON a free prize. Click http://example.com to claim now!!!",
+    "<p>Hi team, the meeting is moved to 3pm tomorrow. See the agenda attached.</p>",
+    "URGENT: your account has been suspended. Verify your password at https://secure-login.info/verify",
+    "Can you review the pull request before Friday? The build is green again.",
+    "Limited offer: 90% discount on all medications, reply to deals@promo-deals.biz",
+    "Thanks for the feedback on the draft, I updated section three and the summary table.",
+    "Your package could not be delivered. Pay the customs fee here: http://track.example.org/pay",
+    "Lunch on Thursday? The new place near the office finally opened.",
+)
+
+def _container_bytes(values: Iterable[Any]) -> int:
+    return sum(sys.getsizeof(value) for value in values)
+
+def _dict_bytes(data: Optional[dict]) -> int:
+    if not data:
+        return 0
+    return sys.getsizeof(data) + _container_bytes(data.keys()) + _container_bytes(data.values())
+
+def _set_bytes(data: Optional[Iterable[Any]]) -> int:
+    if not data:
+        return 0
+    return sys.getsizeof(data) + _container_bytes(data)
+
+def _array_bytes(*arrays: Any) -> int:
+    total = 0
+    for array in arrays:
+        if array is None:
+            continue
+        if hasattr(array, "indptr"):
+            # scipy sparse (coef_ after sparsify())
+            total += array.data.nbytes + array.indices.nbytes + array.indptr.nbytes
+        else:
+            total += getattr(array, "nbytes", 0)
+    return total
+
+def _mb(size: int) -> float:
+    return round(size / (1024 * 1024), 3)
+
+def measure_footprint(model: Any, vectorizer: Any, stopwords: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+    """
+    In-memory size of a fitted model/vectorizer pair
+
+    Args:
+        model: Fitted classifier (coef_/intercept_ or feature_log_prob_)
+        vectorizer: Fitted TfidfVectorizer/CountVectorizer
+        stopwords: Preprocessor stopword set (shared by all versions)
+
+    Returns:
+        Byte counts per component, total_mb and the vectorizer settings that drive them
+    """
+    vocabulary_bytes = _dict_bytes(getattr(vectorizer, "vocabulary_", None))
+    idf = getattr(vectorizer, "idf_", None)
+    idf_bytes = _array_bytes(idf)
+    # Terms dropped by max_features/min_df; only needed for introspection but kept in the pickle
+    pruned_terms_bytes = _set_bytes(getattr(vectorizer, "stop_words_", None))
+    coef_bytes = _array_bytes(
+        getattr(model, "coef_", None),
+        getattr(model, "intercept_", None),
+        getattr(model, "feature_log_prob_", None),
+        getattr(model, "class_log_prior_", None),
+    )
+    stopwords_bytes = _set_bytes(stopwords)
+
+    total = vocabulary_bytes + idf_bytes + pruned_terms_bytes + coef_bytes + stopwords_bytes
+    return {
+        "vocabulary_bytes": vocabulary_bytes,
+        "vocabulary_size": len(getattr(vectorizer, "vocabulary_", None) or {}),
+        "idf_bytes": idf_bytes,
+        "pruned_terms_bytes": pruned_terms_bytes,
+        "coef_bytes": coef_bytes,
+        "stopwords_bytes": stopwords_bytes,
+        "total_bytes": total,
+        "total_mb": _mb(total),
+        "max_features": getattr(vectorizer, "max_features", None),
+        "ngram_range": list(getattr(vectorizer, "ngram_range", ()) or ()),
+    }
+
+def benchmark_inference(model: Any, vectorizer: Any, rounds: int = 50, batch_size: int = 256) -> Dict[str, Any]:
+    """
+    Standard vectorize + predict_proba micro-benchmark
+
+    Preprocessing is excluded: it doesn't depend on the model version.
+
+    Returns:
+        predictions_per_sec (one email per call), batch_predictions_per_sec
+        (batch_size emails per call) and the settings used
+    """
+    from app.services.preprocessing import email_preprocessor
+
+    texts = [email_preprocessor.preprocess_email(email)["final_processed_text"] for email in BENCHMARK_EMAILS]
+
+    # Warm-up pass (first calls pay for lazy imports and allocations)
+    model.predict_proba(vectorizer.transform(texts))
+
+    started = time.perf_counter()
+    for _ in range(rounds):
+        for text in texts:
+            model.predict_proba(vectorizer.transform([text]))
+    single_elapsed = time.perf_counter() - started
+    single_count = rounds * len(texts)
+
+    batch = [texts[i % len(texts)] for i in range(batch_size)]
+    batch_rounds = max(1, rounds // 10)
+    started = time.perf_counter()
+    for _ in range(batch_rounds):
+        model.predict_proba(vectorizer.transform(batch))
+    batch_elapsed = time.perf_counter() - started
+
+    return {
+        "predictions_per_sec": round(single_count / single_elapsed, 1),
+        "avg_latency_ms": round(single_elapsed / single_count * 1000, 4),
+        "batch_predictions_per_sec": round(batch_rounds * batch_size / batch_elapsed, 1),
+        "batch_size": batch_size,
+        "rounds": rounds,
+        "python": sys.version.split()[0],
+    }
+
+def load_artifact(model_file: Path) -> Tuple[Dict[str, Any], float]:
+    """
+    Unpickle a model file
+
+    Returns:
+        (metadata dict, load time in ms)
+    """
+    started = time.perf_counter()
+    with open(model_file, "rb") as f:
+        metadata = pickle.load(f)
+    return metadata, round((time.perf_counter() - started) * 1000, 2)
+
+def cost_report(metadata: Dict[str, Any], load_time_ms: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Footprint and inference cost for a loaded artifact
+
+    The footprint is measured now when the artifact predates it; the
+    inference benchmark is only available for models saved with it.
+    """
+    footprint = metadata.get("footprint")
+    if footprint is None and metadata.get("model") is not None and metadata.get("vectorizer") is not None:
+        from app.services.preprocessing import email_preprocessor
+        try:
+            footprint = measure_footprint(metadata["model"], metadata["vectorizer"], email_preprocessor.stopwords)
+        except Exception as e:
+            logger.warning(f"Could not measure model footprint: {e}")
+    return {
+        "footprint": footprint,
+        "inference_benchmark": metadata.get("inference_benchmark"),
+        "load_time_ms": load_time_ms,
+    }
@@ -0,0 +1,116 @@
+"""
+Prometheus text exposition
+In-process counters and histograms for GET /metrics, plus a small writer for
+the text format (version 0.0.4) so no client library is needed
+
+Everything here is updated on the request path without touching the
+database; each worker process exports its own values.
+"""
+
+import threading
+from typing import Dict, Iterable, List, Tuple
+
+from app.utils.timing import LatencyHistogram
+
+# Starlette appends "; charset=utf-8" to text/* media types
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+class CounterVec:
+    """Monotonic counters keyed by a tuple of label values"""
+
+    def __init__(self, labelnames: Tuple[str, ...]):
+        self.labelnames = labelnames
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def items(self) -> List[Tuple[Tuple[str, ...], float]]:
+        with self._lock:
+            return sorted(self._values.items())
+
+class HistogramVec:
+    """LatencyHistograms keyed by a tuple of label values"""
+
+    def __init__(self, labelnames: Tuple[str, ...]):
+        self.labelnames = labelnames
+        self._histograms: Dict[Tuple[str, ...], LatencyHistogram] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels: Tuple[str, ...], value_ms: float) -> None:
+        histogram = self._histograms.get(labels)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(labels, LatencyHistogram())
+        histogram.observe(value_ms)
+
+    def items(self) -> List[Tuple[Tuple[str, ...], LatencyHistogram]]:
+        with self._lock:
+            return sorted(self._histograms.items())
+
+# (method, route template, status) -> request duration, recorded by SecurityHeadersMiddleware
+request_latency = HistogramVec(("method", "route", "status"))
+
+# (verdict, model_version) -> predictions made by spam_model
+inference_counter = CounterVec(("verdict", "model_version"))
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+def _format_value(value: float) -> str:
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, int):
+        return str(value)
+    return repr(float(value))
+
+class MetricsWriter:
+    """Accumulates metric families and renders them in the text format"""
+
+    def __init__(self, prefix: str = "mailsentra_"):
+        self.prefix = prefix
+        self._lines: List[str] = []
+
+    def family(self, name: str, kind: str, help_text: str) -> str:
+        name = self.prefix + name
+        self._lines.append(f"# HELP {name} {help_text}")
+        self._lines.append(f"# TYPE {name} {kind}")
+        return name
+
+    def sample(self, name: str, value: float, **labels: str) -> None:
+        self._lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+    def gauge(self, name: str, help_text: str, value: float, **labels: str) -> None:
+        self.sample(self.family(name, "gauge", help_text), value, **labels)
+
+    def counter(self, name: str, help_text: str, value: float, **labels: str) -> None:
+        self.sample(self.family(name + "_total", "counter", help_text), value, **labels)
+
+    def counter_vec(self, name: str, help_text: str, counters: CounterVec) -> None:
+        name = self.family(name + "_total", "counter", help_text)
+        for labels, value in counters.items():
+            self.sample(name, value, **dict(zip(counters.labelnames, labels)))
+
+    def histograms(self, name: str, help_text: str,
+                   series: Iterable[Tuple[Dict[str, str], LatencyHistogram]]) -> None:
+        """Millisecond LatencyHistograms exported as a *_seconds histogram family"""
+        name = self.family(name + "_seconds", "histogram", help_text)
+        for labels, histogram in series:
+            counts, count, total = histogram.state()
+            cumulative = 0
+            for bound, bucket_count in zip(histogram.buckets, counts):
+                cumulative += bucket_count
+                self.sample(name + "_bucket", cumulative, **labels, le=repr(bound / 1000))
+            self.sample(name + "_bucket", count, **labels, le="+Inf")
+            self.sample(name + "_sum", total / 1000, **labels)
+            self.sample(name + "_count", count, **labels)
+
+    def render(self) -> str:
+        return "\n".join(self._lines) + "\n"
@@ -0,0 +1,67 @@
+"""
+Startup profiling
+Cold-start phases of this worker, from the first import in main.py until the
+lifespan hands over to the server (the point where /health can answer)
+
+- mark(name): close the phase that ran since the previous mark (imports,
+  app setup)
+- phase(name): time an enclosed block (lifespan steps)
+- forked(): restart the clock in a worker forked from a preloading master
+  (gunicorn post_fork), so ready_ms is the worker's own startup and not the
+  time since the master began importing
+
+Per-module import cost is measured out of process with
+`python benchmarks/startup.py` (python -X importtime).
+"""
+
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+class StartupProfile:
+    """Ordered (phase, ms) list relative to the profile's creation"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases: List[Tuple[str, float]] = []
+        self.ready_ms: Optional[float] = None
+        # Phases that ran in the preloading master (set by forked())
+        self.preload_phases: List[Tuple[str, float]] = []
+        self._last = self.started
+
+    def mark(self, name: str) -> None:
+        now = time.perf_counter()
+        self.phases.append((name, round((now - self._last) * 1000, 2)))
+        self._last = now
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, round((time.perf_counter() - started) * 1000, 2)))
+            self._last = time.perf_counter()
+
+    def forked(self) -> None:
+        """Start over in a forked worker; the master's phases are kept as preload_phases"""
+        self.preload_phases = self.phases
+        self.phases = []
+        self.ready_ms = None
+        self.started = self._last = time.perf_counter()
+
+    def ready(self) -> None:
+        """Startup finished (end of the lifespan startup)"""
+        self.ready_ms = round((time.perf_counter() - self.started) * 1000, 2)
+
+    def snapshot(self) -> Dict[str, Any]:
+        snapshot = {
+            "phases": [{"name": name, "ms": elapsed_ms} for name, elapsed_ms in self.phases],
+            "ready_ms": self.ready_ms,
+        }
+        if self.preload_phases:
+            snapshot["preload_phases"] = [{"name": name, "ms": elapsed_ms} for name, elapsed_ms in self.preload_phases]
+        return snapshot
+
+# Created when main.py starts importing
+startup_profile = StartupProfile()
@@ -0,0 +1,131 @@
+"""
+Stage latency instrumentation
+Times each step of the inference pipeline into fixed-bucket histograms and,
+when Server-Timing is enabled, into a per-request collector
+
+Usage:
+    with timed("vectorize"):
+        vectors = vectorizer.transform(texts)
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from app.utils.tracing import tracer
+
+# Upper bounds in milliseconds (the last bucket is +Inf)
+DEFAULT_BUCKETS_MS = (
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000,
+)
+
+# Stage -> accumulated ms for the current request (set by SecurityHeadersMiddleware)
+request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_timings", default=None)
+
+class LatencyHistogram:
+    """Cumulative-friendly fixed-bucket histogram (milliseconds)"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS_MS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value_ms: float) -> None:
+        index = bisect.bisect_left(self.buckets, value_ms)
+        with self._lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.sum += value_ms
+            if value_ms > self.max:
+                self.max = value_ms
+
+    def percentile(self, pct: float) -> float:
+        """Upper bound of the bucket holding the pct-th observation"""
+        if not self.count:
+            return 0.0
+        target = pct / 100 * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            seen += bucket_count
+            if seen >= target:
+                return self.buckets[index] if index < len(self.buckets) else self.max
+        return self.max
+
+    def state(self) -> Tuple[List[int], int, float]:
+        """Consistent (bucket counts, count, sum) copy"""
+        with self._lock:
+            return list(self.counts), self.count, self.sum
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            counts = list(self.counts)
+            count, total, maximum = self.count, self.sum, self.max
+        return {
+            "count": count,
+            "avg_ms": round(total / count, 4) if count else 0.0,
+            "p50_ms": self.percentile(50),
+            "p95_ms": self.percentile(95),
+            "p99_ms": self.percentile(99),
+            "max_ms": round(maximum, 4),
+            "buckets": {
+                **{str(bound): n for bound, n in zip(self.buckets, counts)},
+                "+Inf": counts[-1],
+            },
+        }
+
+class LatencyRegistry:
+    """Named histograms, created on first use"""
+
+    def __init__(self):
+        self._histograms: Dict[str, LatencyHistogram] = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, stage: str) -> LatencyHistogram:
+        histogram = self._histograms.get(stage)
+        if histogram is None:
+            with self._lock:
+                histogram = self._histograms.setdefault(stage, LatencyHistogram())
+        return histogram
+
+    def observe(self, stage: str, value_ms: float) -> None:
+        self.histogram(stage).observe(value_ms)
+
+    def items(self) -> List[tuple]:
+        return sorted(self._histograms.items())
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {stage: histogram.snapshot() for stage, histogram in self.items()}
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+
+# Global registry for the inference pipeline stages
+latency_registry = LatencyRegistry()
+
+def record_stage(stage: str, elapsed_ms: float) -> None:
+    """Add a measurement to the histogram and the current request's timings"""
+    latency_registry.observe(stage, elapsed_ms)
+    timings = request_timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + elapsed_ms
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    """Time the enclosed block as `stage` (and trace it when inside a sampled request)"""
+    started = time.perf_counter()
+    try:
+        with tracer.span(stage):
+            yield
+    finally:
+        record_stage(stage, (time.perf_counter() - started) * 1000)
+
+def format_server_timing(timings: Dict[str, float]) -> str:
+    """Server-Timing header value, e.g. 'vectorize;dur=0.42, db_commit;dur=3.10'"""
+    return ", ".join(f"{stage};dur={elapsed_ms:.3f}" for stage, elapsed_ms in timings.items())
@@ -0,0 +1,408 @@
+"""
+Request tracing
+OpenTelemetry-style spans (W3C trace context, OTLP-shaped export) without the
+SDK dependency, so a slow /analyze call can be broken down into auth, HTML
+parsing, the model and database statements / the SQLite write lock
+
+- TracingMiddleware opens the root span per request (continuing an incoming
+  `traceparent`); traced() and timed() stages, SQLAlchemy statements
+  (instrument_engine) and password hashing open child spans
+- Spans are only created under a sampled root span, so code outside a
+  request (warm-up, CLI training) and unsampled requests pay one ContextVar
+  lookup per stage
+- The current span lives in a ContextVar: run_in_threadpool, sync routes and
+  Starlette background tasks inherit it
+- Finished spans are batched to an exporter on a background thread:
+  console, file (JSON lines) or otlp (OTLP/HTTP JSON to a collector)
+"""
+
+import asyncio
+import functools
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import threading
+import time
+import urllib.request
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+class Span:
+    """One timed operation in a trace"""
+
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "start_ns", "end_ns", "attributes", "error")
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = os.urandom(8).hex()
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes or {}
+        self.error: Optional[str] = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def record_error(self, error: BaseException) -> None:
+        self.error = f"{type(error).__name__}: {error}"
+
+    @property
+    def duration_ms(self) -> Optional[float]:
+        return (self.end_ns - self.start_ns) / 1e6 if self.end_ns is not None else None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_ns": self.start_ns,
+            "end_ns": self.end_ns,
+            "duration_ms": round(self.duration_ms, 4) if self.end_ns is not None else None,
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+# Span of the code running now (None outside sampled requests)
+current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+def parse_traceparent(header: Optional[str]) -> Optional[Tuple[str, str, bool]]:
+    """
+    Parse a W3C traceparent header
+
+    Returns:
+        (trace_id, parent span id, sampled) or None if missing/invalid
+    """
+    if not header:
+        return None
+    parts = header.strip().split("-")
+    if len(parts) < 4 or len(parts[1]) != 32 or len(parts[2]) != 16:
+        return None
+    try:
+        int(parts[1], 16), int(parts[2], 16)
+        flags = int(parts[3], 16)
+    except ValueError:
+        return None
+    if parts[1] == "0" * 32 or parts[2] == "0" * 16:
+        return None
+    return parts[1], parts[2], bool(flags & 1)
+
+def format_traceparent(span: Span) -> str:
+    return f"00-{span.trace_id}-{span.span_id}-01"
+
+#  EXPORTERS
+class SpanExporter:
+    """Receives batches of finished spans on the export thread"""
+
+    def export(self, spans: List[Span]) -> None:
+        raise NotImplementedError
+
+    def shutdown(self) -> None:
+        pass
+
+class ConsoleSpanExporter(SpanExporter):
+    """One JSON line per span on stderr"""
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stderr
+
+    def export(self, spans: List[Span]) -> None:
+        self.stream.write("".join(json.dumps(span.to_dict(), default=str) + "\n" for span in spans))
+        self.stream.flush()
+
+class FileSpanExporter(SpanExporter):
+    """Appends one JSON line per span to a file"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def export(self, spans: List[Span]) -> None:
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write("".join(json.dumps(span.to_dict(), default=str) + "\n" for span in spans))
+
+class InMemorySpanExporter(SpanExporter):
+    """Keeps exported spans in a list (tests)"""
+
+    def __init__(self):
+        self.spans: List[Span] = []
+
+    def export(self, spans: List[Span]) -> None:
+        self.spans.extend(spans)
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+class OTLPHttpSpanExporter(SpanExporter):
+    """POSTs OTLP/HTTP JSON to a collector (e.g. http://otel-collector:4318/v1/traces)"""
+
+    def __init__(self, endpoint: str, service_name: str, timeout: float = 5.0):
+        self.endpoint = endpoint
+        self.service_name = service_name
+        self.timeout = timeout
+
+    def _payload(self, spans: List[Span]) -> bytes:
+        otlp_spans = []
+        for span in spans:
+            otlp_span = {
+                "traceId": span.trace_id,
+                "spanId": span.span_id,
+                "name": span.name,
+                "kind": 2 if span.parent_id is None or span.attributes.get("http.method") else 1,
+                "startTimeUnixNano": str(span.start_ns),
+                "endTimeUnixNano": str(span.end_ns),
+                "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in span.attributes.items()],
+                "status": {"code": 2, "message": span.error} if span.error else {"code": 1},
+            }
+            if span.parent_id:
+                otlp_span["parentSpanId"] = span.parent_id
+            otlp_spans.append(otlp_span)
+        return json.dumps({
+            "resourceSpans": [{
+                "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": self.service_name}}]},
+                "scopeSpans": [{"scope": {"name": "mailsentra"}, "spans": otlp_spans}],
+            }]
+        }).encode()
+
+    def export(self, spans: List[Span]) -> None:
+        request = urllib.request.Request(
+            self.endpoint, data=self._payload(spans), headers={"Content-Type": "application/json"}, method="POST"
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout):
+            pass
+
+class BatchSpanProcessor:
+    """
+    Bounded queue + export thread
+
+    Spans are dropped (and counted) when the queue is full rather than
+    slowing requests down. The thread is (re)started lazily in each process,
+    so forked workers get their own.
+    """
+
+    def __init__(self, exporter: SpanExporter, max_queue: int = 4096, batch_size: int = 256, interval: float = 1.0):
+        self.exporter = exporter
+        self.batch_size = batch_size
+        self.interval = interval
+        self.dropped = 0
+        self.exported = 0
+        self._queue: queue.Queue = queue.Queue(max_queue)
+        self._pid: Optional[int] = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def _ensure_thread(self) -> None:
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self._queue = queue.Queue(self._queue.maxsize)
+                self._stop = threading.Event()
+                threading.Thread(target=self._run, name="span-exporter", daemon=True).start()
+                self._pid = os.getpid()
+
+    def on_end(self, span: Span) -> None:
+        self._ensure_thread()
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            self.dropped += 1
+
+    def _drain(self) -> List[Span]:
+        batch = []
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _export(self, batch: List[Span]) -> None:
+        try:
+            self.exporter.export(batch)
+            self.exported += len(batch)
+        except Exception as e:
+            self.dropped += len(batch)
+            logger.warning(f"Span export failed ({len(batch)} spans dropped): {e}")
+
+    def _run(self) -> None:
+        stop = self._stop
+        while not stop.is_set():
+            stop.wait(self.interval)
+            batch = self._drain()
+            while batch:
+                self._export(batch)
+                batch = self._drain()
+
+    def force_flush(self) -> None:
+        """Export everything queued so far from the calling thread"""
+        batch = self._drain()
+        while batch:
+            self._export(batch)
+            batch = self._drain()
+
+    def shutdown(self) -> None:
+        self._stop.set()
+        self.force_flush()
+        self.exporter.shutdown()
+
+#  TRACER
+class Tracer:
+    """Creates spans; disabled (every call a no-op) until a processor is set"""
+
+    def __init__(self, processor: Optional[BatchSpanProcessor] = None, sample_ratio: float = 1.0):
+        self.processor = processor
+        self.sample_ratio = sample_ratio
+
+    @property
+    def enabled(self) -> bool:
+        return self.processor is not None
+
+    def configure(self, processor: Optional[BatchSpanProcessor], sample_ratio: float = 1.0) -> None:
+        if self.processor is not None and self.processor is not processor:
+            self.processor.shutdown()
+        self.processor = processor
+        self.sample_ratio = sample_ratio
+
+    def start_root_span(self, name: str, traceparent: Optional[str] = None,
+                        attributes: Optional[Dict[str, Any]] = None) -> Optional[Span]:
+        """
+        Root span of a request, or None when tracing is off or not sampled
+
+        An incoming traceparent is continued and its sampled flag respected;
+        otherwise sample_ratio decides.
+        """
+        if self.processor is None:
+            return None
+        parent = parse_traceparent(traceparent)
+        if parent is not None:
+            trace_id, parent_id, sampled = parent
+        else:
+            trace_id, parent_id, sampled = os.urandom(16).hex(), None, random.random() < self.sample_ratio
+        if not sampled:
+            return None
+        return Span(name, trace_id, parent_id, attributes)
+
+    def start_span(self, name: str, attributes: Optional[Dict[str, Any]] = None) -> Optional[Span]:
+        """Child of the current span (None outside a sampled trace)"""
+        parent = current_span.get()
+        if parent is None:
+            return None
+        return Span(name, parent.trace_id, parent.span_id, attributes)
+
+    def end_span(self, span: Span) -> None:
+        span.end_ns = time.time_ns()
+        if self.processor is not None:
+            self.processor.on_end(span)
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+        """Child span around the enclosed block (and current for nested spans)"""
+        span = self.start_span(name, attributes)
+        if span is None:
+            yield None
+            return
+        token = current_span.set(span)
+        try:
+            yield span
+        except BaseException as e:
+            span.record_error(e)
+            raise
+        finally:
+            current_span.reset(token)
+            self.end_span(span)
+
+# Global tracer (configured by setup_tracing)
+tracer = Tracer()
+
+def traced(name: str) -> Callable:
+    """Decorator: run a sync or async function in a child span"""
+    def decorator(func: Callable) -> Callable:
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with tracer.span(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with tracer.span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+#  SQLALCHEMY
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    span = tracer.start_span("db.query", {"db.statement": statement[:500], "db.system": conn.dialect.name})
+    conn.info.setdefault("trace_spans", []).append(span)
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    spans = conn.info.get("trace_spans")
+    span = spans.pop() if spans else None
+    if span is not None:
+        if cursor.rowcount is not None and cursor.rowcount >= 0:
+            span.set_attribute("db.rowcount", cursor.rowcount)
+        tracer.end_span(span)
+
+def _handle_error(exception_context):
+    conn = exception_context.connection
+    spans = conn.info.get("trace_spans") if conn is not None else None
+    span = spans.pop() if spans else None
+    if span is not None:
+        span.record_error(exception_context.original_exception)
+        tracer.end_span(span)
+
+def instrument_engine(engine) -> None:
+    """Trace every statement run through a (sync) Engine; pass async_engine.sync_engine for async"""
+    from sqlalchemy import event
+
+    if event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        return
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(engine, "handle_error", _handle_error)
+
+def build_exporter(kind: str, path: str = "", endpoint: str = "", service_name: str = "mailsentra-api") -> SpanExporter:
+    """
+    Exporter for TRACING_EXPORTER
+
+    Raises:
+        ValueError: Unknown exporter or missing file path / endpoint
+    """
+    if kind == "console":
+        return ConsoleSpanExporter()
+    if kind == "file":
+        if not path:
+            raise ValueError("TRACING_FILE is required for the file exporter")
+        return FileSpanExporter(path)
+    if kind == "otlp":
+        if not endpoint:
+            raise ValueError("TRACING_OTLP_ENDPOINT is required for the otlp exporter")
+        return OTLPHttpSpanExporter(endpoint, service_name)
+    raise ValueError(f"Unknown TRACING_EXPORTER: {kind!r}")
+
+def setup_tracing() -> None:
+    """Configure the global tracer from the TRACING_* settings"""
+    from app.config import settings
+
+    if not settings.TRACING_ENABLED:
+        tracer.configure(None)
+        return
+    exporter = build_exporter(
+        settings.TRACING_EXPORTER, settings.TRACING_FILE, settings.TRACING_OTLP_ENDPOINT, settings.TRACING_SERVICE_NAME
+    )
+    tracer.configure(BatchSpanProcessor(exporter), settings.TRACING_SAMPLE_RATIO)
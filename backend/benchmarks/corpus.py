@@ -0,0 +1,126 @@
+"""
+Synthetic email corpus for benchmarks
+Deterministic (seeded) spam and ham emails in three shapes:
+- plain: short plain-text messages, like most /analyze traffic
+- html: marketing-style HTML with tables, inline styles, links and a script
+- long: multi-kilobyte threads with quoted replies and signatures
+
+Usage:
+    python benchmarks/corpus.py --kind html --count 1000 > html.ndjson
+"""
+
+import argparse
+import json
+import random
+import sys
+from typing import Dict, Iterator, List
+
+KINDS = ("plain", "html", "long")
+
+SPAM_PHRASES = [
+    "Congratulations! You have been selected to receive a FREE iPhone",
+    "URGENT: your account has been suspended, verify your password now",
+    "Claim your $1,000 gift card before midnight",
+    "You have won the international lottery, reply with your bank details",
+    "Limited offer!!! 90% discount on all medications",
+    "Your package could not be delivered, pay the customs fee here",
+    "Earn $5000 per week working from home, no experience needed",
+    "Final notice: unpaid invoice attached, open immediately",
+]
+HAM_PHRASES = [
+    "Hi team, the standup is moved to 10am tomorrow",
+    "Can you review the pull request before Friday?",
+    "Attached are the minutes from yesterday's planning meeting",
+    "Lunch on Thursday? The new place near the office opened",
+    "Reminder: quarterly reports are due at the end of the month",
+    "Thanks for the feedback on the draft, I updated section three",
+    "The build is green again after the dependency bump",
+    "Please find the signed contract attached for your records",
+]
+FILLER = (
+    "lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor "
+    "incididunt ut labore et dolore magna aliqua ut enim ad minim veniam quis nostrud"
+).split()
+DOMAINS = ["example.com", "mail.example.org", "promo-deals.biz", "secure-login.info", "company.co.uk"]
+
+def _sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(FILLER) for _ in range(words)).capitalize() + "."
+
+def _url(rng: random.Random) -> str:
+    return f"https://{rng.choice(DOMAINS)}/{rng.choice(FILLER)}?id={rng.randint(1000, 99999)}"
+
+def _address(rng: random.Random) -> str:
+    return f"{rng.choice(FILLER)}.{rng.choice(FILLER)}@{rng.choice(DOMAINS)}"
+
+def plain_email(rng: random.Random, spam: bool) -> str:
+    phrase = rng.choice(SPAM_PHRASES if spam else HAM_PHRASES)
+    parts = [phrase, _sentence(rng, rng.randint(5, 20))]
+    if spam or rng.random() < 0.3:
+        parts.append(_url(rng))
+    if rng.random() < 0.3:
+        parts.append(f"Contact {_address(rng)}")
+    return " ".join(parts)
+
+def html_email(rng: random.Random, spam: bool) -> str:
+    phrase = rng.choice(SPAM_PHRASES if spam else HAM_PHRASES)
+    rows = "".join(
+        f'<tr><td style="padding:8px;color:#{rng.randint(0, 0xFFFFFF):06x}">{_sentence(rng, 8)}</td>'
+        f'<td><a href="{_url(rng)}">&raquo; {rng.choice(FILLER)}</a></td></tr>'
+        for _ in range(rng.randint(5, 15))
+    )
+    return (
+        "<!DOCTYPE html><html><head><style>body{font-family:Arial} .btn{background:#f00}</style>"
+        "<script>var t=new Image();t.src='" + _url(rng) + "';</script></head><body>"
+        f"<h1>{phrase}</h1><p>{_sentence(rng, 25)}</p>"
+        f'<table width="600" cellpadding="0" cellspacing="0">{rows}</table>'
+        f'<p><a class="btn" href="{_url(rng)}">Click here</a> &nbsp;&copy; {rng.choice(DOMAINS)}</p>'
+        f"<p>Unsubscribe: {_address(rng)}</p></body></html>"
+    )
+
+def long_email(rng: random.Random, spam: bool) -> str:
+    paragraphs = [rng.choice(SPAM_PHRASES if spam else HAM_PHRASES)]
+    for depth in range(rng.randint(4, 8)):
+        paragraphs.append(f"On Mon, {_address(rng)} wrote:")
+        quote = "> " * (depth + 1)
+        paragraphs.extend(quote + _sentence(rng, rng.randint(30, 60)) for _ in range(rng.randint(3, 6)))
+        if rng.random() < 0.5:
+            paragraphs.append(quote + _url(rng))
+    paragraphs.append("--\n" + _sentence(rng, 6) + "\n" + _address(rng))
+    return "\n".join(paragraphs)
+
+GENERATORS = {"plain": plain_email, "html": html_email, "long": long_email}
+
+def generate_corpus(kind: str, count: int, seed: int = 42, spam_ratio: float = 0.4) -> List[Dict[str, object]]:
+    """
+    Build `count` labelled emails of one kind
+
+    Returns:
+        [{"email_text": str, "label": "spam" | "ham"}, ...]
+    """
+    rng = random.Random(f"{kind}:{seed}")
+    generate = GENERATORS[kind]
+    corpus = []
+    for _ in range(count):
+        spam = rng.random() < spam_ratio
+        corpus.append({"email_text": generate(rng, spam), "label": "spam" if spam else "ham"})
+    return corpus
+
+def iter_mixed(count: int, seed: int = 42) -> Iterator[Dict[str, object]]:
+    """Round-robin over all kinds"""
+    per_kind = {kind: generate_corpus(kind, count // len(KINDS) + 1, seed) for kind in KINDS}
+    for i in range(count):
+        yield per_kind[KINDS[i % len(KINDS)]][i // len(KINDS)]
+
+def main():
+    parser = argparse.ArgumentParser(description="Write a synthetic email corpus as NDJSON")
+    parser.add_argument("--kind", choices=KINDS + ("mixed",), default="mixed")
+    parser.add_argument("--count", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    emails = iter_mixed(args.count, args.seed) if args.kind == "mixed" else generate_corpus(args.kind, args.count, args.seed)
+    for email in emails:
+        sys.stdout.write(json.dumps(email) + "\n")
+
+if __name__ == "__main__":
+    main()
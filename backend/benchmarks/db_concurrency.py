@@ -0,0 +1,183 @@
+"""
+Database concurrency benchmark
+Shows whether dashboard readers block /analyze writers on SQLite
+
+Runs the same workload twice against a throwaway SQLite file:
+1. SQLAlchemy defaults (rollback journal)
+2. The tuned engine from app.database (WAL + pragmas)
+
+Reader threads repeatedly run the per-user stats aggregate that backs
+/dashboard/stats while one writer thread inserts SpamLog rows the way
+/analyze does. Writer commit latency and "database is locked" errors
+are reported for both modes.
+
+Usage:
+    python benchmarks/db_concurrency.py --seconds 10 --readers 4
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy import func
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+from app.database import Base, create_db_engine
+from app.models import User, SpamLog
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of floats"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+def seed_database(session_factory, rows: int) -> int:
+    """Create one user with `rows` spam logs and return the user id"""
+    db = session_factory()
+    try:
+        user = User(username="bench_user", email="bench@example.com", hashed_password="x")
+        db.add(user)
+        db.commit()
+
+        batch = []
+        for i in range(rows):
+            batch.append({
+                "user_id": user.id,
+                "email_text": f"benchmark message {i}",
+                "result": "Spam" if i % 3 == 0 else "Ham",
+                "confidence": 0.9,
+                "model_version": "bench",
+            })
+            if len(batch) == 5000:
+                db.bulk_insert_mappings(SpamLog, batch)
+                batch = []
+        if batch:
+            db.bulk_insert_mappings(SpamLog, batch)
+        db.commit()
+        return user.id
+    finally:
+        db.close()
+
+def run_mode(tuned: bool, seconds: float, readers: int, rows: int) -> dict:
+    """Run the reader/writer workload for one engine configuration"""
+    tmp_dir = tempfile.mkdtemp(prefix="mailsentra_bench_")
+    database_url = f"sqlite:///{os.path.join(tmp_dir, 'bench.db')}"
+
+    engine = create_db_engine(database_url, tuned=tuned)
+    Base.metadata.create_all(bind=engine)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    user_id = seed_database(session_factory, rows)
+
+    stop = threading.Event()
+    write_latencies = []
+    write_errors = 0
+    read_count = 0
+    read_errors = 0
+    lock = threading.Lock()
+
+    def reader():
+        nonlocal read_count, read_errors
+        db = session_factory()
+        try:
+            while not stop.is_set():
+                try:
+                    db.query(SpamLog.result, func.count(SpamLog.id)).filter(
+                        SpamLog.user_id == user_id
+                    ).group_by(SpamLog.result).all()
+                    db.commit()
+                    with lock:
+                        read_count += 1
+                except OperationalError:
+                    db.rollback()
+                    with lock:
+                        read_errors += 1
+        finally:
+            db.close()
+
+    def writer():
+        nonlocal write_errors
+        db = session_factory()
+        try:
+            i = 0
+            while not stop.is_set():
+                started = time.perf_counter()
+                try:
+                    db.add(SpamLog(
+                        user_id=user_id,
+                        email_text=f"live message {i}",
+                        result="Ham",
+                        confidence=0.8,
+                        model_version="bench",
+                    ))
+                    db.commit()
+                    write_latencies.append((time.perf_counter() - started) * 1000)
+                except OperationalError:
+                    db.rollback()
+                    write_errors += 1
+                i += 1
+        finally:
+            db.close()
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    threads.append(threading.Thread(target=writer))
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    engine.dispose()
+
+    return {
+        "mode": "tuned" if tuned else "default",
+        "writes": len(write_latencies),
+        "writes_per_sec": round(len(write_latencies) / seconds, 1),
+        "write_errors": write_errors,
+        "write_p50_ms": round(percentile(write_latencies, 50), 2),
+        "write_p99_ms": round(percentile(write_latencies, 99), 2),
+        "write_max_ms": round(max(write_latencies), 2) if write_latencies else 0.0,
+        "reads": read_count,
+        "read_errors": read_errors,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="SQLite reader/writer concurrency benchmark")
+    parser.add_argument("--seconds", type=float, default=10.0, help="Duration per mode")
+    parser.add_argument("--readers", type=int, default=4, help="Concurrent dashboard readers")
+    parser.add_argument("--rows", type=int, default=100000, help="Seeded spam log rows")
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = parser.parse_args()
+
+    results = [
+        run_mode(tuned=False, seconds=args.seconds, readers=args.readers, rows=args.rows),
+        run_mode(tuned=True, seconds=args.seconds, readers=args.readers, rows=args.rows),
+    ]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print("=" * 72)
+    print(f"  SQLite concurrency: {args.readers} readers + 1 writer, {args.rows} rows, {args.seconds}s")
+    print("=" * 72)
+    for r in results:
+        print(f"\n[{r['mode'].upper()}]")
+        print(f"   writes/sec:   {r['writes_per_sec']} ({r['write_errors']} lock errors)")
+        print(f"   write p50:    {r['write_p50_ms']} ms")
+        print(f"   write p99:    {r['write_p99_ms']} ms (max {r['write_max_ms']} ms)")
+        print(f"   reads:        {r['reads']} ({r['read_errors']} lock errors)")
+    print()
+
+if __name__ == "__main__":
+    main()
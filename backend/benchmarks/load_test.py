@@ -0,0 +1,278 @@
+"""
+Load-test harness
+asyncio/httpx load generator for a live server with traffic mixes that
+mirror production:
+
+- analyze: POST /api/analyze/analyze with emails from benchmarks/corpus.py
+- dashboard: GET /api/dashboard/stats (frontend polling)
+- admin_stats: GET /api/admin/stats (needs admin credentials)
+- retrain: one admin retrain at a time in the background (--retrain); analyze
+  latency is reported separately for requests that overlapped a retrain
+
+Two modes:
+- steady: --concurrency virtual users for --seconds
+- ramp: concurrency doubles from --start to --max, --step-seconds each, and
+  the report names the step where throughput stopped growing (saturation)
+
+Virtual users are closed-loop (send, wait for the response, optional
+--think-ms, repeat). Run the server with RATE_LIMIT_ENABLED=False, or spread
+the load over enough --users that the per-user analyze quota doesn't turn
+the test into a 429 benchmark. --retrain-endpoint train writes a new model
+version, so only point it at a test deployment.
+
+Usage:
+    uvicorn main:app --port 8000 &
+    python benchmarks/load_test.py --mix default --concurrency 32 --seconds 30
+    python benchmarks/load_test.py --mode ramp --start 4 --max 256 --admin-email admin@example.com --admin-password ...
+    python benchmarks/load_test.py --retrain --admin-email admin@example.com --admin-password ... --seconds 120
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from collections import defaultdict
+from pathlib import Path
+
+import httpx
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from corpus import iter_mixed
+
+# route name -> weight; routes whose credentials are missing are dropped
+MIXES = {
+    "default": {"analyze": 90, "dashboard": 8, "admin_stats": 2},
+    "analyze": {"analyze": 100},
+    "dashboard": {"analyze": 50, "dashboard": 45, "admin_stats": 5},
+}
+ADMIN_ROUTES = {"admin_stats"}
+RETRAIN_ENDPOINTS = {"retrain": "/api/retrain", "train": "/api/retrain/train"}
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of floats"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+class Recorder:
+    """Latency and status samples per route for one run (or ramp step)"""
+
+    def __init__(self):
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+        self.started = time.perf_counter()
+        self.finished = None
+
+    def record(self, route: str, status: int, elapsed_ms: float) -> None:
+        self.latencies[route].append(elapsed_ms)
+        self.statuses[route][status] += 1
+
+    def report(self) -> dict:
+        elapsed = (self.finished or time.perf_counter()) - self.started
+        routes = {}
+        for route in sorted(self.latencies):
+            latencies = self.latencies[route]
+            statuses = self.statuses[route]
+            errors = sum(count for status, count in statuses.items() if status == 0 or status >= 500)
+            rate_limited = statuses.get(429, 0)
+            routes[route] = {
+                "requests": len(latencies),
+                "requests_per_sec": round(len(latencies) / elapsed, 1),
+                "p50_ms": round(percentile(latencies, 50), 2),
+                "p95_ms": round(percentile(latencies, 95), 2),
+                "p99_ms": round(percentile(latencies, 99), 2),
+                "error_rate": round(errors / len(latencies), 4),
+                "rate_limited": rate_limited,
+                "statuses": {str(status): count for status, count in sorted(statuses.items())},
+            }
+        served = sum(len(v) for route, v in self.latencies.items() if route != "retrain")
+        return {
+            "seconds": round(elapsed, 2),
+            "requests_per_sec": round(served / elapsed, 1),
+            "routes": routes,
+        }
+
+class LoadTest:
+    def __init__(self, args, user_tokens, admin_token):
+        self.args = args
+        self.user_tokens = user_tokens
+        self.admin_token = admin_token
+        self.retrain_running = False
+        self.emails = [email["email_text"] for email in iter_mixed(500, args.seed)]
+
+        weights = dict(MIXES[args.mix])
+        if admin_token is None:
+            for route in ADMIN_ROUTES & set(weights):
+                print(f"   (no admin credentials: skipping {route})", file=sys.stderr)
+                weights.pop(route)
+        self.routes = list(weights)
+        self.weights = [weights[route] for route in self.routes]
+
+    def _request_args(self, route: str, rng: random.Random):
+        user_auth = {"Authorization": f"Bearer {rng.choice(self.user_tokens)}"}
+        if route == "analyze":
+            return "POST", "/api/analyze/analyze", {"json": {"email_text": rng.choice(self.emails)}, "headers": user_auth}
+        if route == "dashboard":
+            return "GET", "/api/dashboard/stats", {"headers": user_auth}
+        if route == "admin_stats":
+            return "GET", "/api/admin/stats", {"headers": {"Authorization": f"Bearer {self.admin_token}"}}
+        raise ValueError(route)
+
+    async def _timed(self, client, recorder, route, method, path, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = await client.request(method, path, **kwargs)
+            status = response.status_code
+        except httpx.HTTPError:
+            status = 0
+        recorder.record(route, status, (time.perf_counter() - started) * 1000)
+
+    async def _user(self, client, recorder, deadline, seed):
+        rng = random.Random(seed)
+        while time.perf_counter() < deadline:
+            route = rng.choices(self.routes, self.weights)[0]
+            method, path, kwargs = self._request_args(route, rng)
+            overlapped = self.retrain_running
+            started = time.perf_counter()
+            try:
+                status = (await client.request(method, path, **kwargs)).status_code
+            except httpx.HTTPError:
+                status = 0
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            if route == "analyze" and (overlapped or self.retrain_running):
+                route = "analyze (during retrain)"
+            recorder.record(route, status, elapsed_ms)
+            if self.args.think_ms:
+                await asyncio.sleep(rng.uniform(0, 2 * self.args.think_ms) / 1000)
+
+    async def _retrainer(self, client, recorder, deadline):
+        path = RETRAIN_ENDPOINTS[self.args.retrain_endpoint]
+        headers = {"Authorization": f"Bearer {self.admin_token}"}
+        await asyncio.sleep(self.args.retrain_delay)
+        while time.perf_counter() < deadline:
+            self.retrain_running = True
+            try:
+                await self._timed(client, recorder, "retrain", "POST", path, headers=headers, timeout=None)
+            finally:
+                self.retrain_running = False
+            await asyncio.sleep(self.args.retrain_interval)
+
+    async def run(self, client, concurrency: int, seconds: float) -> dict:
+        recorder = Recorder()
+        deadline = time.perf_counter() + seconds
+        tasks = [self._user(client, recorder, deadline, self.args.seed + i) for i in range(concurrency)]
+        if self.args.retrain:
+            tasks.append(self._retrainer(client, recorder, deadline))
+        await asyncio.gather(*tasks)
+        recorder.finished = time.perf_counter()
+        return {"concurrency": concurrency, **recorder.report()}
+
+async def login(client, email: str, password: str) -> str:
+    response = await client.post("/api/auth/login", data={"username": email, "password": password})
+    response.raise_for_status()
+    return response.json()["access_token"]
+
+async def user_tokens(client, count: int, password: str) -> list:
+    """Register (if needed) and log in the benchmark users"""
+    tokens = []
+    for i in range(count):
+        email = f"bench_load_{i}@example.com"
+        await client.post("/api/auth/register", json={"username": f"bench_load_{i}", "email": email, "password": password})
+        tokens.append(await login(client, email, password))
+    return tokens
+
+def find_saturation(steps: list, min_gain: float) -> dict:
+    """First step whose throughput grew by less than min_gain over the previous one"""
+    for previous, step in zip(steps, steps[1:]):
+        if step["requests_per_sec"] < previous["requests_per_sec"] * (1 + min_gain):
+            return {"concurrency": previous["concurrency"], "requests_per_sec": previous["requests_per_sec"]}
+    return {"concurrency": None, "requests_per_sec": None}
+
+async def main_async(args) -> dict:
+    limits = httpx.Limits(max_connections=args.max + 8, max_keepalive_connections=args.max + 8)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        tokens = await user_tokens(client, args.users, args.password)
+        admin_token = args.admin_token
+        if admin_token is None and args.admin_email:
+            admin_token = await login(client, args.admin_email, args.admin_password)
+        if args.retrain and admin_token is None:
+            raise SystemExit("--retrain needs --admin-token or --admin-email/--admin-password")
+
+        test = LoadTest(args, tokens, admin_token)
+        meta = {"base_url": args.base_url, "mix": args.mix, "mode": args.mode, "users": args.users,
+                "retrain": args.retrain and args.retrain_endpoint}
+
+        if args.mode == "steady":
+            return {"meta": meta, "results": [await test.run(client, args.concurrency, args.seconds)]}
+
+        steps = []
+        concurrency = args.start
+        while concurrency <= args.max:
+            step = await test.run(client, concurrency, args.step_seconds)
+            steps.append(step)
+            if not args.json:
+                print(f"   concurrency {concurrency:>4}: {step['requests_per_sec']:>8} req/s", file=sys.stderr)
+            concurrency *= 2
+        return {"meta": meta, "results": steps, "saturation": find_saturation(steps, args.min_gain)}
+
+def print_report(report: dict) -> None:
+    meta = report["meta"]
+    print("=" * 96)
+    print(f"  Load test: mix={meta['mix']} mode={meta['mode']} users={meta['users']} retrain={meta['retrain'] or 'off'}")
+    print("=" * 96)
+    for step in report["results"]:
+        print(f"\n  concurrency {step['concurrency']}: {step['requests_per_sec']} req/s over {step['seconds']}s")
+        print(f"   {'route':<26} {'req':>7} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'errors':>8} {'429':>6}")
+        for route, r in step["routes"].items():
+            print(f"   {route:<26} {r['requests']:>7} {r['requests_per_sec']:>8} {r['p50_ms']:>9} {r['p95_ms']:>9} "
+                  f"{r['p99_ms']:>9} {r['error_rate'] * 100:>7.2f}% {r['rate_limited']:>6}")
+    saturation = report.get("saturation")
+    if saturation:
+        print()
+        if saturation["concurrency"] is None:
+            print("   No saturation found; raise --max")
+        else:
+            print(f"   Saturation: ~{saturation['requests_per_sec']} req/s at concurrency {saturation['concurrency']}")
+    print()
+
+def main():
+    parser = argparse.ArgumentParser(description="Traffic-mix load test against a live server")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--mix", choices=sorted(MIXES), default="default")
+    parser.add_argument("--mode", choices=["steady", "ramp"], default="steady")
+    parser.add_argument("--concurrency", type=int, default=32, help="Virtual users (steady mode)")
+    parser.add_argument("--seconds", type=float, default=30, help="Duration (steady mode)")
+    parser.add_argument("--start", type=int, default=4, help="First ramp step concurrency")
+    parser.add_argument("--max", type=int, default=256, help="Last ramp step concurrency")
+    parser.add_argument("--step-seconds", type=float, default=15, help="Duration of each ramp step")
+    parser.add_argument("--min-gain", type=float, default=0.05, help="Throughput growth below which a ramp step counts as saturated")
+    parser.add_argument("--think-ms", type=float, default=0, help="Mean pause between a user's requests")
+    parser.add_argument("--users", type=int, default=4, help="Benchmark accounts to spread analyze quota over")
+    parser.add_argument("--password", default="bench-password-123")
+    parser.add_argument("--admin-email")
+    parser.add_argument("--admin-password")
+    parser.add_argument("--admin-token")
+    parser.add_argument("--retrain", action="store_true", help="Run retrains in the background")
+    parser.add_argument("--retrain-endpoint", choices=sorted(RETRAIN_ENDPOINTS), default="train")
+    parser.add_argument("--retrain-delay", type=float, default=5, help="Seconds of clean traffic before the first retrain")
+    parser.add_argument("--retrain-interval", type=float, default=10, help="Pause between retrains")
+    parser.add_argument("--timeout", type=float, default=30)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = parser.parse_args()
+    if args.mode == "steady":
+        args.max = args.concurrency
+
+    report = asyncio.run(main_async(args))
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_report(report)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""
+Login throughput benchmark
+Shows whether a burst of logins slows down /analyze for everyone else
+
+Runs against a live server in two phases:
+1. Baseline: analyze clients only
+2. Burst: the same analyze clients plus login clients hammering /api/auth/login
+
+Reports logins/sec and /analyze latency for both phases. With password
+hashing in the bounded pool (app.services.hashing_service), analyze p99
+during the burst should stay close to the baseline. Run it once per
+PASSWORD_HASH_EXECUTOR value to compare the process pool with threads.
+
+Usage:
+    PASSWORD_HASH_EXECUTOR=thread uvicorn main:app --port 8000 &
+    python benchmarks/login_throughput.py --base-url http://127.0.0.1:8000 --seconds 10 --logins 32
+"""
+
+import argparse
+import json
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+
+SAMPLE_EMAIL = "Congratulations! You have won a free cruise. Click here to claim your prize now."
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of floats"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+def post(url: str, data: bytes, headers: dict, timeout: float = 30.0) -> int:
+    """POST and return the status code (errors included)"""
+    request = urllib.request.Request(url, data=data, headers=headers, method="POST")
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            response.read()
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+def login_form(email: str, password: str) -> bytes:
+    return urllib.parse.urlencode({"username": email, "password": password}).encode()
+
+def ensure_user(base_url: str, email: str, password: str) -> str:
+    """Register the benchmark user if needed and return an access token"""
+    body = json.dumps({"username": "bench_login", "email": email, "password": password}).encode()
+    post(f"{base_url}/api/auth/register", body, {"Content-Type": "application/json"})
+
+    request = urllib.request.Request(
+        f"{base_url}/api/auth/login",
+        data=login_form(email, password),
+        headers={"Content-Type": "application/x-www-form-urlencoded"},
+        method="POST",
+    )
+    with urllib.request.urlopen(request, timeout=30) as response:
+        return json.loads(response.read())["access_token"]
+
+def run_phase(base_url: str, token: str, email: str, password: str,
+              seconds: float, analyzers: int, logins: int) -> dict:
+    """Run analyze clients (and optionally login clients) for `seconds`"""
+    stop = threading.Event()
+    analyze_latencies = []
+    analyze_errors = 0
+    login_ok = 0
+    login_errors = 0
+    lock = threading.Lock()
+
+    analyze_body = json.dumps({"email_text": SAMPLE_EMAIL}).encode()
+    analyze_headers = {"Content-Type": "application/json", "Authorization": f"Bearer {token}"}
+    login_body = login_form(email, password)
+    login_headers = {"Content-Type": "application/x-www-form-urlencoded"}
+
+    def analyzer():
+        nonlocal analyze_errors
+        while not stop.is_set():
+            started = time.perf_counter()
+            code = post(f"{base_url}/api/analyze/analyze", analyze_body, analyze_headers)
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                if code == 200:
+                    analyze_latencies.append(elapsed)
+                else:
+                    analyze_errors += 1
+
+    def logger_in():
+        nonlocal login_ok, login_errors
+        while not stop.is_set():
+            code = post(f"{base_url}/api/auth/login", login_body, login_headers)
+            with lock:
+                if code == 200:
+                    login_ok += 1
+                else:
+                    login_errors += 1
+
+    threads = [threading.Thread(target=analyzer) for _ in range(analyzers)]
+    threads += [threading.Thread(target=logger_in) for _ in range(logins)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    return {
+        "phase": "burst" if logins else "baseline",
+        "login_clients": logins,
+        "logins_per_sec": round(login_ok / seconds, 1),
+        "login_errors": login_errors,
+        "analyze_requests": len(analyze_latencies),
+        "analyze_errors": analyze_errors,
+        "analyze_p50_ms": round(percentile(analyze_latencies, 50), 2),
+        "analyze_p99_ms": round(percentile(analyze_latencies, 99), 2),
+        "analyze_max_ms": round(max(analyze_latencies), 2) if analyze_latencies else 0.0,
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Logins/sec vs concurrent /analyze latency")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000", help="Running API server")
+    parser.add_argument("--seconds", type=float, default=10.0, help="Duration per phase")
+    parser.add_argument("--analyzers", type=int, default=4, help="Concurrent /analyze clients")
+    parser.add_argument("--logins", type=int, default=32, help="Concurrent login clients in the burst phase")
+    parser.add_argument("--email", default="bench_login@example.com")
+    parser.add_argument("--password", default="bench-password-123")
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = parser.parse_args()
+
+    base_url = args.base_url.rstrip("/")
+    token = ensure_user(base_url, args.email, args.password)
+
+    results = [
+        run_phase(base_url, token, args.email, args.password, args.seconds, args.analyzers, 0),
+        run_phase(base_url, token, args.email, args.password, args.seconds, args.analyzers, args.logins),
+    ]
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print("=" * 72)
+    print(f"  Login burst vs /analyze: {args.analyzers} analyze clients, {args.logins} login clients, {args.seconds}s")
+    print("=" * 72)
+    for r in results:
+        print(f"\n[{r['phase'].upper()}]")
+        if r["login_clients"]:
+            print(f"   logins/sec:   {r['logins_per_sec']} ({r['login_errors']} errors)")
+        print(f"   analyze:      {r['analyze_requests']} requests ({r['analyze_errors']} errors)")
+        print(f"   analyze p50:  {r['analyze_p50_ms']} ms")
+        print(f"   analyze p99:  {r['analyze_p99_ms']} ms (max {r['analyze_max_ms']} ms)")
+    print()
+
+if __name__ == "__main__":
+    main()
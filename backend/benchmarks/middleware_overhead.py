@@ -0,0 +1,173 @@
+"""
+Middleware overhead benchmark
+Compares the old BaseHTTPMiddleware security headers with the pure ASGI
+SecurityHeadersMiddleware from app.utils.middleware
+
+Requests are driven straight into the ASGI app (no sockets, no HTTP
+client) so the numbers show framework + middleware cost only:
+- GET /health
+- POST /api/analyze (auth overridden, SpamLog written to a throwaway SQLite file)
+
+Usage:
+    python benchmarks/middleware_overhead.py --requests 5000 --concurrency 16
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from starlette.middleware import Middleware
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from app.database import Base, create_db_engine, create_async_db_engine, get_async_db
+from app.dependencies import get_current_user_or_api_key
+from app.models import User
+from app.utils.middleware import SecurityHeadersMiddleware
+from main import app
+
+SAMPLE_EMAIL = "Congratulations! You have won a free cruise. Click here to claim your prize now."
+
+class LegacySecurityHeadersMiddleware(BaseHTTPMiddleware):
+    """The BaseHTTPMiddleware implementation main.py used before"""
+
+    async def dispatch(self, request, call_next):
+        response = await call_next(request)
+        response.headers["X-Content-Type-Options"] = "nosniff"
+        response.headers["X-Frame-Options"] = "DENY"
+        response.headers["X-XSS-Protection"] = "1; mode=block"
+        response.headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains"
+        response.headers["Content-Security-Policy"] = "default-src 'self'"
+        response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
+        return response
+
+def use_middleware(middleware_class) -> None:
+    """Swap the security headers layer and force Starlette to rebuild the stack"""
+    app.user_middleware = [
+        Middleware(middleware_class)
+        if m.cls in (SecurityHeadersMiddleware, LegacySecurityHeadersMiddleware) else m
+        for m in app.user_middleware
+    ]
+    app.middleware_stack = None
+
+async def call(method: str, path: str, body: bytes = b"") -> int:
+    """Send one request through the ASGI app and return the status code"""
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [
+            (b"host", b"bench"),
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+        ],
+        "client": ("127.0.0.1", 50000),
+        "server": ("bench", 80),
+    }
+    sent = False
+    status_code = 0
+
+    async def receive():
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await asyncio.sleep(3600)
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        nonlocal status_code
+        if message["type"] == "http.response.start":
+            status_code = message["status"]
+
+    await app(scope, receive, send)
+    return status_code
+
+async def run(method: str, path: str, body: bytes, requests: int, concurrency: int) -> dict:
+    """Fire `requests` calls with `concurrency` in flight"""
+    remaining = requests
+    errors = 0
+
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            if await call(method, path, body) != 200:
+                errors += 1
+
+    for _ in range(min(50, requests)):
+        await call(method, path, body)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    return {"requests_per_sec": round(requests / elapsed, 1), "errors": errors}
+
+def setup_analyze_overrides() -> None:
+    """Point /api/analyze at a throwaway database and a fixed user"""
+    tmp_dir = tempfile.mkdtemp(prefix="mailsentra_bench_")
+    database_url = f"sqlite:///{os.path.join(tmp_dir, 'bench.db')}"
+    engine = create_db_engine(database_url)
+    Base.metadata.create_all(bind=engine)
+    engine.dispose()
+
+    session_factory = async_sessionmaker(create_async_db_engine(database_url), expire_on_commit=False)
+    user = User(id=1, username="bench", email="bench@example.com", is_active=True, is_admin=False)
+
+    async def override_db():
+        async with session_factory() as session:
+            yield session
+
+    app.dependency_overrides[get_async_db] = override_db
+    app.dependency_overrides[get_current_user_or_api_key] = lambda: user
+
+async def main_async(args) -> list:
+    setup_analyze_overrides()
+    analyze_body = json.dumps({"email_text": SAMPLE_EMAIL}).encode()
+    endpoints = [("GET", "/health", b"", args.requests), ("POST", "/api/analyze/analyze", analyze_body, args.analyze_requests)]
+
+    results = []
+    for name, middleware_class in [("BaseHTTPMiddleware", LegacySecurityHeadersMiddleware),
+                                   ("pure ASGI", SecurityHeadersMiddleware)]:
+        use_middleware(middleware_class)
+        for method, path, body, count in endpoints:
+            result = await run(method, path, body, count, args.concurrency)
+            results.append({"middleware": name, "endpoint": f"{method} {path}", **result})
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="BaseHTTPMiddleware vs pure ASGI middleware")
+    parser.add_argument("--requests", type=int, default=5000, help="Requests against /health")
+    parser.add_argument("--analyze-requests", type=int, default=1000, help="Requests against /api/analyze")
+    parser.add_argument("--concurrency", type=int, default=16, help="Requests in flight")
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = parser.parse_args()
+
+    results = asyncio.run(main_async(args))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print("=" * 72)
+    print(f"  Middleware overhead: concurrency {args.concurrency}")
+    print("=" * 72)
+    for r in results:
+        print(f"   {r['middleware']:<20} {r['endpoint']:<28} {r['requests_per_sec']:>9} req/s ({r['errors']} errors)")
+    print()
+
+if __name__ == "__main__":
+    main()
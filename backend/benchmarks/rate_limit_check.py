@@ -0,0 +1,81 @@
+"""
+Rate limiter micro-benchmark
+Measures the cost of one token-bucket check and verifies that forked
+workers share buckets
+
+Usage:
+    python benchmarks/rate_limit_check.py --checks 200000 --tenants 5000 --workers 4
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.services.rate_limiter import Quota, SharedMemoryBackend
+
+def time_checks(backend, quota: Quota, checks: int, tenants: int) -> float:
+    """Average microseconds per check spread over `tenants` keys"""
+    keys = [f"user:{i}" for i in range(tenants)]
+    started = time.perf_counter()
+    for i in range(checks):
+        backend.take(keys[i % tenants], quota)
+    return (time.perf_counter() - started) / checks * 1_000_000
+
+def shared_across_workers(workers: int, burst: int) -> dict:
+    """Each forked worker drains the same key; together they must stop at `burst`"""
+    backend = SharedMemoryBackend()
+    quota = Quota("shared", per_minute=1, burst=burst)
+    read_fd, write_fd = os.pipe()
+
+    pids = []
+    for _ in range(workers):
+        pid = os.fork()
+        if pid == 0:
+            os.close(read_fd)
+            allowed = sum(backend.take("tenant", quota)[0] for _ in range(burst))
+            os.write(write_fd, f"{allowed}\n".encode())
+            os._exit(0)
+        pids.append(pid)
+    os.close(write_fd)
+    for pid in pids:
+        os.waitpid(pid, 0)
+    with os.fdopen(read_fd) as pipe:
+        allowed = sum(int(line) for line in pipe)
+    return {"workers": workers, "burst": burst, "allowed_total": allowed, "shared": allowed <= burst + 1}
+
+def main():
+    parser = argparse.ArgumentParser(description="Token bucket check cost and cross-worker sharing")
+    parser.add_argument("--checks", type=int, default=200000)
+    parser.add_argument("--tenants", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=4, help="Forked workers for the sharing check (0 to skip)")
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = parser.parse_args()
+
+    quota = Quota("bench", per_minute=60000, burst=1000)
+    result = {
+        "us_per_check": round(time_checks(SharedMemoryBackend(), quota, args.checks, args.tenants), 2),
+    }
+    if args.workers and hasattr(os, "fork"):
+        result["sharing"] = shared_across_workers(args.workers, burst=100)
+
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+
+    print("=" * 72)
+    print(f"  Rate limiter: {args.checks} checks over {args.tenants} tenants")
+    print("=" * 72)
+    print(f"   cost per check: {result['us_per_check']} us")
+    if "sharing" in result:
+        s = result["sharing"]
+        print(f"   {s['workers']} forked workers allowed {s['allowed_total']} of burst {s['burst']} "
+              f"({'shared' if s['shared'] else 'NOT shared'})")
+    print()
+
+if __name__ == "__main__":
+    main()
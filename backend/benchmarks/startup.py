@@ -0,0 +1,142 @@
+"""
+Cold-start profiler
+Starts fresh interpreters that import main.py and run the app lifespan
+(model warm-up included), the same work a new worker does before it can
+answer /health, and reports:
+
+- wall time per run and the app's own startup phases (app/utils/startup.py)
+- import cost per top-level package and the slowest modules, from
+  python -X importtime
+
+Exits with status 1 when the median cold start exceeds --budget
+(STARTUP_BUDGET_SECONDS by default).
+
+Usage (from backend/):
+    python benchmarks/startup.py
+    python benchmarks/startup.py --runs 5 --budget 6 --json
+"""
+
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+# Runs in the child: import the app, run startup + shutdown, print the profile
+COLD_START_SCRIPT = """
+import asyncio, json, main
+from app.utils.startup import startup_profile
+
+async def run():
+    async with main.lifespan(main.app):
+        pass
+
+asyncio.run(run())
+print(json.dumps(startup_profile.snapshot()))
+"""
+
+_IMPORT_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)$")
+
+def parse_importtime(stderr):
+    """
+    Parse python -X importtime output
+
+    Returns:
+        [(module, self_us, cumulative_us, depth), ...] in import order
+    """
+    modules = []
+    for line in stderr.splitlines():
+        match = _IMPORT_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            modules.append((name, int(self_us), int(cumulative_us), len(indent) // 2))
+    return modules
+
+def cold_start(database_url):
+    """One fresh interpreter; returns (wall ms, startup profile, modules)"""
+    env = {**os.environ, "DATABASE_URL": database_url, "LOG_LEVEL": "WARNING"}
+    started = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", COLD_START_SCRIPT],
+        cwd=BACKEND_DIR, env=env, capture_output=True, text=True,
+    )
+    wall_ms = (time.perf_counter() - started) * 1000
+    if completed.returncode != 0:
+        raise RuntimeError(f"Cold start failed:\n{completed.stderr[-2000:]}")
+    profile = json.loads(completed.stdout.strip().splitlines()[-1])
+    return wall_ms, profile, parse_importtime(completed.stderr)
+
+def package_costs(modules):
+    """Self import time summed per top-level package (ms), largest first"""
+    totals = defaultdict(int)
+    for name, self_us, _, _ in modules:
+        totals[name.split(".")[0]] += self_us
+    return sorted(((package, round(us / 1000, 1)) for package, us in totals.items()), key=lambda item: item[1], reverse=True)
+
+def main():
+    from app.config import settings
+
+    parser = argparse.ArgumentParser(description="Measure worker cold start and per-module import cost")
+    parser.add_argument("--runs", type=int, default=3, help="Fresh interpreters to start")
+    parser.add_argument("--top", type=int, default=15, help="Packages/modules to list")
+    parser.add_argument("--budget", type=float, default=settings.STARTUP_BUDGET_SECONDS, help="Seconds allowed for the median cold start")
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_url = f"sqlite:///{Path(tmp) / 'startup.db'}"
+        runs = [cold_start(database_url) for _ in range(max(1, args.runs))]
+
+    walls = [wall for wall, _, _ in runs]
+    median_ms = statistics.median(walls)
+    # Import detail from the fastest run (least disturbed by the OS)
+    _, profile, modules = min(runs, key=lambda run: run[0])
+    results = {
+        "runs": len(runs),
+        "wall_ms": [round(wall, 1) for wall in walls],
+        "median_ms": round(median_ms, 1),
+        "budget_ms": args.budget * 1000,
+        "over_budget": median_ms > args.budget * 1000,
+        "phases": profile["phases"],
+        "ready_ms": profile["ready_ms"],
+        "import_ms": round(sum(self_us for _, self_us, _, _ in modules) / 1000, 1),
+        "packages": package_costs(modules)[:args.top],
+        "slowest_modules": [
+            (name, round(self_us / 1000, 1))
+            for name, self_us, _, _ in sorted(modules, key=lambda module: module[1], reverse=True)[:args.top]
+        ],
+    }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print("=" * 70)
+        print(f"  Cold start: median {results['median_ms']:.0f} ms over {len(runs)} runs "
+              f"(budget {results['budget_ms']:.0f} ms)")
+        print("=" * 70)
+        print("  Phases (in-process, from the first import in main.py):")
+        for phase in results["phases"]:
+            print(f"    {phase['name']:<30} {phase['ms']:>10.1f} ms")
+        print(f"    {'ready':<30} {results['ready_ms']:>10.1f} ms")
+        print(f"\n  Import time by package (self, {results['import_ms']:.0f} ms total):")
+        for package, elapsed_ms in results["packages"]:
+            print(f"    {package:<30} {elapsed_ms:>10.1f} ms")
+        print("\n  Slowest modules (self):")
+        for name, elapsed_ms in results["slowest_modules"]:
+            print(f"    {name:<50} {elapsed_ms:>8.1f} ms")
+        if results["over_budget"]:
+            print("\n  OVER BUDGET")
+
+    sys.exit(1 if results["over_budget"] else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,332 @@
+"""
+Benchmark suite
+Regression benchmarks for the hot paths, on the synthetic corpus from
+benchmarks/corpus.py (plain, HTML-heavy and long emails):
+
+- preprocess: EmailPreprocessor.preprocess_email throughput per corpus kind
+- predict: spam_model.predict latency percentiles per kind, predict_batch throughput
+- train: load + preprocess + train_model wall time on dataset/SMSSpamCollection
+  and dataset/emails_dataset.csv (skipped when the file is missing; nothing is saved)
+- routes: latency of key routes through the ASGI app (httpx, no sockets),
+  with auth overridden and a throwaway SQLite database
+
+Results are written as JSON; --baseline compares against an earlier run and
+exits with status 1 when a metric is worse by more than --tolerance.
+
+Usage (from backend/):
+    python benchmarks/suite.py --output bench.json
+    python benchmarks/suite.py --only preprocess,predict --baseline benchmarks/baseline.json
+    python benchmarks/suite.py --save-baseline benchmarks/baseline.json
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from corpus import KINDS, generate_corpus
+
+SECTIONS = ("preprocess", "predict", "train", "routes")
+TRAIN_DATASETS = {
+    "sms": Path("dataset/SMSSpamCollection"),
+    "emails": Path("dataset/emails_dataset.csv"),
+}
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of floats"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered))) - 1))
+    return ordered[index]
+
+def metric(value, unit, better):
+    """One result entry; `better` is "higher" or "lower" (used by the comparison)"""
+    return {"value": round(value, 4), "unit": unit, "better": better}
+
+def latency_metrics(prefix, latencies_ms):
+    return {
+        f"{prefix}.p50_ms": metric(percentile(latencies_ms, 50), "ms", "lower"),
+        f"{prefix}.p95_ms": metric(percentile(latencies_ms, 95), "ms", "lower"),
+        f"{prefix}.p99_ms": metric(percentile(latencies_ms, 99), "ms", "lower"),
+    }
+
+def bench_preprocess(args, corpora):
+    from app.services.preprocessing import email_preprocessor
+
+    results = {}
+    for kind, corpus in corpora.items():
+        texts = [email["email_text"] for email in corpus]
+        for text in texts[:10]:
+            email_preprocessor.preprocess_email(text)
+        started = time.perf_counter()
+        for text in texts:
+            email_preprocessor.preprocess_email(text)
+        elapsed = time.perf_counter() - started
+        total_bytes = sum(len(text.encode()) for text in texts)
+        results[f"preprocess.{kind}.emails_per_sec"] = metric(len(texts) / elapsed, "emails/s", "higher")
+        results[f"preprocess.{kind}.mb_per_sec"] = metric(total_bytes / elapsed / 1e6, "MB/s", "higher")
+    return results
+
+def ensure_model():
+    """Use the deployed model, or train a small one on the synthetic corpus"""
+    from app.services.model_service import spam_model
+
+    if spam_model.is_loaded:
+        return spam_model
+
+    import train_model
+    import pandas as pd
+
+    logging.getLogger(__name__).warning("No model in ml_models/, training a throwaway one for the benchmark")
+    corpus = [email for kind in KINDS for email in generate_corpus(kind, 400, seed=7)]
+    df = pd.DataFrame({"message": [e["email_text"] for e in corpus], "label": [e["label"] for e in corpus]})
+    with contextlib.redirect_stdout(io.StringIO()):
+        model, vectorizer, _ = train_model.train_model(train_model.preprocess_dataset(df))
+    spam_model.model, spam_model.vectorizer = model, vectorizer
+    spam_model.metadata = {"model": model, "vectorizer": vectorizer, "version": "benchmark"}
+    spam_model.is_loaded = True
+    return spam_model
+
+def bench_predict(args, corpora):
+    model = ensure_model()
+    results = {}
+    for kind, corpus in corpora.items():
+        texts = [email["email_text"] for email in corpus]
+        for text in texts[:10]:
+            model.predict(text)
+        latencies = []
+        for text in texts:
+            started = time.perf_counter()
+            model.predict(text)
+            latencies.append((time.perf_counter() - started) * 1000)
+        results.update(latency_metrics(f"predict.{kind}", latencies))
+
+        started = time.perf_counter()
+        for i in range(0, len(texts), args.batch_size):
+            model.predict_batch(texts[i:i + args.batch_size])
+        elapsed = time.perf_counter() - started
+        results[f"predict_batch.{kind}.emails_per_sec"] = metric(len(texts) / elapsed, "emails/s", "higher")
+    return results
+
+def bench_train(args, corpora):
+    import train_model
+
+    results = {}
+    for name, path in TRAIN_DATASETS.items():
+        if not path.exists():
+            logging.getLogger(__name__).warning(f"Skipping train.{name}: {path} not found")
+            continue
+        started = time.perf_counter()
+        df = train_model.load_dataset(str(path))
+        loaded = time.perf_counter()
+        df = train_model.preprocess_dataset(df)
+        preprocessed = time.perf_counter()
+        # train_model prints a classification report; keep --json output clean
+        with contextlib.redirect_stdout(io.StringIO()):
+            train_model.train_model(df)
+        finished = time.perf_counter()
+        results[f"train.{name}.load_sec"] = metric(loaded - started, "s", "lower")
+        results[f"train.{name}.preprocess_sec"] = metric(preprocessed - loaded, "s", "lower")
+        results[f"train.{name}.fit_sec"] = metric(finished - preprocessed, "s", "lower")
+        results[f"train.{name}.total_sec"] = metric(finished - started, "s", "lower")
+    return results
+
+def setup_route_overrides(app):
+    """Throwaway database, fixed user, no rate limiting"""
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+
+    from app.database import Base, create_db_engine, create_async_db_engine, get_async_db
+    from app.dependencies import get_current_user, get_current_user_or_api_key
+    from app.models import User
+    from app.services import stream_service
+    from app.services.rate_limiter import rate_limiter
+
+    tmp_dir = tempfile.mkdtemp(prefix="mailsentra_bench_")
+    database_url = f"sqlite:///{os.path.join(tmp_dir, 'bench.db')}"
+    engine = create_db_engine(database_url)
+    Base.metadata.create_all(bind=engine)
+    with engine.begin() as connection:
+        connection.execute(User.__table__.insert(), [{
+            "id": 1, "username": "bench", "email": "bench@example.com",
+            "hashed_password": "x", "is_active": True, "is_admin": False,
+        }])
+    engine.dispose()
+
+    session_factory = async_sessionmaker(create_async_db_engine(database_url), expire_on_commit=False)
+    user = User(id=1, username="bench", email="bench@example.com", is_active=True, is_admin=False)
+
+    async def override_db():
+        async with session_factory() as session:
+            yield session
+
+    app.dependency_overrides[get_async_db] = override_db
+    app.dependency_overrides[get_current_user] = lambda: user
+    app.dependency_overrides[get_current_user_or_api_key] = lambda: user
+    stream_service.AsyncSessionLocal = session_factory
+    rate_limiter.enabled = False
+
+async def _bench_routes_async(args, corpora):
+    import httpx
+    from main import app
+
+    ensure_model()
+    setup_route_overrides(app)
+
+    plain = corpora["plain"][0]["email_text"]
+    html = corpora["html"][0]["email_text"]
+    stream_body = "".join(
+        json.dumps({"email_text": email["email_text"]}) + "\n" for email in corpora["plain"][:100]
+    )
+    routes = [
+        ("health", "GET", "/health", {}),
+        ("analyze_plain", "POST", "/api/analyze/analyze", {"json": {"email_text": plain}}),
+        ("analyze_html", "POST", "/api/analyze/analyze", {"json": {"email_text": html}}),
+        ("logs", "GET", "/api/logs?limit=50", {}),
+        ("dashboard_stats", "GET", "/api/dashboard/stats", {}),
+        ("stream_100", "POST", "/api/analyze/stream", {"content": stream_body}),
+    ]
+
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        for name, method, path, kwargs in routes:
+            requests = max(1, args.route_requests // 10) if name == "stream_100" else args.route_requests
+            for _ in range(5):
+                await client.request(method, path, **kwargs)
+            latencies, errors = [], 0
+            for _ in range(requests):
+                started = time.perf_counter()
+                response = await client.request(method, path, **kwargs)
+                latencies.append((time.perf_counter() - started) * 1000)
+                if response.status_code != 200:
+                    errors += 1
+            results.update(latency_metrics(f"route.{name}", latencies))
+            results[f"route.{name}.errors"] = metric(errors, "requests", "lower")
+    return results
+
+def bench_routes(args, corpora):
+    return asyncio.run(_bench_routes_async(args, corpora))
+
+BENCHMARKS = {
+    "preprocess": bench_preprocess,
+    "predict": bench_predict,
+    "train": bench_train,
+    "routes": bench_routes,
+}
+
+def compare(results, baseline, tolerance):
+    """
+    Compare metrics present in both runs
+
+    Returns:
+        (rows, regressions) where each row is (name, baseline, current, change %, status)
+    """
+    rows, regressions = [], []
+    for name, current in sorted(results["metrics"].items()):
+        previous = baseline.get("metrics", {}).get(name)
+        if previous is None:
+            rows.append((name, None, current["value"], None, "new"))
+            continue
+        old, new = previous["value"], current["value"]
+        if old == 0:
+            change = 0.0 if new == 0 else float("inf")
+        else:
+            change = (new - old) / abs(old)
+        worse = change < -tolerance if current["better"] == "higher" else change > tolerance
+        # Sub-millisecond latencies are mostly timer noise
+        if current["unit"] == "ms" and abs(new - old) < 0.05:
+            worse = False
+        status = "REGRESSION" if worse else "ok"
+        if worse:
+            regressions.append(name)
+        rows.append((name, old, new, change * 100, status))
+    return rows, regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Preprocessing, inference, training and route benchmarks")
+    parser.add_argument("--only", default=",".join(SECTIONS), help=f"Comma-separated sections ({', '.join(SECTIONS)})")
+    parser.add_argument("--emails", type=int, default=500, help="Synthetic emails per corpus kind")
+    parser.add_argument("--batch-size", type=int, default=256, help="Chunk size for predict_batch")
+    parser.add_argument("--route-requests", type=int, default=300, help="Requests per route")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="Write results JSON to this file")
+    parser.add_argument("--baseline", help="Compare against a results JSON from an earlier run")
+    parser.add_argument("--save-baseline", help="Also write results to this path as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed relative slowdown before a metric counts as a regression")
+    parser.add_argument("--json", action="store_true", help="Print machine-readable results")
+    args = parser.parse_args()
+
+    sections = [name.strip() for name in args.only.split(",") if name.strip()]
+    unknown = set(sections) - set(SECTIONS)
+    if unknown:
+        parser.error(f"Unknown sections: {', '.join(sorted(unknown))}")
+
+    # Per-call INFO logs from the pipeline would dominate the timings
+    logging.disable(logging.INFO)
+
+    corpora = {kind: generate_corpus(kind, args.emails, args.seed) for kind in KINDS}
+    results = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "sections": sections,
+            "emails_per_kind": args.emails,
+            "route_requests": args.route_requests,
+        },
+        "metrics": {},
+    }
+    for name in sections:
+        started = time.perf_counter()
+        results["metrics"].update(BENCHMARKS[name](args, corpora))
+        results["meta"][f"{name}_seconds"] = round(time.perf_counter() - started, 2)
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            Path(path).write_text(json.dumps(results, indent=2) + "\n")
+
+    rows, regressions = [], []
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        rows, regressions = compare(results, baseline, args.tolerance)
+        results["comparison"] = {
+            "baseline": args.baseline,
+            "tolerance": args.tolerance,
+            "regressions": regressions,
+        }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print("=" * 78)
+        print(f"  Benchmark suite: {', '.join(sections)} ({args.emails} emails per kind)")
+        print("=" * 78)
+        if rows:
+            for name, old, new, change, status in rows:
+                old_text = "-" if old is None else f"{old:.4g}"
+                change_text = "" if change is None else f"{change:+.1f}%"
+                print(f"   {name:<40} {old_text:>10} -> {new:<10.4g} {change_text:>8}  {status}")
+            print()
+            print(f"   {len(regressions)} regression(s) beyond {args.tolerance * 100:.0f}%")
+        else:
+            for name, entry in results["metrics"].items():
+                print(f"   {name:<40} {entry['value']:>12.4g} {entry['unit']}")
+        print()
+
+    sys.exit(1 if regressions else 0)
+
+if __name__ == "__main__":
+    main()
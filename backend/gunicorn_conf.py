@@ -0,0 +1,59 @@
+"""
+Gunicorn configuration for production
+Used by serve.py (or directly: gunicorn -c gunicorn_conf.py main:app)
+
+- preload_app: main:app, the spam model and the preprocessor are imported
+  once in the master, warmed up, then frozen so forked workers share them
+  copy-on-write instead of each loading its own copy
+- max_requests (+ jitter): workers are recycled gracefully after N requests
+- post_fork: inherited database pools are dropped so workers never share sockets,
+  logging is reconfigured (the master's log writer thread isn't forked) and
+  the startup profile clock restarts for the worker
+"""
+
+import gc
+import multiprocessing
+import os
+
+from app.config import settings
+
+bind = f"{os.getenv('HOST', '0.0.0.0')}:{os.getenv('PORT', '8000')}"
+workers = settings.WEB_CONCURRENCY or multiprocessing.cpu_count()
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+
+max_requests = settings.WORKER_MAX_REQUESTS
+max_requests_jitter = settings.WORKER_MAX_REQUESTS_JITTER
+timeout = settings.WORKER_TIMEOUT
+graceful_timeout = settings.WORKER_GRACEFUL_TIMEOUT
+keepalive = 5
+
+accesslog = "-"
+errorlog = "-"
+loglevel = os.getenv("LOG_LEVEL", "info")
+
+def when_ready(server):
+    """Runs in the master after the app is preloaded, before workers are spawned"""
+    from app.services.model_service import spam_model
+
+    if spam_model.is_loaded:
+        spam_model.warm_up(settings.MODEL_WARMUP_ROUNDS)
+    else:
+        server.log.warning("Model not loaded! Run 'python train_model.py' first")
+
+    # Keep the warmed objects out of future GC passes so collections in the
+    # workers don't touch (and un-share) their pages
+    gc.collect()
+    gc.freeze()
+    server.log.info(f"Master ready, spawning {server.num_workers} workers")
+
+def post_fork(server, worker):
+    """Drop connections inherited from the master without closing them for it"""
+    from app.database import engine, async_engine
+    from app.utils.logger import setup_logging
+    from app.utils.startup import startup_profile
+
+    engine.dispose(close=False)
+    async_engine.sync_engine.dispose(close=False)
+    setup_logging()
+    startup_profile.forked()
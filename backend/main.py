@@ -1,39 +1,30 @@
-from fastapi import FastAPI, Request
+# First import: the startup profile's clock starts here
+from app.utils.startup import startup_profile
+from fastapi import FastAPI, Request, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import ORJSONResponse
 from contextlib import asynccontextmanager
+import asyncio
 import logging
-from app.database import engine
+import os
+from app.database import engine, async_engine
 from app.routes import auth, user, preprocessing, analyze, logs, feedback, admin, retrain, api_keys, metrics, model_info, training
 from app.config import settings
-from slowapi.errors import RateLimitExceeded
-from slowapi import Limiter
-from slowapi.util import get_remote_address
 from app.services.model_service import spam_model
-from starlette.middleware.base import BaseHTTPMiddleware
-
-limiter = Limiter(key_func=get_remote_address)
-
-# Fixed SecurityHeadersMiddleware
-class SecurityHeadersMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        response = await call_next(request)
-        
-        # Add security headers
-        response.headers["X-Content-Type-Options"] = "nosniff"
-        response.headers["X-Frame-Options"] = "DENY"
-        response.headers["X-XSS-Protection"] = "1; mode=block"
-        response.headers["Strict-Transport-Security"] = "max-age=31536000; includeSubDomains"
-        response.headers["Content-Security-Policy"] = "default-src 'self'"
-        response.headers["Referrer-Policy"] = "strict-origin-when-cross-origin"
-        
-        return response
-
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
-)
+from app.services.auth_service import api_key_usage
+from app.services.hashing_service import password_hasher
+from app.services.metrics_exporter import render_metrics
+from app.utils.prometheus import CONTENT_TYPE as METRICS_CONTENT_TYPE
+from app.services.profiler import profiler
+from app.utils.middleware import SecurityHeadersMiddleware, CompressionMiddleware, ProfilingMiddleware, TracingMiddleware
+from app.utils.logger import setup_logging, shutdown_logging
+from app.utils.tracing import tracer, setup_tracing, instrument_engine
+
+setup_logging()
+setup_tracing()
 logger = logging.getLogger(__name__)
+startup_profile.mark("imports")
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -42,11 +33,28 @@ async def lifespan(app: FastAPI):
     if not spam_model.is_loaded:
         logger.warning("Model not loaded! Run 'python train_model.py' first")
     else:
+        # Preloaded workers inherit a warm model from the master; others warm up here
+        # (uvicorn doesn't accept connections until this returns)
+        if not spam_model.is_warm:
+            with startup_profile.phase("model_warm_up"):
+                await run_in_threadpool(spam_model.warm_up, settings.MODEL_WARMUP_ROUNDS)
         logger.info("Spam detection model ready")
         logger.info(f"   - Version: {spam_model.metadata.get('version', 'unknown')}")
         logger.info(f"   - Accuracy: {spam_model.metadata.get('accuracy', 0) * 100:.2f}%")
+    usage_flush_task = asyncio.create_task(
+        api_key_usage.run_periodic_flush(settings.API_KEY_USAGE_FLUSH_SECONDS)
+    )
+    startup_profile.ready()
+    logger.info(f"Startup complete in {startup_profile.ready_ms:.0f} ms")
     yield
     logger.info("Shutting down Spam Detection API...")
+    usage_flush_task.cancel()
+    await api_key_usage.flush()
+    password_hasher.shutdown()
+    profiler.stop()
+    tracer.configure(None)
+    await async_engine.dispose()
+    shutdown_logging()
 
 app = FastAPI(
     title="Spam Detection API",
@@ -54,32 +62,36 @@ app = FastAPI(
     version="1.0.0",
     docs_url="/docs",
     redoc_url="/redoc",
+    default_response_class=ORJSONResponse,
     lifespan=lifespan
 )
 
-app.state.limiter = limiter
-
-@app.exception_handler(RateLimitExceeded)
-async def rate_limit_handler(request: Request, exc: RateLimitExceeded):
-    """Handle rate limit exceeded errors"""
-    return JSONResponse(
-        status_code=429,
-        content={
-            "detail": "Rate limit exceeded. Please try again later.",
-            "retry_after": str(exc.retry_after)
-        },
-        headers={"Retry-After": str(exc.retry_after)}
-    )
-
 app.add_middleware(
     CORSMiddleware,
     allow_origins=settings.BACKEND_CORS_ORIGINS,
     allow_credentials=True,
     allow_methods=["GET", "POST", "PUT", "PATCH", "DELETE", "OPTIONS"],
     allow_headers=["*"],
+    expose_headers=["X-Request-ID", "X-Process-Time", "X-RateLimit-Limit", "X-RateLimit-Remaining", "Retry-After", "Idempotent-Replayed", "Server-Timing"],
 )
 
-app.add_middleware(SecurityHeadersMiddleware)
+if settings.COMPRESSION_ENABLED:
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.COMPRESSION_MIN_SIZE,
+        gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+        brotli_quality=settings.COMPRESSION_BROTLI_QUALITY,
+    )
+
+if settings.PROFILER_ENABLED:
+    app.add_middleware(ProfilingMiddleware, profiler=profiler)
+
+if settings.TRACING_ENABLED:
+    instrument_engine(engine)
+    instrument_engine(async_engine.sync_engine)
+    app.add_middleware(TracingMiddleware, tracer=tracer)
+
+app.add_middleware(SecurityHeadersMiddleware, server_timing=settings.SERVER_TIMING_ENABLED)
 
 # Include all routers AFTER app is created
 app.include_router(auth.router, prefix="/api/auth", tags=["Authentication"])
@@ -94,6 +106,7 @@ app.include_router(api_keys.router, prefix="/api/token", tags=["API Keys"])
 app.include_router(metrics.router, prefix="/api/metrics", tags=["Metrics"])
 app.include_router(model_info.router, prefix="/api/model", tags=["Model Management"])
 app.include_router(training.router, prefix="/api", tags=["training"])
+startup_profile.mark("app_setup")
 
 @app.get("/")
 def read_root():
@@ -112,6 +125,35 @@ def health_check():
         "service": "spam-detection-api"
     }
 
+@app.get("/ready")
+def readiness_check():
+    """Readiness probe - 503 until the model is loaded and warmed up"""
+    if not spam_model.is_ready:
+        return ORJSONResponse(
+            status_code=503,
+            content={
+                "status": "not_ready",
+                "model_loaded": spam_model.is_loaded,
+                "model_warm": spam_model.is_warm
+            }
+        )
+    return {
+        "status": "ready",
+        "model_version": spam_model.metadata.get("version", "unknown")
+    }
+
+async def prometheus_metrics(request: Request):
+    """Prometheus scrape endpoint - in-process counters only, no database access"""
+    if settings.METRICS_TOKEN and request.headers.get("authorization") != f"Bearer {settings.METRICS_TOKEN}":
+        return Response(status_code=401, headers={"WWW-Authenticate": "Bearer"})
+    return Response(content=render_metrics(), media_type=METRICS_CONTENT_TYPE)
+
+# An unauthenticated /metrics would be public in production, so it stays unmounted
+if settings.METRICS_ENABLED and not settings.METRICS_TOKEN and os.getenv("ENVIRONMENT", "development") == "production":
+    logger.warning("METRICS_ENABLED is set without METRICS_TOKEN; /metrics is not served in production")
+elif settings.METRICS_ENABLED:
+    app.add_api_route("/metrics", prometheus_metrics, include_in_schema=False)
+
 @app.get("/test-db")
 def test_database():
     """Test database connection and verify tables exist"""
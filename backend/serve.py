@@ -0,0 +1,37 @@
+"""
+Production entry point
+Runs the API with several preloaded workers (see gunicorn_conf.py)
+
+Usage:
+    python serve.py                  # one worker per CPU core on 0.0.0.0:8000
+    WEB_CONCURRENCY=4 PORT=9000 python serve.py
+
+Use run.py for local development (single process with auto-reload).
+"""
+
+import os
+import sys
+
+def main():
+    if os.name == "nt":
+        # Gunicorn needs fork(); fall back to uvicorn's own workers (no preloading)
+        import uvicorn
+        from app.config import settings
+        uvicorn.run(
+            "main:app",
+            host=os.getenv("HOST", "0.0.0.0"),
+            port=int(os.getenv("PORT", "8000")),
+            workers=settings.WEB_CONCURRENCY or os.cpu_count() or 1,
+            log_level="info",
+        )
+        return
+
+    from gunicorn.app.wsgiapp import run
+
+    # main:app and the relative model path resolve from the backend directory
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    sys.argv = [sys.argv[0], "-c", "gunicorn_conf.py", "main:app"]
+    run()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+"""
+Query-count tests for the admin analytics endpoints
+Each endpoint must issue the same number of SQL statements whether the
+database holds a handful of rows or many times more, and their cached
+responses expire, are computed once under concurrent misses and are
+dropped by admin writes
+"""
+
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.database import Base, get_db
+from app.dependencies import get_current_admin_user
+from app.models import User, SpamLog, UserFeedback
+from app.routes import admin, metrics
+from app.services.analytics_queries import misclassification_feedback
+from app.utils.cache import MemoryBackend, ResponseCache, response_cache
+
+
+class StatementCounter:
+    """Counts statements sent to the DBAPI while active"""
+
+    def __init__(self, engine):
+        self.count = 0
+        self.active = False
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if self.active:
+            self.count += 1
+
+    def __enter__(self):
+        self.count = 0
+        self.active = True
+        return self
+
+    def __exit__(self, *exc):
+        self.active = False
+
+
+def build_client(users: int, logs_per_user: int):
+    """App with the admin + metrics routers on a seeded in-memory database"""
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    Base.metadata.create_all(bind=engine)
+    TestingSession = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    db = TestingSession()
+    old = datetime.utcnow() - timedelta(days=200)
+    admin_user = User(username="admin", email="admin@example.com", hashed_password="x", is_admin=True)
+    db.add(admin_user)
+    for u in range(users):
+        user = User(
+            username=f"user{u}", email=f"user{u}@example.com",
+            hashed_password="x", created_at=old
+        )
+        db.add(user)
+        db.flush()
+        for i in range(logs_per_user):
+            log = SpamLog(
+                user_id=user.id,
+                email_text=f"message {i}",
+                result="Spam" if i % 2 else "Ham",
+                confidence=0.9,
+                model_version=f"1.{i % 3}",
+                created_at=old,
+            )
+            db.add(log)
+            db.flush()
+            db.add(UserFeedback(
+                user_id=user.id,
+                spam_log_id=log.id,
+                original_result=log.result,
+                corrected_result="ham" if i % 2 else "spam",
+            ))
+    db.commit()
+    admin_id = admin_user.id
+    db.close()
+
+    app = FastAPI()
+    app.include_router(admin.router, prefix="/api/admin")
+    app.include_router(metrics.router, prefix="/api/metrics")
+
+    def override_get_db():
+        session = TestingSession()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_current_admin_user] = lambda: User(
+        id=admin_id, username="admin", email="admin@example.com", is_admin=True, is_active=True
+    )
+    return TestClient(app), engine, TestingSession
+
+
+@pytest.fixture(autouse=True)
+def no_response_cache():
+    """Every request must hit the database for statements to be counted"""
+    response_cache.enabled = False
+    yield
+    response_cache.enabled = True
+
+
+ENDPOINTS = [
+    ("get", "/api/metrics/analytics"),
+    ("get", "/api/admin/model/info"),
+    ("get", "/api/admin/export/users"),
+    ("post", "/api/admin/bulk/deactivate-inactive-users"),
+]
+
+
+@pytest.mark.parametrize("method,path", ENDPOINTS)
+def test_endpoint_statement_count_is_constant(method, path):
+    counts = []
+    for users, logs_per_user in [(2, 2), (20, 10)]:
+        client, engine, _ = build_client(users, logs_per_user)
+        counter = StatementCounter(engine)
+        with counter:
+            response = getattr(client, method)(path)
+        assert response.status_code == 200, response.text
+        counts.append(counter.count)
+    assert counts[0] == counts[1], f"{path}: {counts[0]} statements for small DB, {counts[1]} for large"
+
+
+def test_retrain_feedback_loads_logs_in_one_statement():
+    counts = []
+    for users, logs_per_user in [(2, 2), (20, 10)]:
+        _, engine, TestingSession = build_client(users, logs_per_user)
+        db = TestingSession()
+        counter = StatementCounter(engine)
+        with counter:
+            feedbacks = misclassification_feedback(db)
+            texts = [f.spam_log.email_text for f in feedbacks]
+        db.close()
+        assert texts
+        counts.append(counter.count)
+    assert counts[0] == counts[1]
+
+
+def test_deactivate_inactive_users_result():
+    client, _, TestingSession = build_client(3, 1)
+    response = client.post("/api/admin/bulk/deactivate-inactive-users", params={"days_inactive": 90})
+    assert response.status_code == 200
+    assert len(response.json()["deactivated_users"]) == 3
+
+    db = TestingSession()
+    assert db.query(User).filter(User.is_active == True).count() == 1
+    db.close()
+
+
+def test_inactive_users_are_judged_by_last_activity():
+    client, _, TestingSession = build_client(0, 0)
+    now = datetime.utcnow()
+    db = TestingSession()
+    # Last activity is the latest scan, falling back to the registration date
+    cases = {
+        "recent_signup_old_scan": (now - timedelta(days=10), now - timedelta(days=200)),
+        "recent_signup_no_scan": (now - timedelta(days=10), None),
+        "old_signup_no_scan": (now - timedelta(days=200), None),
+        "old_signup_recent_scan": (now - timedelta(days=200), now - timedelta(days=5)),
+    }
+    for username, (created_at, scanned_at) in cases.items():
+        user = User(username=username, email=f"{username}@example.com", hashed_password="x", created_at=created_at)
+        db.add(user)
+        db.flush()
+        if scanned_at:
+            db.add(SpamLog(
+                user_id=user.id, email_text="message", result="Ham",
+                confidence=0.9, model_version="1.0", created_at=scanned_at
+            ))
+    db.commit()
+    db.close()
+
+    response = client.post("/api/admin/bulk/deactivate-inactive-users", params={"days_inactive": 90})
+    assert response.status_code == 200
+    deactivated = {user["username"] for user in response.json()["deactivated_users"]}
+    assert deactivated == {"recent_signup_old_scan", "old_signup_no_scan"}
+
+
+def test_response_cache_entries_expire_after_their_ttl():
+    cache = ResponseCache(MemoryBackend())
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return {"computed": len(calls)}
+
+    assert cache.get_or_compute("admin:stats", 0.05, compute) == {"computed": 1}
+    assert cache.get_or_compute("admin:stats", 0.05, compute) == {"computed": 1}
+    time.sleep(0.1)
+    assert cache.get_or_compute("admin:stats", 0.05, compute) == {"computed": 2}
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_concurrent_misses_compute_once():
+    cache = ResponseCache(MemoryBackend())
+    barrier = threading.Barrier(8)
+    calls, results = [], []
+
+    def compute():
+        calls.append(1)
+        time.sleep(0.1)
+        return {"total_users": 42}
+
+    def request():
+        barrier.wait()
+        results.append(cache.get_or_compute("admin:stats", 60, compute))
+
+    threads = [threading.Thread(target=request) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(calls) == 1
+    assert results == [{"total_users": 42}] * 8
+    assert (cache.hits, cache.misses) == (7, 1)
+
+
+def test_admin_user_writes_refresh_cached_stats():
+    client, _, _ = build_client(2, 1)
+    response_cache.enabled = True
+    response_cache.invalidate("admin:")
+    total_users = lambda: client.get("/api/admin/stats").json()["total_users"]
+
+    try:
+        assert total_users() == 3
+        created = client.post("/api/admin/users/create", json={
+            "username": "newcomer", "email": "newcomer@example.com", "password": "s3cret-pass"
+        })
+        assert created.status_code == 200, created.text
+        assert total_users() == 4
+
+        assert client.delete(f"/api/admin/users/{created.json()['user']['id']}").status_code == 200
+        assert total_users() == 3
+    finally:
+        response_cache.invalidate("admin:")
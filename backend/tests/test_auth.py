@@ -0,0 +1,246 @@
+"""
+Tests for bearer and X-API-Key authentication
+Repeat requests are served from the auth caches without touching the
+database, admin changes made in any worker reach every worker's caches at
+once, only the SHA-256 digest of a key is stored, and usage counters reach
+api_keys in one batched UPDATE
+"""
+
+import multiprocessing
+import sqlite3
+import sys
+from pathlib import Path
+
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.database import Base, get_async_db, get_db
+from app.dependencies import get_current_admin_user, get_current_user, get_current_user_or_api_key
+from app.models import User
+from app.models.api_key import APIKey
+from app.routes import admin, api_keys
+from app.services import auth_service
+from app.utils.security import create_access_token
+
+
+class StatementCounter:
+    """Counts statements sent to the DBAPI while active"""
+
+    def __init__(self, engine):
+        self.count = 0
+        self.active = False
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if self.active:
+            self.count += 1
+
+    def __enter__(self):
+        self.count = 0
+        self.active = True
+        return self
+
+    def __exit__(self, *exc):
+        self.active = False
+
+
+@pytest.fixture
+def api(tmp_path, monkeypatch):
+    """App with the key routes and an X-API-Key protected route on a file database"""
+    database_url = f"sqlite:///{tmp_path / 'auth.db'}"
+    engine = create_engine(database_url, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    TestingSession = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'auth.db'}", poolclass=NullPool)
+    AsyncTestingSession = async_sessionmaker(bind=async_engine, class_=AsyncSession, expire_on_commit=False)
+    monkeypatch.setattr(auth_service, "async_engine", async_engine)
+
+    db = TestingSession()
+    owner = User(username="client", email="client@example.com", hashed_password="x", is_active=True)
+    db.add(owner)
+    db.commit()
+    owner_id = owner.id
+    db.close()
+
+    app = FastAPI()
+    app.include_router(admin.router, prefix="/api/admin")
+    app.include_router(api_keys.router, prefix="/api/token")
+
+    @app.get("/whoami")
+    async def whoami(user: User = Depends(get_current_user_or_api_key)):
+        return {"id": user.id}
+
+    @app.get("/me")
+    async def me(user: User = Depends(get_current_user)):
+        return {"id": user.id, "is_admin": user.is_admin}
+
+    def override_get_db():
+        session = TestingSession()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    async def override_get_async_db():
+        async with AsyncTestingSession() as session:
+            yield session
+
+    principal = lambda: User(id=owner_id, username="client", email="client@example.com", is_admin=True, is_active=True)
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    app.dependency_overrides[get_current_user] = principal
+    app.dependency_overrides[get_current_admin_user] = principal
+
+    auth_service.token_cache.clear()
+    auth_service.principal_cache.clear()
+    auth_service.api_key_cache.clear()
+    auth_service.api_key_usage.drain()
+    with TestClient(app) as client:
+        client.owner_id = owner_id
+        client.database_file = tmp_path / "auth.db"
+        client.sessions = TestingSession
+        client.counter = StatementCounter(async_engine.sync_engine)
+        yield client
+        client.portal.call(async_engine.dispose)
+    auth_service.token_cache.clear()
+    auth_service.principal_cache.clear()
+    auth_service.api_key_cache.clear()
+    auth_service.api_key_usage.drain()
+    engine.dispose()
+
+
+def in_other_worker(database_file, sql, invalidate):
+    """Run an admin change in a forked process, the way another gunicorn worker would"""
+
+    def change():
+        conn = sqlite3.connect(database_file)
+        conn.execute(sql)
+        conn.commit()
+        conn.close()
+        invalidate()
+
+    process = multiprocessing.get_context("fork").Process(target=change)
+    process.start()
+    process.join(30)
+    assert process.exitcode == 0
+
+
+def bearer(client, monkeypatch):
+    """Authorization header for the key owner, with get_current_user no longer overridden"""
+    monkeypatch.setattr(auth_service.settings, "SECRET_KEY", "test-secret-key-with-32-characters!")
+    client.app.dependency_overrides.pop(get_current_user)
+    token = create_access_token({"sub": "client@example.com", "is_admin": False})
+    return {"Authorization": f"Bearer {token}"}
+
+
+def stored_key(client, key_id):
+    db = client.sessions()
+    try:
+        return db.query(APIKey).filter(APIKey.id == key_id).one()
+    finally:
+        db.close()
+
+
+def test_stored_digest_is_not_a_credential(api):
+    issued = api.post("/api/token/generate", json={"key_name": "gateway"}).json()
+    admin_issued = api.post("/api/admin/api-keys/generate", json={"user_id": api.owner_id, "name": "ops"}).json()["api_key"]
+
+    for raw_key, key_id in [(issued["api_key"], issued["key_id"]), (admin_issued["key"], admin_issued["id"])]:
+        digest = stored_key(api, key_id).key
+        assert digest == auth_service.hash_api_key(raw_key)
+        assert api.get("/whoami", headers={"X-API-Key": raw_key}).json() == {"id": api.owner_id}
+        assert api.get("/whoami", headers={"X-API-Key": digest}).status_code == 401
+
+
+def test_api_key_cache_serves_repeats_and_sees_revocation(api):
+    issued = api.post("/api/token/generate", json={"key_name": "gateway"}).json()
+    headers = {"X-API-Key": issued["api_key"]}
+
+    assert api.get("/whoami", headers=headers).status_code == 200
+    with api.counter:
+        assert api.get("/whoami", headers=headers).status_code == 200
+    assert api.counter.count == 0
+
+    # Unknown keys are negatively cached
+    assert api.get("/whoami", headers={"X-API-Key": "nope"}).status_code == 401
+    with api.counter:
+        assert api.get("/whoami", headers={"X-API-Key": "nope"}).status_code == 401
+    assert api.counter.count == 0
+
+    # Revocation drops the cached entry, so the warm key fails right away
+    assert api.delete(f"/api/token/keys/{issued['key_id']}").status_code == 200
+    assert api.get("/whoami", headers=headers).status_code == 401
+
+
+def test_api_key_usage_is_flushed_in_one_update(api):
+    keys = [api.post("/api/token/generate", json={"key_name": f"k{i}"}).json() for i in range(2)]
+    for _ in range(3):
+        for key in keys:
+            assert api.get("/whoami", headers={"X-API-Key": key["api_key"]}).status_code == 200
+    assert stored_key(api, keys[0]["key_id"]).usage_count == 0
+
+    with api.counter:
+        assert api.portal.call(auth_service.api_key_usage.flush) == 2
+    assert api.counter.count == 1
+    for key in keys:
+        row = stored_key(api, key["key_id"])
+        assert row.usage_count == 3
+        assert row.last_used_at is not None
+    assert api.portal.call(auth_service.api_key_usage.flush) == 0
+
+
+def test_bearer_cache_hit_skips_the_database(api, monkeypatch):
+    headers = bearer(api, monkeypatch)
+    assert api.get("/me", headers=headers).json() == {"id": api.owner_id, "is_admin": False}
+    with api.counter:
+        assert api.get("/me", headers=headers).status_code == 200
+    assert api.counter.count == 0
+
+
+def test_admin_changes_in_another_worker_reach_cached_principals(api, monkeypatch):
+    headers = bearer(api, monkeypatch)
+    assert api.get("/me", headers=headers).json()["is_admin"] is False
+
+    in_other_worker(
+        api.database_file, f"UPDATE users SET is_admin = 1 WHERE id = {api.owner_id}",
+        lambda: auth_service.invalidate_user(api.owner_id)
+    )
+    assert api.get("/me", headers=headers).json()["is_admin"] is True
+
+    in_other_worker(
+        api.database_file, f"UPDATE users SET is_active = 0 WHERE id = {api.owner_id}",
+        lambda: auth_service.invalidate_user(api.owner_id)
+    )
+    assert api.get("/me", headers=headers).status_code == 403
+
+
+def test_key_revoked_in_another_worker_is_rejected_at_once(api):
+    revoked, toggled = [api.post("/api/token/generate", json={"key_name": f"k{i}"}).json() for i in range(2)]
+    assert api.get("/whoami", headers={"X-API-Key": revoked["api_key"]}).status_code == 200
+
+    digest = stored_key(api, revoked["key_id"]).key
+    in_other_worker(
+        api.database_file, f"DELETE FROM api_keys WHERE id = {revoked['key_id']}",
+        lambda: auth_service.invalidate_api_key(digest)
+    )
+    assert api.get("/whoami", headers={"X-API-Key": revoked["api_key"]}).status_code == 401
+
+    # A key rejected while deactivated isn't kept negatively cached once reactivated
+    digest = stored_key(api, toggled["key_id"]).key
+    in_other_worker(
+        api.database_file, f"UPDATE api_keys SET is_active = 0 WHERE id = {toggled['key_id']}",
+        lambda: auth_service.invalidate_api_key(digest)
+    )
+    assert api.get("/whoami", headers={"X-API-Key": toggled["api_key"]}).status_code == 401
+    in_other_worker(
+        api.database_file, f"UPDATE api_keys SET is_active = 1 WHERE id = {toggled['key_id']}",
+        lambda: auth_service.invalidate_api_key(digest)
+    )
+    assert api.get("/whoami", headers={"X-API-Key": toggled["api_key"]}).status_code == 200
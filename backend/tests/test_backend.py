@@ -0,0 +1,615 @@
+"""
+Tests for request-level services behind /analyze
+"""
+
+import asyncio
+import io
+import json
+import logging
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+import httpx
+import msgpack
+import pytest
+from fastapi import Depends, FastAPI, HTTPException
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.config import settings
+from app.database import Base
+from app.dependencies import get_current_user_or_api_key
+from app.models import SpamLog, User
+from app.models.user_stats import UserStats
+from app.services import rate_limiter as rate_limiter_module, stream_service
+from app.services.drift_monitor import DriftMonitor
+from app.services.hashing_service import PasswordHasher
+from app.services.profiler import SamplingProfiler
+from app.services.rate_limiter import QUOTAS, Quota, RateLimiter, SharedMemoryBackend, _key_hash, rate_limit
+from app.services.idempotency import IdempotencyStore, request_fingerprint
+from app.utils.cache import MemoryBackend
+from app.utils.logger import JsonFormatter, SamplingFilter, parse_sample_rates
+from app.utils.model_cost import benchmark_inference, measure_footprint
+from app.utils.prometheus import CounterVec, MetricsWriter, inference_counter
+from app.utils.timing import LatencyRegistry, format_server_timing, timed
+from app.utils.tracing import (
+    BatchSpanProcessor, InMemorySpanExporter, Tracer, current_span, parse_traceparent, tracer, traced
+)
+
+
+def build_model(classifier, version):
+    """SpamDetectionModel around a classifier fitted on a tiny corpus"""
+    from sklearn.feature_extraction.text import TfidfVectorizer
+
+    from app.services.model_service import SpamDetectionModel
+
+    texts = [f"claim free prize winner {i}" for i in range(11)] + [f"team meeting agenda {i}" for i in range(9)]
+    vectorizer = TfidfVectorizer().fit(texts)
+    model = SpamDetectionModel(model_path="missing.pkl")
+    model.model = classifier.fit(vectorizer.transform(texts), ["spam"] * 11 + ["ham"] * 9)
+    model.vectorizer = vectorizer
+    model.metadata = {"version": version}
+    model.is_loaded = True
+    return model
+
+
+def asgi_receive(chunks, disconnect=None):
+    """ASGI receive() delivering the body in chunks, then http.disconnect once `disconnect` is set"""
+    messages = [{"type": "http.request", "body": chunk, "more_body": True} for chunk in chunks]
+    messages[-1]["more_body"] = False
+
+    async def receive():
+        if messages:
+            return messages.pop(0)
+        await (disconnect or asyncio.Event()).wait()
+        return {"type": "http.disconnect"}
+    return receive
+
+
+@pytest.fixture
+def stream_db(tmp_path, monkeypatch):
+    """Stream service on a file database with a fitted model"""
+    from sklearn.linear_model import LogisticRegression
+
+    database = tmp_path / "stream.db"
+    engine = create_engine(f"sqlite:///{database}")
+    Base.metadata.create_all(bind=engine)
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{database}", poolclass=NullPool)
+    monkeypatch.setattr(stream_service, "AsyncSessionLocal", async_sessionmaker(
+        bind=async_engine, class_=AsyncSession, expire_on_commit=False
+    ))
+    monkeypatch.setattr(stream_service, "spam_model", build_model(LogisticRegression(C=100), "stream-test"))
+    monkeypatch.setattr(settings, "STREAM_MAX_LINE_BYTES", 200)
+    yield engine
+    asyncio.run(async_engine.dispose())
+    engine.dispose()
+
+
+def logged_rows(engine):
+    with engine.connect() as conn:
+        logs = conn.execute(select(func.count()).select_from(SpamLog)).scalar()
+        analyses = conn.execute(select(func.coalesce(func.sum(UserStats.total_analyses), 0))).scalar()
+    return logs, analyses
+
+
+def test_idempotency_coalesces_and_replays():
+    store = IdempotencyStore(MemoryBackend(), ttl=60)
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.01)
+        return {"result": "spam", "log_id": 42}
+
+    async def scenario():
+        fingerprint = request_fingerprint({"email_text": "win money"}, True)
+        concurrent = await asyncio.gather(*(
+            store.run("user:1", "retry-1", fingerprint, compute) for _ in range(5)
+        ))
+        later = await store.run("user:1", "retry-1", fingerprint, compute)
+        return concurrent, later
+
+    concurrent, later = asyncio.run(scenario())
+
+    assert calls == 1
+    assert [replayed for _, replayed in concurrent].count(False) == 1
+    assert all(result["log_id"] == 42 for result, _ in concurrent)
+    assert later == ({"result": "spam", "log_id": 42}, True)
+
+
+def test_idempotency_key_reuse_with_different_body_is_rejected():
+    store = IdempotencyStore(MemoryBackend(), ttl=60)
+
+    async def compute():
+        return {"result": "ham"}
+
+    async def scenario():
+        await store.run("user:1", "k", request_fingerprint("a"), compute)
+        await store.run("user:1", "k", request_fingerprint("b"), compute)
+
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(scenario())
+    assert exc.value.status_code == 422
+
+
+def test_idempotency_failures_are_not_stored():
+    store = IdempotencyStore(MemoryBackend(), ttl=60)
+    attempts = 0
+
+    async def flaky():
+        nonlocal attempts
+        attempts += 1
+        if attempts == 1:
+            raise HTTPException(status_code=500, detail="boom")
+        return {"result": "ham"}
+
+    async def scenario():
+        with pytest.raises(HTTPException):
+            await store.run("user:1", "k", "fp", flaky)
+        return await store.run("user:1", "k", "fp", flaky)
+
+    assert asyncio.run(scenario()) == ({"result": "ham"}, False)
+    assert attempts == 2
+
+
+def test_idempotency_waiter_takes_over_from_cancelled_leader():
+    store = IdempotencyStore(MemoryBackend(), ttl=60)
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return {"result": "spam", "attempt": calls}
+
+    async def scenario():
+        leader = asyncio.create_task(store.run("user:1", "k", "fp", compute))
+        await asyncio.sleep(0)
+        waiters = [asyncio.create_task(store.run("user:1", "k", "fp", compute)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        results = await asyncio.gather(*waiters)
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return results
+
+    results = asyncio.run(scenario())
+    assert calls == 2
+    assert all(result == {"result": "spam", "attempt": 2} for result, _ in results)
+    assert [replayed for _, replayed in results].count(False) == 1
+
+
+def where_am_i():
+    return os.getpid(), threading.current_thread().name
+
+
+@pytest.mark.parametrize("executor", ["process", "thread"])
+def test_password_hasher_runs_in_the_configured_executor(executor):
+    hasher = PasswordHasher(workers=1, max_concurrency=2, max_queue=0, executor=executor)
+
+    async def scenario():
+        hashed = await hasher.hash("s3cret-pass")
+        return await hasher._run(where_am_i), await hasher.verify("s3cret-pass", hashed), await hasher.verify("wrong", hashed)
+
+    try:
+        (pid, thread_name), accepted, denied = asyncio.run(scenario())
+        if executor == "process":
+            # Never forked from a worker that already runs logging and tracing threads
+            assert hasher._executor._mp_context.get_start_method() in ("forkserver", "spawn")
+    finally:
+        hasher.shutdown()
+    assert (accepted, denied) == (True, False)
+    if executor == "process":
+        assert pid != os.getpid()
+    else:
+        assert pid == os.getpid() and thread_name.startswith("password-hash")
+    assert hasher.stats()["executor"] == executor
+    assert hasher.stats()["completed"] == 4
+
+    assert PasswordHasher(workers=1, max_concurrency=1, max_queue=0).executor == "thread"
+    with pytest.raises(ValueError):
+        PasswordHasher(workers=1, max_concurrency=1, max_queue=0, executor="greenlet")
+
+
+def test_latency_histogram_percentiles():
+    registry = LatencyRegistry()
+    for value in [0.2] * 90 + [40.0] * 9 + [900.0]:
+        registry.observe("vectorize", value)
+
+    snapshot = registry.snapshot()["vectorize"]
+    assert snapshot["count"] == 100
+    assert snapshot["p50_ms"] == 0.25
+    assert snapshot["p95_ms"] == 50
+    assert snapshot["p99_ms"] == 50
+    assert snapshot["max_ms"] == 900.0
+    assert format_server_timing({"vectorize": 0.5, "total": 2}) == "vectorize;dur=0.500, total;dur=2.000"
+
+
+def test_metrics_writer_exposition():
+    registry = LatencyRegistry()
+    registry.observe("vectorize", 0.2)
+    registry.observe("vectorize", 3.0)
+    counters = CounterVec(("verdict", "model_version"))
+    counters.inc("spam", "1.0", amount=2)
+
+    writer = MetricsWriter()
+    writer.histograms("stage_duration", "Stage duration", (({"stage": s}, h) for s, h in registry.items()))
+    writer.counter_vec("inferences", "Predictions", counters)
+    lines = writer.render().splitlines()
+
+    assert "# TYPE mailsentra_stage_duration_seconds histogram" in lines
+    assert 'mailsentra_stage_duration_seconds_bucket{stage="vectorize",le="0.00025"} 1' in lines
+    assert 'mailsentra_stage_duration_seconds_bucket{stage="vectorize",le="+Inf"} 2' in lines
+    assert 'mailsentra_stage_duration_seconds_count{stage="vectorize"} 2' in lines
+    assert 'mailsentra_inferences_total{verdict="spam",model_version="1.0"} 2' in lines
+
+
+def _busy_loop(stop):
+    while not stop.is_set():
+        sum(i * i for i in range(1000))
+
+
+def test_sampling_profiler_writes_collapsed_stacks(tmp_path):
+    profiler = SamplingProfiler(str(tmp_path), max_seconds=5)
+    stop = threading.Event()
+    worker = threading.Thread(target=_busy_loop, args=(stop,))
+    worker.start()
+    try:
+        meta = profiler.start(duration=0.3, interval_ms=2)
+        with pytest.raises(RuntimeError):
+            profiler.start(duration=1)
+        deadline = time.time() + 5
+        while profiler.session is not None and time.time() < deadline:
+            time.sleep(0.05)
+    finally:
+        stop.set()
+        worker.join()
+
+    result = profiler.get(meta["profile_id"])
+    assert result["status"] == "finished"
+    assert result["samples"] > 0
+    assert any("_busy_loop" in name for name, _ in result["summary"]["total"])
+    assert "_busy_loop" in profiler.collapsed_path(meta["profile_id"]).read_text()
+    with pytest.raises(ValueError):
+        profiler.get("../etc/passwd")
+
+
+def test_model_cost_grows_with_vocabulary():
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.linear_model import LogisticRegression
+
+    texts = [f"win free prize {i} claim now" for i in range(40)] + [f"meeting notes {i} agenda" for i in range(40)]
+    labels = ["spam"] * 40 + ["ham"] * 40
+
+    def fit(ngram_range):
+        vectorizer = TfidfVectorizer(ngram_range=ngram_range).fit(texts)
+        model = LogisticRegression().fit(vectorizer.transform(texts), labels)
+        return model, vectorizer
+
+    unigram = measure_footprint(*fit((1, 1)))
+    bigram = measure_footprint(*fit((1, 2)))
+    assert unigram["vocabulary_size"] < bigram["vocabulary_size"]
+    assert 0 < unigram["total_bytes"] < bigram["total_bytes"]
+    assert bigram["ngram_range"] == [1, 2]
+
+    benchmark = benchmark_inference(*fit((1, 1)), rounds=2, batch_size=16)
+    assert benchmark["predictions_per_sec"] > 0
+    assert benchmark["batch_predictions_per_sec"] > 0
+
+
+def test_log_sampling_keeps_warnings_and_structured_fields():
+    rates = parse_sample_rates("app.hot=0, app.hot.analyze=1")
+    sampler = SamplingFilter(rates)
+
+    def record(name, level, **extra):
+        entry = logging.LogRecord(name, level, __file__, 1, "verdict %s", ("spam",), None)
+        entry.__dict__.update(extra)
+        return entry
+
+    assert not sampler.filter(record("app.hot.predict", logging.INFO))
+    assert sampler.filter(record("app.hot.predict", logging.WARNING))
+    assert sampler.filter(record("app.hot.analyze", logging.INFO))
+    assert sampler.filter(record("app.services.model_service", logging.INFO))
+    assert sampler.dropped == 1
+    with pytest.raises(ValueError):
+        parse_sample_rates("app.hot=2")
+
+    line = json.loads(JsonFormatter().format(record("app.hot.analyze", logging.INFO, request_id="abc", user_id=7)))
+    assert line["message"] == "verdict spam"
+    assert line["request_id"] == "abc"
+    assert line["user_id"] == 7
+
+
+def test_drift_monitor_flags_score_shift_and_unseen_tokens():
+    monitor = DriftMonitor(bucket_seconds=60, max_buckets=2)
+    vocabulary = {"meeting": 0, "agenda": 1}
+
+    for i in range(200):
+        monitor.observe("1.0", 0.1, ["meeting", "agenda"], vocabulary, now=i * 0.1)
+    for i in range(200):
+        monitor.observe("1.0", 0.9, ["crypto", "wallet", "meeting"], vocabulary, now=60 + i * 0.1)
+    for minute in (2, 3):
+        monitor.observe("1.0", 0.5, ["meeting"], vocabulary, now=minute * 60)
+
+    version = monitor.snapshot()["versions"]["1.0"]
+    # Ring keeps the newest buckets; the reference (first bucket) survives eviction
+    assert [bucket["start"] for bucket in version["buckets"]] == [180, 120]
+    assert version["reference"]["scores"]["p50"] < 0.15
+    assert version["reference"]["unseen_token_ratio"] == 0
+
+    shifted = DriftMonitor(bucket_seconds=60)
+    for i in range(200):
+        shifted.observe("1.0", 0.1, ["meeting", "agenda"], vocabulary, now=i * 0.1)
+    for i in range(200):
+        shifted.observe("1.0", 0.9, ["crypto", "wallet", "meeting"], vocabulary, now=60 + i * 0.1)
+    current = shifted.snapshot()["versions"]["1.0"]["buckets"][0]
+    assert current["score_psi"] > 0.25
+    assert current["unseen_token_ratio"] == round(2 / 3, 4)
+    assert dict(current["top_unseen_tokens"]) == {"crypto": 200, "wallet": 200}
+
+
+def test_tracing_nests_stage_spans_under_incoming_trace():
+    exporter = InMemorySpanExporter()
+    processor = BatchSpanProcessor(exporter)
+    tracer.configure(processor)
+
+    @traced("auth")
+    async def authenticate():
+        return current_span.get().name
+
+    try:
+        root = tracer.start_root_span("POST /api/analyze/analyze", "00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-01")
+        token = current_span.set(root)
+        try:
+            assert asyncio.run(authenticate()) == "auth"
+            with timed("vectorize"):
+                pass
+        finally:
+            current_span.reset(token)
+        tracer.end_span(root)
+        # Outside a trace stages are timed but not traced
+        with timed("vectorize"):
+            pass
+        processor.force_flush()
+    finally:
+        tracer.configure(None)
+
+    spans = {span.name: span for span in exporter.spans}
+    assert set(spans) == {"auth", "vectorize", "POST /api/analyze/analyze"}
+    assert root.trace_id == "0af7651916cd43dd8448eb211c80319c"
+    assert root.parent_id == "b7ad6b7169203331"
+    assert spans["auth"].parent_id == root.span_id
+    assert spans["vectorize"].parent_id == root.span_id
+    assert parse_traceparent("00-0af7651916cd43dd8448eb211c80319c-b7ad6b7169203331-00")[2] is False
+    assert parse_traceparent("garbage") is None
+    assert Tracer(BatchSpanProcessor(exporter), sample_ratio=0.0).start_root_span("GET /") is None
+
+
+def test_batch_and_single_predictions_count_the_same_verdicts():
+    from sklearn.dummy import DummyClassifier
+
+    # Prior-only classifier: every message scores 0.55, the "uncertain" band
+    model = build_model(DummyClassifier(strategy="prior"), "counting-test")
+
+    def counts():
+        return {labels[0]: value for labels, value in inference_counter.items() if labels[1] == "counting-test"}
+
+    assert model.warm_up(rounds=2)
+    assert counts() == {}
+
+    single = [model.predict(text)["result"] for text in ["claim your prize", "agenda for the meeting"]]
+    batch = [item["result"] for item in model.predict_batch(["claim your prize", "agenda for the meeting"])]
+    assert single == batch == ["uncertain", "uncertain"]
+    assert counts() == {"uncertain": 4}
+
+    # Reloading warms up again without resetting the counters
+    assert model.warm_up(rounds=1)
+    assert counts() == {"uncertain": 4}
+
+
+def test_ndjson_stream_rejects_oversized_lines_and_logs_verdicts(stream_db):
+    oversized = json.dumps({"email_text": "claim free prize " * 20}).encode()
+    body = b"\n".join([
+        json.dumps({"email_text": "claim your free prize winner", "email_id": 1}).encode(),
+        oversized,
+        b"not json",
+        b"",
+        json.dumps({"email_text": "agenda for the team meeting", "email_id": 2}).encode(),
+    ])
+    # The oversized line arrives whole inside the first chunk
+    chunks = [body[:-10], body[-10:]]
+
+    async def run():
+        stream = stream_service.classify_ndjson_stream(asgi_receive(chunks), user_id=1, tenant_key="user:1")
+        return b"".join([chunk async for chunk in stream])
+
+    records = [json.loads(line) for line in asyncio.run(run()).splitlines()]
+    assert [(record.get("line"), record.get("result"), record.get("error")) for record in records[:-1]] == [
+        (1, "spam", None),
+        (2, None, "Line exceeds 200 bytes"),
+        (3, None, "Invalid JSON"),
+        (5, "ham", None),
+    ]
+    assert records[0]["log_id"] and records[3]["email_id"] == 2
+    assert records[-1] == {"summary": {"processed": 2, "errors": 2}}
+    assert logged_rows(stream_db) == (2, 2)
+
+
+def test_msgpack_stream_round_trip(stream_db):
+    items = [
+        {"email_text": "claim your free prize winner", "email_id": 7},
+        ["not", "a", "map"],
+        {"email_text": "agenda for the team meeting"},
+    ]
+    packed = [msgpack.packb(item) for item in items]
+
+    async def run(chunks):
+        stream = stream_service.classify_ndjson_stream(
+            asgi_receive(chunks), user_id=1, tenant_key="user:1", msgpack_in=True, msgpack_out=True
+        )
+        return list(msgpack.Unpacker(io.BytesIO(b"".join([chunk async for chunk in stream])), raw=False))
+
+    records = asyncio.run(run(packed))
+    assert [(record.get("line"), record.get("result"), record.get("error")) for record in records[:-1]] == [
+        (1, "spam", None),
+        (2, None, "Each line must be a JSON object"),
+        (3, "ham", None),
+    ]
+    assert records[0]["email_id"] == 7
+    assert records[-1] == {"summary": {"processed": 2, "errors": 1}}
+    assert logged_rows(stream_db) == (2, 2)
+
+    # Many small items in one chunk larger than the item limit are fine; one big item is not
+    many = b"".join(packed[:1] * 20)
+    assert len(many) > settings.STREAM_MAX_LINE_BYTES
+    assert asyncio.run(run([many]))[-1] == {"summary": {"processed": 20, "errors": 0}}
+    oversized = msgpack.packb({"email_text": "claim free prize " * 20})
+    assert asyncio.run(run([oversized]))[0]["error"] == "Item exceeds 200 bytes"
+
+
+def test_stream_stops_classifying_when_client_disconnects(stream_db, monkeypatch):
+    monkeypatch.setattr(settings, "STREAM_BATCH_SIZE", 1)
+    lines = [json.dumps({"email_text": f"claim your free prize {i}"}).encode() for i in range(60)]
+    gone = asyncio.Event()
+
+    async def run():
+        stream = stream_service.classify_ndjson_stream(
+            asgi_receive([b"\n".join(lines)], disconnect=gone), user_id=1, tenant_key="user:1"
+        )
+        received = []
+        async for chunk in stream:
+            received.append(chunk)
+            gone.set()
+        return received
+
+    received = asyncio.run(run())
+    assert not any(b"summary" in chunk for chunk in received)
+    logs, analyses = logged_rows(stream_db)
+    assert logs == analyses
+    assert logs < 10
+
+
+def test_token_bucket_refills_at_quota_rate():
+    backend = SharedMemoryBackend(slots=64)
+    quota = Quota("test", per_minute=6000, burst=2)
+
+    assert backend.take("tenant", quota)[0]
+    assert backend.take("tenant", quota)[0]
+    allowed, tokens, retry_after = backend.take("tenant", quota)
+    assert not allowed
+    assert 0 < retry_after <= 0.01
+    # Other tenants have their own bucket
+    assert backend.take("other", quota)[0]
+
+    time.sleep(retry_after + 0.005)
+    assert backend.take("tenant", quota)[0]
+
+
+def test_shared_buckets_hold_across_forked_workers():
+    fork = multiprocessing.get_context("fork")
+    backend = SharedMemoryBackend(slots=64)
+    quota = Quota("shared", per_minute=1, burst=50)
+    results = fork.Queue()
+
+    def worker():
+        results.put(sum(backend.take("tenant", quota)[0] for _ in range(30)))
+
+    workers = [fork.Process(target=worker) for _ in range(4)]
+    for process in workers:
+        process.start()
+    allowed = sum(results.get(timeout=30) for _ in workers)
+    for process in workers:
+        process.join()
+    assert allowed == 50
+
+
+def test_bucket_lock_survives_dead_holder_and_fails_open_when_busy():
+    fork = multiprocessing.get_context("fork")
+    backend = SharedMemoryBackend(slots=64, lock_timeout=0.05)
+    quota = Quota("locks", per_minute=60, burst=5)
+    stripe = _key_hash("locks:tenant") % backend.groups % backend._locks.stripes
+    holding = fork.Event()
+
+    def die_holding_lock():
+        with backend._locks.hold(stripe):
+            os._exit(0)
+
+    def hold_lock():
+        with backend._locks.hold(stripe):
+            holding.set()
+            time.sleep(5)
+
+    # The kernel releases the lock of a worker that died holding it
+    dead = fork.Process(target=die_holding_lock)
+    dead.start()
+    dead.join()
+    started = time.monotonic()
+    assert backend.take("tenant", quota)[0]
+    assert time.monotonic() - started < 0.05
+
+    # A live holder makes the check time out and let the request through
+    busy = fork.Process(target=hold_lock)
+    busy.start()
+    try:
+        assert holding.wait(10)
+        with pytest.raises(TimeoutError):
+            backend.take("tenant", quota)
+        limiter = RateLimiter(backend)
+        assert limiter.check("tenant", quota) == (True, 5.0, 0.0)
+    finally:
+        busy.terminate()
+        busy.join()
+    assert backend.take("tenant", quota)[0]
+
+
+def test_busy_bucket_lock_does_not_stall_the_event_loop(monkeypatch):
+    fork = multiprocessing.get_context("fork")
+    backend = SharedMemoryBackend(slots=64, lock_timeout=0.3)
+    monkeypatch.setattr(rate_limiter_module, "rate_limiter", RateLimiter(backend))
+    stripe = _key_hash(f"{QUOTAS['analyze'].name}:user:1") % backend.groups % backend._locks.stripes
+    holding = fork.Event()
+
+    def hold_lock():
+        with backend._locks.hold(stripe):
+            holding.set()
+            time.sleep(5)
+
+    app = FastAPI()
+    app.dependency_overrides[get_current_user_or_api_key] = lambda: User(id=1, is_active=True)
+
+    @app.get("/limited", dependencies=[Depends(rate_limit("analyze"))])
+    async def limited():
+        return {"ok": True}
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            started = time.monotonic()
+            request = asyncio.create_task(client.get("/limited"))
+            longest_tick, last = 0.0, time.monotonic()
+            while not request.done():
+                await asyncio.sleep(0.01)
+                now = time.monotonic()
+                longest_tick, last = max(longest_tick, now - last), now
+            return (await request).status_code, time.monotonic() - started, longest_tick
+
+    busy = fork.Process(target=hold_lock)
+    busy.start()
+    try:
+        assert holding.wait(10)
+        status_code, elapsed, longest_tick = asyncio.run(scenario())
+    finally:
+        busy.terminate()
+        busy.join()
+    # The request waited out the lock timeout and failed open, while the loop kept ticking
+    assert status_code == 200
+    assert elapsed >= 0.25
+    assert longest_tick < 0.15
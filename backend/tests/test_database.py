@@ -0,0 +1,260 @@
+"""
+Tests for the database layer
+user_stats counters must always agree with spam_logs, the migration that
+adds them backfills existing logs, and file-based SQLite engines get the
+async driver and connection pragmas
+"""
+
+import asyncio
+import sqlite3
+import sys
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import pytest
+from alembic import command
+from alembic.config import Config
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import NullPool
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from app.config import settings
+from app.database import Base, create_async_db_engine, create_db_engine, get_async_database_url, get_async_db, get_db
+from app.dependencies import get_current_admin_user, get_current_user, get_current_user_or_api_key
+from app.models import SpamLog, User
+from app.routes import admin, analyze, feedback, logs
+from app.services.stats_service import record_feedback, set_feedback_verdict
+
+COUNTERS_FROM_LOGS = """
+    SELECT
+        COUNT(*),
+        COALESCE(SUM(CASE WHEN LOWER(result) = 'spam' THEN 1 ELSE 0 END), 0),
+        COALESCE(SUM(CASE WHEN is_correct IS NOT NULL THEN 1 ELSE 0 END), 0),
+        COALESCE(SUM(CASE WHEN is_correct THEN 1 ELSE 0 END), 0)
+    FROM spam_logs WHERE user_id = :user_id
+"""
+
+
+class KeywordModel:
+    """Stands in for the spam model: anything mentioning a prize is spam"""
+
+    is_loaded = True
+
+    def predict(self, email_text, record=True):
+        is_spam = "prize" in email_text
+        return {
+            "result": "spam" if is_spam else "ham",
+            "confidence": 0.9,
+            "model_version": "test",
+            "original_length": len(email_text),
+            "processed_length": len(email_text),
+        }
+
+
+@pytest.fixture
+def stats_api(tmp_path, monkeypatch):
+    """Analyze, feedback, logs and admin routes on a file database, acting as one user"""
+    database_file = tmp_path / "stats.db"
+    engine = create_engine(f"sqlite:///{database_file}", connect_args={"check_same_thread": False})
+    Base.metadata.create_all(bind=engine)
+    TestingSession = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{database_file}", poolclass=NullPool)
+    AsyncTestingSession = async_sessionmaker(bind=async_engine, class_=AsyncSession, expire_on_commit=False)
+    monkeypatch.setattr(analyze, "spam_model", KeywordModel())
+    monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", False)
+
+    db = TestingSession()
+    admin_user = User(username="admin", email="admin@example.com", hashed_password="x", is_admin=True, is_active=True)
+    user = User(username="reader", email="reader@example.com", hashed_password="x", is_active=True)
+    db.add_all([admin_user, user])
+    db.commit()
+    admin_id, user_id = admin_user.id, user.id
+    db.close()
+
+    app = FastAPI()
+    app.include_router(analyze.router, prefix="/api/analyze")
+    app.include_router(feedback.router, prefix="/api")
+    app.include_router(logs.router, prefix="/api")
+    app.include_router(admin.router, prefix="/api/admin")
+
+    def override_get_db():
+        session = TestingSession()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    async def override_get_async_db():
+        async with AsyncTestingSession() as session:
+            yield session
+
+    reader = lambda: User(id=user_id, username="reader", email="reader@example.com", is_active=True)
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    app.dependency_overrides[get_current_user] = reader
+    app.dependency_overrides[get_current_user_or_api_key] = reader
+    app.dependency_overrides[get_current_admin_user] = lambda: User(
+        id=admin_id, username="admin", email="admin@example.com", is_admin=True, is_active=True
+    )
+
+    with TestClient(app) as client:
+        client.user_id = user_id
+        client.sessions = TestingSession
+        client.async_sessions = AsyncTestingSession
+        yield client
+        client.portal.call(async_engine.dispose)
+    engine.dispose()
+
+
+def assert_counters_match_logs(client):
+    """user_stats row (or the stats endpoint, which backfills a missing row) equals COUNT(*) over spam_logs"""
+    db = client.sessions()
+    try:
+        total, spam, feedback_count, correct = db.execute(text(COUNTERS_FROM_LOGS), {"user_id": client.user_id}).one()
+    finally:
+        db.close()
+    stats = client.get("/api/logs/stats").json()
+    assert (stats["total_analyses"], stats["spam_detected"], stats["ham_detected"], stats["feedback_count"]) == (total, spam, total - spam, feedback_count)
+    db = client.sessions()
+    try:
+        row = db.execute(
+            text("SELECT total_analyses, spam_detected, feedback_count, feedback_correct FROM user_stats WHERE user_id = :user_id"),
+            {"user_id": client.user_id}
+        ).one()
+    finally:
+        db.close()
+    assert tuple(row) == (total, spam, feedback_count, correct)
+    return total, spam, feedback_count, correct
+
+
+def test_user_stats_follow_analyze_feedback_and_deletes(stats_api):
+    texts = ["claim your prize now", "lunch at noon?", "a prize awaits", "minutes from standup"]
+    log_ids = [stats_api.post("/api/analyze/analyze", json={"email_text": t}).json()["log_id"] for t in texts]
+    assert assert_counters_match_logs(stats_api) == (4, 2, 0, 0)
+
+    # First feedback counts once; changing it only moves the correct counter
+    assert stats_api.post("/api/feedback", json={"spam_log_id": log_ids[0], "corrected_result": "spam"}).status_code == 201
+    assert stats_api.post("/api/feedback", json={"spam_log_id": log_ids[1], "corrected_result": "spam"}).status_code == 201
+    assert assert_counters_match_logs(stats_api) == (4, 2, 2, 1)
+    assert stats_api.post("/api/feedback", json={"spam_log_id": log_ids[1], "corrected_result": "not spam"}).status_code == 201
+    assert assert_counters_match_logs(stats_api) == (4, 2, 2, 2)
+
+    # Age two logs past the cutoff and let the admin purge them
+    db = stats_api.sessions()
+    db.query(SpamLog).filter(SpamLog.id.in_(log_ids[:2])).update(
+        {SpamLog.created_at: datetime.utcnow() - timedelta(days=90)}, synchronize_session=False
+    )
+    db.commit()
+    db.close()
+    assert stats_api.delete("/api/admin/bulk/delete-old-logs", params={"days_old": 30}).status_code == 200
+    assert assert_counters_match_logs(stats_api) == (2, 1, 0, 0)
+
+    assert stats_api.delete("/api/admin/bulk/delete-old-logs").status_code == 200
+    assert assert_counters_match_logs(stats_api) == (0, 0, 0, 0)
+
+    # Deleting the user takes the counter row with it
+    assert stats_api.post("/api/analyze/analyze", json={"email_text": "one more prize"}).status_code == 200
+    assert stats_api.delete(f"/api/admin/users/{stats_api.user_id}").status_code == 200
+    db = stats_api.sessions()
+    try:
+        assert db.execute(text("SELECT COUNT(*) FROM user_stats")).scalar() == 0
+    finally:
+        db.close()
+
+
+def test_concurrent_first_feedbacks_count_once(stats_api):
+    log_id = stats_api.post("/api/analyze/analyze", json={"email_text": "claim your prize now"}).json()["log_id"]
+
+    async def give_feedback(session, started=None, proceed=None):
+        previous = await set_feedback_verdict(session, log_id, True)
+        if started is not None:
+            started.set()
+            await proceed.wait()
+        await record_feedback(session, stats_api.user_id, previous, True)
+        await session.commit()
+        return previous
+
+    async def scenario():
+        started, proceed = asyncio.Event(), asyncio.Event()
+        async with stats_api.async_sessions() as first, stats_api.async_sessions() as second:
+            # The first writer holds its UPDATE open while the second one arrives
+            leader = asyncio.create_task(give_feedback(first, started, proceed))
+            await started.wait()
+            follower = asyncio.create_task(give_feedback(second))
+            await asyncio.sleep(0.2)
+            proceed.set()
+            return await leader, await follower
+
+    assert stats_api.portal.call(scenario) == (None, True)
+    assert assert_counters_match_logs(stats_api) == (1, 1, 1, 1)
+
+
+def test_user_stats_migration_backfills_existing_logs(tmp_path, monkeypatch):
+    database_file = tmp_path / "migrate.db"
+    monkeypatch.setattr(settings, "DATABASE_URL", f"sqlite:///{database_file}")
+    config = Config()
+    config.set_main_option("script_location", str(BACKEND_DIR / "alembic"))
+    command.upgrade(config, "ed2f0e5bed7d")
+
+    conn = sqlite3.connect(database_file)
+    conn.executemany(
+        "INSERT INTO users (id, email, username, hashed_password) VALUES (?, ?, ?, 'x')",
+        [(1, "a@example.com", "a"), (2, "b@example.com", "b"), (3, "c@example.com", "c")]
+    )
+    conn.executemany(
+        "INSERT INTO spam_logs (user_id, email_text, result, confidence, is_correct) VALUES (?, 'text', ?, 0.9, ?)",
+        [(1, "Spam", 1), (1, "spam", 0), (1, "Ham", None), (2, "Ham", 1)]
+    )
+    conn.commit()
+    conn.close()
+
+    command.upgrade(config, "3c9a1f7d2b64")
+
+    conn = sqlite3.connect(database_file)
+    try:
+        rows = conn.execute(
+            "SELECT user_id, total_analyses, spam_detected, feedback_count, feedback_correct FROM user_stats ORDER BY user_id"
+        ).fetchall()
+    finally:
+        conn.close()
+    # Users without logs get their row lazily from get_user_stats
+    assert rows == [(1, 3, 2, 2, 1), (2, 1, 0, 1, 1)]
+
+
+def test_async_database_url_maps_drivers():
+    assert get_async_database_url("sqlite:///./spam_detector.db") == "sqlite+aiosqlite:///./spam_detector.db"
+    assert get_async_database_url("postgresql://app:s3cret@db:5432/spam") == "postgresql+asyncpg://app:s3cret@db:5432/spam"
+    assert get_async_database_url("postgresql+asyncpg://db/spam") == "postgresql+asyncpg://db/spam"
+
+
+def test_sqlite_engines_apply_pragmas(tmp_path):
+    database_url = f"sqlite:///{tmp_path / 'tuned.db'}"
+
+    with create_db_engine(database_url).connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+        assert conn.execute(text("PRAGMA busy_timeout")).scalar() == settings.SQLITE_BUSY_TIMEOUT_MS
+        assert conn.execute(text("PRAGMA synchronous")).scalar() == 1  # NORMAL
+        assert conn.execute(text("PRAGMA cache_size")).scalar() == -settings.SQLITE_CACHE_SIZE_KB
+
+    async_engine = create_async_db_engine(database_url)
+
+    async def read_pragmas():
+        try:
+            async with async_engine.connect() as conn:
+                journal_mode = (await conn.execute(text("PRAGMA journal_mode"))).scalar()
+                busy_timeout = (await conn.execute(text("PRAGMA busy_timeout"))).scalar()
+        finally:
+            await async_engine.dispose()
+        return journal_mode, busy_timeout
+
+    assert asyncio.run(read_pragmas()) == ("wal", settings.SQLITE_BUSY_TIMEOUT_MS)
+
+    # In-memory databases are left alone (WAL doesn't apply to them)
+    with create_db_engine("sqlite://").connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "memory"
@@ -0,0 +1,242 @@
+"""
+Tests for the pure-ASGI middleware and response size
+Every response (errors and streams included) carries the security headers,
+a request id and its timing, compression is negotiated from Accept-Encoding
+and only applied to text-like bodies above the size threshold, and /analyze
+drops processed_text when the caller opts out
+"""
+
+import re
+import sys
+from pathlib import Path
+
+import pytest
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import ORJSONResponse, Response, StreamingResponse
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import NullPool
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.config import settings
+from app.database import Base, get_async_db
+from app.dependencies import get_current_user_or_api_key
+from app.models import User
+from app.routes import analyze
+from app.utils.middleware import SECURITY_HEADERS, CompressionMiddleware, SecurityHeadersMiddleware
+from app.utils.prometheus import request_latency
+from app.utils.timing import timed
+
+LARGE_PAYLOAD = {"items": [{"id": i, "result": "ham", "confidence": 0.5} for i in range(200)]}
+
+
+class EchoModel:
+    """Stands in for the spam model, echoing the text back as processed_text"""
+
+    is_loaded = True
+
+    def predict(self, email_text, record=True):
+        return {
+            "result": "ham",
+            "confidence": 0.8,
+            "model_version": "test",
+            "processed_text": email_text.lower(),
+            "original_length": len(email_text),
+            "processed_length": len(email_text),
+        }
+
+
+def latency_count(method, route, status):
+    """Requests recorded so far in the request_latency histogram for these labels"""
+    histogram = dict(request_latency.items()).get((method, route, status))
+    return histogram.count if histogram is not None else 0
+
+
+def assert_security_headers(response):
+    for name, value in SECURITY_HEADERS:
+        assert response.headers[name.decode()] == value.decode()
+    assert float(response.headers["x-process-time"]) >= 0
+
+
+@pytest.fixture
+def headers_client():
+    """Plain, failing and streaming routes behind SecurityHeadersMiddleware with Server-Timing on"""
+    app = FastAPI()
+    app.add_middleware(SecurityHeadersMiddleware, server_timing=True)
+
+    @app.get("/items/{item_id}")
+    def item(item_id: int):
+        with timed("lookup"):
+            return {"id": item_id}
+
+    @app.get("/forbidden")
+    def forbidden():
+        raise HTTPException(status_code=403, detail="no")
+
+    @app.get("/crash")
+    def crash():
+        raise RuntimeError("handler failed")
+
+    @app.get("/stream")
+    def stream():
+        return StreamingResponse((b"chunk\n" for _ in range(3)), media_type="text/plain")
+
+    with TestClient(app, raise_server_exceptions=False) as client:
+        yield client
+
+
+def test_valid_request_id_is_echoed_and_invalid_ones_replaced(headers_client):
+    assert headers_client.get("/items/1", headers={"X-Request-ID": "trace-42.a_b"}).headers["x-request-id"] == "trace-42.a_b"
+
+    for sent in ({"X-Request-ID": "bad id\twith spaces"}, {"X-Request-ID": "x" * 129}, {}):
+        request_id = headers_client.get("/items/1", headers=sent).headers["x-request-id"]
+        assert re.fullmatch(r"[0-9a-f]{32}", request_id)
+
+
+def test_process_time_server_timing_and_latency_histogram(headers_client):
+    before = latency_count("GET", "/items/{item_id}", "200")
+
+    response = headers_client.get("/items/7")
+
+    assert response.json() == {"id": 7}
+    assert_security_headers(response)
+    stages = dict(part.split(";dur=") for part in response.headers["server-timing"].split(", "))
+    assert set(stages) == {"lookup", "total"}
+    assert float(stages["lookup"]) <= float(stages["total"])
+    # Recorded under the route template, not the raw path
+    assert latency_count("GET", "/items/{item_id}", "200") == before + 1
+
+
+@pytest.mark.parametrize("path, status", [("/forbidden", 403), ("/crash", 500), ("/missing", 404)])
+def test_error_responses_carry_the_headers(headers_client, path, status):
+    route = path if status != 404 else "unmatched"
+    before = latency_count("GET", route, str(status))
+
+    response = headers_client.get(path, headers={"X-Request-ID": "err-1"})
+
+    assert response.status_code == status
+    assert_security_headers(response)
+    assert response.headers["x-request-id"] == "err-1"
+    assert latency_count("GET", route, str(status)) == before + 1
+
+
+def test_streaming_responses_carry_the_headers(headers_client):
+    response = headers_client.get("/stream")
+
+    assert response.text == "chunk\n" * 3
+    assert_security_headers(response)
+    assert re.fullmatch(r"[0-9a-f]{32}", response.headers["x-request-id"])
+
+
+@pytest.fixture
+def compressed_client():
+    """Routes returning bodies of various types and sizes behind CompressionMiddleware"""
+    app = FastAPI(default_response_class=ORJSONResponse)
+    app.add_middleware(CompressionMiddleware, minimum_size=1024)
+
+    @app.get("/large")
+    def large():
+        return LARGE_PAYLOAD
+
+    @app.get("/small")
+    def small():
+        return {"status": "ok"}
+
+    @app.get("/binary")
+    def binary():
+        return Response(b"\x00" * 4096, media_type="application/octet-stream")
+
+    @app.get("/ndjson")
+    def ndjson():
+        lines = (b'{"result": "ham"}\n' for _ in range(200))
+        return StreamingResponse(lines, media_type="application/x-ndjson")
+
+    @app.get("/text-stream")
+    def text_stream():
+        return StreamingResponse((b"line of text\n" for _ in range(200)), media_type="text/plain")
+
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.mark.parametrize("accept_encoding, encoding", [("br", "br"), ("gzip", "gzip"), ("gzip, br;q=0.9", "br")])
+def test_large_json_is_compressed_with_the_negotiated_encoding(compressed_client, accept_encoding, encoding):
+    response = compressed_client.get("/large", headers={"Accept-Encoding": accept_encoding})
+    expected = ORJSONResponse(LARGE_PAYLOAD).body
+
+    # httpx decodes the body; Content-Length is the size on the wire
+    assert response.headers["content-encoding"] == encoding
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.content == expected
+    assert int(response.headers["content-length"]) < len(expected) // 4
+
+
+def test_without_accept_encoding_the_body_is_sent_as_is(compressed_client):
+    response = compressed_client.get("/large", headers={"Accept-Encoding": "identity"})
+
+    assert "content-encoding" not in response.headers
+    assert response.json() == LARGE_PAYLOAD
+
+
+def test_bodies_under_the_threshold_are_not_compressed(compressed_client):
+    response = compressed_client.get("/small", headers={"Accept-Encoding": "br, gzip"})
+
+    assert "content-encoding" not in response.headers
+    assert response.json() == {"status": "ok"}
+
+
+@pytest.mark.parametrize("path", ["/binary", "/ndjson"])
+def test_binary_and_ndjson_responses_are_not_compressed(compressed_client, path):
+    response = compressed_client.get(path, headers={"Accept-Encoding": "br, gzip"})
+
+    assert response.status_code == 200
+    assert "content-encoding" not in response.headers
+
+
+def test_text_streams_are_compressed_incrementally(compressed_client):
+    response = compressed_client.get("/text-stream", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.content == b"line of text\n" * 200
+
+
+@pytest.fixture
+def analyze_client(tmp_path, monkeypatch):
+    """/analyze on a file database with a model that echoes its input"""
+    database_file = tmp_path / "analyze.db"
+    engine = create_engine(f"sqlite:///{database_file}")
+    Base.metadata.create_all(bind=engine)
+    engine.dispose()
+    async_engine = create_async_engine(f"sqlite+aiosqlite:///{database_file}", poolclass=NullPool)
+    AsyncTestingSession = async_sessionmaker(bind=async_engine, class_=AsyncSession, expire_on_commit=False)
+    monkeypatch.setattr(analyze, "spam_model", EchoModel())
+    monkeypatch.setattr(settings, "RATE_LIMIT_ENABLED", False)
+
+    app = FastAPI(default_response_class=ORJSONResponse)
+    app.include_router(analyze.router, prefix="/api/analyze")
+
+    async def override_get_async_db():
+        async with AsyncTestingSession() as session:
+            yield session
+
+    app.dependency_overrides[get_async_db] = override_get_async_db
+    app.dependency_overrides[get_current_user_or_api_key] = lambda: User(
+        id=1, username="reader", email="reader@example.com", is_active=True
+    )
+
+    with TestClient(app) as client:
+        yield client
+        client.portal.call(async_engine.dispose)
+
+
+def test_processed_text_is_echoed_unless_the_caller_opts_out(analyze_client):
+    body = {"email_text": "Lunch At Noon?"}
+
+    default = analyze_client.post("/api/analyze/analyze", json=body).json()
+    assert default["processed_text"] == "lunch at noon?"
+
+    opted_out = analyze_client.post("/api/analyze/analyze", params={"include_processed_text": "false"}, json=body).json()
+    assert "processed_text" not in opted_out
+    assert opted_out["result"] == "ham" and opted_out["log_id"] > default["log_id"]
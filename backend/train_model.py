@@ -18,12 +18,10 @@ from sklearn.metrics import (
     precision_recall_fscore_support, roc_auc_score, matthews_corrcoef
 )
 from app.services.preprocessing import email_preprocessor
+from app.utils.model_cost import measure_footprint, benchmark_inference
+from app.utils.logger import setup_logging
+from app.utils.tracing import traced
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
 logger = logging.getLogger(__name__)
 
 def download_dataset():
@@ -178,6 +176,7 @@ def get_email_augmentation_data():
     return df
 
 
+@traced("train.load_dataset")
 def load_dataset(filepath):
     """Load and prepare the spam dataset"""
     logger.info(f"Loading dataset from {filepath}")
@@ -224,6 +223,7 @@ def load_dataset(filepath):
         logger.error(f"Error loading dataset: {e}")
         raise
 
+@traced("train.preprocess_dataset")
 def preprocess_dataset(df):
     """Preprocess all messages in the dataset"""
     logger.info("Preprocessing messages...")
@@ -260,6 +260,7 @@ def calculate_detailed_metrics(y_test, y_pred, y_proba):
         'confusion_matrix': confusion_matrix(y_test, y_pred).tolist()
     }
 
+@traced("train.train_model")
 def train_model(df, test_size=0.2, cv_folds=5):
     """Train classification model with cross-validation"""
     logger.info("Training Logistic Regression model with cross-validation...")
@@ -386,6 +387,7 @@ def cleanup_old_models(keep_latest=10):
     except Exception as e:
         logger.error(f"Model cleanup failed: {e}")
 
+@traced("train.save_model")
 def save_model(model, vectorizer, metrics, version=None, retrained=False):
     """Save trained model with comprehensive metrics"""
     logger.info("Saving model...")
@@ -416,6 +418,13 @@ def save_model(model, vectorizer, metrics, version=None, retrained=False):
         'features_count': len(vectorizer.get_feature_names_out()) if hasattr(vectorizer, 'get_feature_names_out') else 0
     }
 
+    # Serving cost, so versions can be compared on more than accuracy
+    try:
+        metadata['footprint'] = measure_footprint(model, vectorizer, email_preprocessor.stopwords)
+        metadata['inference_benchmark'] = benchmark_inference(model, vectorizer)
+    except Exception as e:
+        logger.warning(f"Model cost measurement failed: {e}")
+
     # Save model with version
     model_path = f'ml_models/spam_model_v{version_str}.pkl'
     with open(model_path, 'wb') as f:
@@ -433,6 +442,9 @@ def save_model(model, vectorizer, metrics, version=None, retrained=False):
         logger.info(f"   - F1-Score: {metrics.get('f1_score', 0) * 100:.2f}%")
         logger.info(f"   - ROC-AUC: {metrics.get('roc_auc', 0) * 100:.2f}%")
     logger.info(f"   - Retrained: {retrained}")
+    if 'inference_benchmark' in metadata:
+        logger.info(f"   - Memory: {metadata['footprint']['total_mb']} MB")
+        logger.info(f"   - Predictions/sec: {metadata['inference_benchmark']['predictions_per_sec']}")
     
     # Cleanup old models
     try:
@@ -442,6 +454,7 @@ def save_model(model, vectorizer, metrics, version=None, retrained=False):
 
     return model_path, version_str
 
+@traced("train.train_model_from_data")
 def train_model_from_data(training_data, test_size=0.2):
     """
     Train model from custom training data (for retraining from feedback)
@@ -581,6 +594,7 @@ def train_model_from_data(training_data, test_size=0.2):
         logger.error(f"Retraining failed: {e}")
         raise
 
+@traced("train.main")
 def main(dataset_path=None):
     """
     Main training pipeline
@@ -649,4 +663,5 @@ def main(dataset_path=None):
         raise
 
 if __name__ == "__main__":
+    setup_logging()
     main()
\ No newline at end of file